@@ -0,0 +1,303 @@
+"""
+Headless batch interface, for scripting bulk jobs without the UI:
+
+    python -m app.cli PROJECT ingest PATH [PATH ...]
+    python -m app.cli PROJECT sync FOLDER [FOLDER ...]
+    python -m app.cli PROJECT align
+    python -m app.cli PROJECT deflicker
+    python -m app.cli PROJECT duplicates [--radius 6]
+    python -m app.cli PROJECT storage [--clean]
+    python -m app.cli PROJECT export OUT.mp4 [--audio SONG] [--preset youtube] [--fps 30 60]
+
+Global options (before PROJECT): --workers N, --trace trace.json, --memory-budget MB
+
+Pools shrink to fit the memory budget (the option, else the project's
+'memory_budget_mb' setting), and per-stage memory peaks are reported as a
+final "memory" event.
+
+Progress goes to stdout as one JSON object per line; anything the pipeline
+prints is sent to stderr so stdout stays machine-readable.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from app.model import tracing, memory
+from app.model.file_manager import FileManager
+from app.model.video_renderer import VideoRenderer
+from app.model.render_process import RenderProcess, build_render_targets, build_export_job, preset_slug
+
+
+class JsonLinesReporter:
+    def __init__(self, stream):
+        self.stream = stream
+
+    def emit(self, event, **fields):
+        record = {"event": event, "time": round(time.time(), 3)}
+        record.update(fields)
+        self.stream.write(json.dumps(record) + "\n")
+        self.stream.flush()
+
+
+_detector = None
+
+def _init_align_worker():
+    global _detector
+    from app.model.ai_pose import PoseDetector
+    _detector = PoseDetector()
+
+def _landmark_worker(item):
+    from app.model.alignment import AlignmentEngine
+    file_id, path = item
+    try:
+        return file_id, AlignmentEngine.detect_points(_detector, path)
+    finally:
+        tracing.flush()
+
+def _deflicker_worker(pair):
+    """Writes the corrected image next to the proxy; the caller swaps it in and records the levels."""
+    from app.model.image_processor import ImageProcessor
+    path, reference = pair
+    try:
+        levels = ImageProcessor.exposure_levels(path, reference)
+        corrected = ImageProcessor.match_histograms(path, reference)
+        if corrected is None or levels is None:
+            return None
+        tmp_path = path + ".deflicker.jpg"
+        corrected.save(tmp_path, "JPEG", quality=95)
+        return path, tmp_path, levels
+    finally:
+        tracing.flush()
+
+
+def collect_images(paths):
+    """Expands directories recursively into the image files they contain."""
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, names in os.walk(path):
+                found.extend(os.path.join(root, n) for n in names if n.lower().endswith(FileManager.IMAGE_EXTENSIONS))
+        elif path.lower().endswith(FileManager.IMAGE_EXTENSIONS):
+            found.append(path)
+    return sorted(found)
+
+def timeline_ids(manager):
+    return [fid for _, fid in manager.get_timeline(best_of_day=manager.get_setting("best_of_day", False))]
+
+def timeline_proxies(manager):
+    return [os.path.join(manager.dirs["proxies"], f"{fid}.jpg") for fid in timeline_ids(manager)]
+
+LANDMARK_WORKER_MB = 400
+DEFLICKER_WORKER_MB = 150
+
+def run_pool(stage, fn, items, workers, reporter, initializer=None, budget=None, worker_mb=0):
+    total = len(items)
+    reporter.emit("start", stage=stage, total=total)
+    results = []
+    if total:
+        workers = min(workers, total)
+        if budget is not None:
+            workers = budget.fit(workers, worker_mb)
+        ctx = mp.get_context("spawn")
+        with memory.stage(stage), ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=initializer) as pool:
+            futures = [pool.submit(fn, item) for item in items]
+            for done, future in enumerate(as_completed(futures), 1):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    reporter.emit("error", stage=stage, message=str(e))
+                reporter.emit("progress", stage=stage, done=done, total=total)
+    return results
+
+
+def cmd_ingest(manager, args, reporter):
+    paths = collect_images(args.paths)
+    reporter.emit("start", stage="ingest", total=len(paths))
+    added = manager.ingest_batch(
+        paths, args.workers,
+        lambda done, total: reporter.emit("progress", stage="ingest", done=done, total=total)
+    )
+    reporter.emit("done", stage="ingest", added=len(added))
+    return 0
+
+def cmd_sync(manager, args, reporter):
+    """Imports only what is new in the folders since the last sync."""
+    reporter.emit("start", stage="scan", folders=args.folders)
+    added = manager.import_folders(
+        args.folders, args.workers,
+        lambda done, total: reporter.emit("progress", stage="ingest", done=done, total=total)
+    )
+    reporter.emit("done", stage="sync", added=len(added))
+    return 0
+
+def cmd_align(manager, args, reporter):
+    """
+    Detects missing landmarks across worker processes, solves every transform
+    at once, then registers photos without a face against their neighbours.
+    """
+    from app.model.alignment import AlignmentEngine
+
+    file_ids = timeline_ids(manager)
+    cached = manager.get_landmarks()
+    missing = [(fid, os.path.join(manager.dirs["proxies"], f"{fid}.jpg")) for fid in file_ids if fid not in cached]
+    results = run_pool("landmarks", _landmark_worker, [m for m in missing if os.path.exists(m[1])],
+                       args.workers, reporter, _init_align_worker, manager.memory_budget, LANDMARK_WORKER_MB)
+    manager.set_landmarks(dict(results))
+
+    engine = AlignmentEngine(manager, None)
+    transforms = engine.solve_landmarks(file_ids, manager.get_landmarks())
+    faceless = len(file_ids) - len(transforms)
+    if faceless:
+        reporter.emit("start", stage="register", total=faceless)
+        with memory.stage("register"):
+            engine.register_faceless(file_ids, transforms, max_workers=args.workers)
+    manager.set_transforms(transforms)
+    reporter.emit("done", stage="align", processed=len(transforms))
+    return 0
+
+def cmd_deflicker(manager, args, reporter):
+    """Each photo is matched to its predecessor as it was before this run."""
+    proxies = [p for p in timeline_proxies(manager) if os.path.exists(p)]
+    pairs = list(zip(proxies[1:], proxies[:-1]))
+    results = run_pool("deflicker", _deflicker_worker, pairs, args.workers, reporter,
+                       budget=manager.memory_budget, worker_mb=DEFLICKER_WORKER_MB)
+    corrected = [r for r in results if r is not None]
+    edits = {}
+    for path, tmp_path, levels in corrected:
+        os.replace(tmp_path, path)
+        edits[os.path.splitext(os.path.basename(path))[0]] = {"levels": levels}
+    manager.record_edits(edits)
+    manager.forget_photo_info(list(edits))
+    reporter.emit("done", stage="deflicker", processed=len(corrected))
+    return 0
+
+def cmd_duplicates(manager, args, reporter):
+    """Reports groups of near-duplicate photos (burst shots, re-imports)."""
+    indexed = manager.index_missing_info(args.workers)
+    reporter.emit("progress", stage="index", indexed=indexed)
+    for group in manager.find_near_duplicates(args.radius):
+        reporter.emit("group", stage="duplicates", file_ids=group)
+    reporter.emit("done", stage="duplicates")
+    return 0
+
+def cmd_storage(manager, args, reporter):
+    """Reports disk usage per category; with --clean, removes orphans and enforces cache quotas first."""
+    if args.clean:
+        report = manager.storage.maintain()
+        orphans = report["orphans"]
+        reporter.emit("done", stage="clean", entries=len(orphans["entries"]), files=orphans["files"],
+                      freed=orphans["bytes"], evicted=report["evicted"])
+    quotas = manager.storage.quotas
+    for category, usage in sorted(manager.storage.usage().items()):
+        reporter.emit("usage", stage="storage", category=category, files=usage["files"], bytes=usage["bytes"],
+                      quota_mb=quotas.get(category))
+    return 0
+
+def cmd_export(manager, args, reporter):
+    presets_by_slug = {preset_slug(name): name for name in VideoRenderer.PRESET_RESOLUTIONS}
+    presets = [presets_by_slug[slug] for slug in args.preset]
+    file_ids = timeline_ids(manager)
+    if not file_ids:
+        reporter.emit("error", stage="export", message="project has no photos")
+        return 1
+
+    targets = build_render_targets(os.path.abspath(args.output), presets, args.fps)
+    spec = build_export_job(manager, file_ids, targets, args.audio, args.split, args.transition)
+    process = RenderProcess(spec)
+    process.start()
+    reporter.emit("start", stage="export", outputs=[t.export_path for t in targets])
+
+    while True:
+        try:
+            for message in process.poll():
+                if message[0] == "progress":
+                    reporter.emit("progress", stage="export", percent=message[1])
+                elif message[0] == "frames":
+                    done, total, rate, eta = message[1:]
+                    reporter.emit("frames", stage="export", done=done, total=total, fps=round(rate, 2), eta=round(eta, 1))
+                elif message[0] == "estimate":
+                    seconds, size, calibrated = message[1:]
+                    reporter.emit("estimate", stage="export", seconds=round(seconds, 1), bytes=size, calibrated=calibrated)
+                elif message[0] == "memory":
+                    reporter.emit("memory", stage="export", stages=message[1])
+                elif message[0] == "finished":
+                    success, cancelled = message[1], message[2]
+                    reporter.emit("done", stage="export", success=success, cancelled=cancelled)
+                    return 0 if success else (130 if cancelled else 1)
+            time.sleep(0.05)
+        except KeyboardInterrupt:
+            process.cancel()
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m app.cli", description="TimeFlow batch interface")
+    parser.add_argument("project", help="Project folder (created if missing)")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="Parallel worker processes")
+    parser.add_argument("--trace", default=None, help="Write a Chrome trace (and .summary.json) of this run")
+    parser.add_argument("--memory-budget", type=float, default=None, metavar="MB",
+                        help="Soft memory ceiling; overrides the project's memory_budget_mb setting")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    ingest = commands.add_parser("ingest", help="Import photos or folders of photos")
+    ingest.add_argument("paths", nargs="+")
+    ingest.set_defaults(handler=cmd_ingest)
+
+    sync = commands.add_parser("sync", help="Import new photos from folders using the scan index")
+    sync.add_argument("folders", nargs="+")
+    sync.set_defaults(handler=cmd_sync)
+
+    align = commands.add_parser("align", help="Auto-align every photo on the timeline")
+    align.set_defaults(handler=cmd_align)
+
+    deflicker = commands.add_parser("deflicker", help="Match each photo's exposure to the one before it")
+    deflicker.set_defaults(handler=cmd_deflicker)
+
+    duplicates = commands.add_parser("duplicates", help="Group near-duplicate photos by perceptual hash")
+    duplicates.add_argument("--radius", type=int, default=6, help="Max differing hash bits")
+    duplicates.set_defaults(handler=cmd_duplicates)
+
+    storage = commands.add_parser("storage", help="Disk usage per category; --clean frees orphans and over-quota caches")
+    storage.add_argument("--clean", action="store_true")
+    storage.set_defaults(handler=cmd_storage)
+
+    export = commands.add_parser("export", help="Render the timeline to video")
+    export.add_argument("output")
+    export.add_argument("--audio", default=None)
+    export.add_argument("--preset", nargs="+", default=["tiktok_reels"],
+                        choices=[preset_slug(name) for name in VideoRenderer.PRESET_RESOLUTIONS])
+    export.add_argument("--fps", nargs="+", type=int, default=[30])
+    export.add_argument("--split", action="store_true", help="Split-screen: Day 1 vs. timelapse")
+    export.add_argument("--transition", choices=[VideoRenderer.TRANSITION_CUT, VideoRenderer.TRANSITION_MORPH],
+                        default=VideoRenderer.TRANSITION_CUT)
+    export.set_defaults(handler=cmd_export)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.trace:
+        tracing.enable(args.trace)
+
+    # Keep the real stdout for progress and point fd 1 (inherited by worker processes) at stderr.
+    progress_stream = os.fdopen(os.dup(sys.stdout.fileno()), "w")
+    sys.stdout.flush()
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    reporter = JsonLinesReporter(progress_stream)
+
+    manager = FileManager(os.path.abspath(args.project))
+    if args.memory_budget:
+        manager.memory_budget = memory.MemoryBudget(args.memory_budget)
+    memory.monitor.start(trace_python=tracing.tracer.enabled)
+    try:
+        return args.handler(manager, args, reporter)
+    finally:
+        memory.monitor.stop()
+        stages = memory.monitor.report()
+        if stages:
+            reporter.emit("memory", stage=args.command, stages=stages)
+
+if __name__ == "__main__":
+    sys.exit(main())
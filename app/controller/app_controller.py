@@ -1,104 +1,197 @@
 import os
+import time
+import itertools
 from datetime import datetime, timedelta
-from PyQt6.QtCore import QObject, QThread, pyqtSignal
 from PyQt6.QtWidgets import QFileDialog, QMessageBox
-from PyQt6.QtGui import QPixmap
-from PIL import Image 
+from PyQt6.QtCore import Qt, QTimer, QFileSystemWatcher
+from PyQt6.QtGui import QPixmap, QImage, QImageReader
 
 from app.model.file_manager import FileManager
 from app.model.ai_pose import PoseDetector
+from app.model.alignment import AlignmentEngine
 from app.model.audio_processor import AudioProcessor
+from app.model.preview_store import PreviewFrameStore
+from app.model.onion_skin import OnionSkinBlender
+from app.model.tile_pyramid import TilePyramid
+from app.model.thumbnail_pack import ThumbnailPack
 from app.model.video_renderer import VideoRenderer
+from app.model.render_process import RenderProcess, build_render_targets, build_export_job
+from app.model.render_estimate import RenderCalibration
 from app.view.export_dialog import ExportDialog
+from app.view.preview_player import PreviewDialog
+from app.controller.editor_prefetcher import EditorPrefetcher
+from app.controller.tile_loader import TileLoader
+from app.controller.job_scheduler import (
+    JobScheduler,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_INGEST,
+    PRIORITY_ANALYSIS,
+    PRIORITY_RENDER
+)
 
 from app.controller.commands import (
     CommandInvoker, 
     RotateCommand, 
     AutoAlignCommand, 
     DeflickerCommand,
-    GenerateGapFillCommand
+    GenerateGapFillCommand,
+    BatchGapFillCommand
 )
 
 
-class IngestWorker(QObject):
-    finished = pyqtSignal(str, str) 
-    def __init__(self, file_manager, file_path):
-        super().__init__()
-        self.manager = file_manager
-        self.path = file_path
-    def run(self):
-        file_id, date_str = self.manager.ingest_photo(self.path)
-        self.finished.emit(file_id, date_str)
-
-
-class RenderWorker(QObject):
-    progress = pyqtSignal(int)
-    finished = pyqtSignal(bool)
-
-    def __init__(self, output_path, photos, audio_path, fps, split_screen):
-        super().__init__()
-        self.output_path = output_path
-        self.photos = photos
-        self.audio_path = audio_path
-        self.fps = fps
-        self.split_screen = split_screen 
-
-    def run(self):
-        
-        schedule = None
-        if self.audio_path:
-            processor = AudioProcessor()
-            processor.load_audio(self.audio_path)
-            schedule = processor.get_sync_schedule(len(self.photos))
-
-        
-        renderer = VideoRenderer(
-            self.output_path, 
-            self.photos, 
-            self.audio_path, 
-            schedule, 
-            self.fps,
-            self.split_screen 
-        )
-        success = renderer.render(self.update_progress)
-        self.finished.emit(success)
-
-    def update_progress(self, val):
-        self.progress.emit(val)
+def run_render_job(job, spec):
+    """Job body: drives an export in a child process and relays its messages."""
+    process = RenderProcess(spec)
+    process.start()
+    while True:
+        if job.is_cancelled():
+            process.cancel()
+        for message in process.poll():
+            if message[0] == "finished":
+                return message[1], message[2]
+            job.report(message)
+        time.sleep(0.05)
 
 
 
 class AppController:
-    def __init__(self, view):
+    GRID_BATCH = 24
+    ALIGN_NEIGHBOURS = 2
+
+    def __init__(self, view, startup_timer=None):
         self.view = view
+        self.startup_timer = startup_timer
         
         
         desktop = os.path.join(os.path.expanduser("~"), "Desktop", "TimeFlow_Project")
         self.model = FileManager(desktop)
         self.invoker = CommandInvoker()
         self.ai_pose = PoseDetector()
+        self.align_engine = AlignmentEngine(self.model, self.ai_pose)
+        self.scheduler = JobScheduler(self.model.get_setting("job_limits"))
+        self.render_job = None
+        self.storage_job = None
+        self.landmarks_job = None
+        self.commands_in_flight = {}
+        self.preview_store = None
+        self.preview_dlg = None
+        self.preview_job = None
+        self.preview_resync = False
+        self.preview_schedule = None
+        self.onion = OnionSkinBlender()
+        self.onion_enabled = False
+        self.prefetcher = EditorPrefetcher(self.scheduler, self.ai_pose, self.model.dirs["proxies"])
+        self.tile_loader = TileLoader(self.scheduler, self.model.memory_budget.fit(256, TileLoader.TILE_MB, share=0.1))
+        self.pyramids = {}
         
         self.current_editing_id = None
         self.sorted_ids = []
+        self.grid_queue = []
+        self.grid_cell = 0
+        self.grid_timer = QTimer()
+        self.grid_timer.setInterval(0)
+        self.grid_timer.timeout.connect(self._populate_grid_batch)
+        self.thumbs = None
+        if self.model.get_setting("packed_thumbnails", True):
+            self.thumbs = ThumbnailPack(os.path.join(self.model.dirs["cache"], "thumbs"))
+        self.thumbs_job = None
+        self.thumbs_verified = False
+        self.sync_job = None
+        self.watcher = QFileSystemWatcher()
+        self.watcher.directoryChanged.connect(self.on_watched_folder_changed)
+        self.watch_timer = QTimer()
+        self.watch_timer.setSingleShot(True)
+        self.watch_timer.setInterval(2000)
+        self.watch_timer.timeout.connect(self.sync_watched_folders)
+
+        self.scheduler.queue_changed.connect(self.on_jobs_changed)
+        self.view.job_queue.cancel_requested.connect(self.scheduler.cancel_job_id)
+        self.prefetcher.landmarks_ready.connect(self.on_landmarks_ready)
+        self.tile_loader.tile_ready.connect(self.on_tile_ready)
 
         
         self.view.btn_ingest.clicked.connect(self.select_file)
+        self.view.btn_watch.clicked.connect(self.select_watch_folder)
+        self.view.chk_best_of_day.setChecked(self.model.get_setting("best_of_day", False))
+        self.view.chk_best_of_day.toggled.connect(self.on_best_of_day_toggled)
         self.view.files_dropped.connect(self.handle_drop)
         self.view.photo_selected.connect(self.enter_editor)
         self.view.btn_export.clicked.connect(self.open_export_dialog)
+        self.view.btn_preview.clicked.connect(self.open_preview)
 
         
         self.view.editor.back_clicked.connect(self.exit_editor)
         self.view.editor.rotate_clicked.connect(self.rotate_image)
         self.view.editor.undo_clicked.connect(self.undo_action)
         self.view.editor.save_clicked.connect(self.exit_editor)
+        self.view.editor.prev_clicked.connect(lambda: self.step_editor(-1))
+        self.view.editor.next_clicked.connect(lambda: self.step_editor(1))
+        self.view.editor.onion_skin_changed.connect(self.on_onion_skin_changed)
+        self.view.editor.tiles_needed.connect(self.on_tiles_needed)
         
         self.view.editor.auto_align_clicked.connect(self.run_auto_align)
+        self.view.editor.align_all_clicked.connect(self.run_align_all)
         self.view.editor.deflicker_clicked.connect(self.run_deflicker)
         self.view.editor.gap_fill_clicked.connect(self.run_gap_fill)
+        self.view.editor.gap_fill_all_clicked.connect(self.run_batch_gap_fill)
 
         
         self.refresh_grid()
+        if self.model.get_setting("watch_folders"):
+            self.watch_timer.start()
+        self.index_photos()
+        self.maintain_storage()
+
+    def index_photos(self):
+        """Hash/sharpness for photos that have none (new, or whose proxy was rewritten)."""
+        self.scheduler.submit(
+            "Index photos",
+            lambda job: self.model.index_missing_info(cancel_event=job.cancel_event),
+            priority=PRIORITY_ANALYSIS,
+            on_done=lambda count: self.refresh_grid() if count and self.model.get_setting("best_of_day", False) else None
+        )
+
+    def index_landmarks(self):
+        """Face points for every photo on the timeline not in the landmark cache yet."""
+        if self.landmarks_job is not None or not self.sorted_ids:
+            return
+        ids = list(self.sorted_ids)
+        done = lambda *args: setattr(self, "landmarks_job", None)
+        self.landmarks_job = self.scheduler.submit(
+            "Detect faces",
+            lambda job: self.align_engine.collect_landmarks(ids, job.cancel_event),
+            priority=PRIORITY_ANALYSIS,
+            on_done=done,
+            on_error=done,
+            on_cancel=done
+        )
+
+    def maintain_storage(self):
+        """
+        Orphan cleanup and cache quota enforcement in the background; never
+        while an export is reading the caches.
+        """
+        if self.render_job is not None or self.storage_job is not None:
+            return
+        self.storage_job = self.scheduler.submit(
+            "Clean up storage",
+            lambda job: self.model.storage.maintain(job.cancel_event),
+            priority=PRIORITY_ANALYSIS,
+            on_done=self._on_storage_maintained,
+            on_error=lambda error: setattr(self, "storage_job", None),
+            on_cancel=lambda: setattr(self, "storage_job", None)
+        )
+
+    def _on_storage_maintained(self, report):
+        self.storage_job = None
+        orphans = report["orphans"]
+        if orphans["file_ids"] and self.thumbs is not None:
+            self.thumbs.forget(orphans["file_ids"])
+        if orphans["entries"]:
+            self.refresh_grid()
+        freed = orphans["bytes"] + sum(report["evicted"].values())
+        if freed:
+            print(f"Storage: freed {freed / 2 ** 20:.0f} MB")
 
     
     def select_file(self):
@@ -107,91 +200,373 @@ class AppController:
             self.start_ingest(file_path)
 
     def handle_drop(self, file_paths):
-        valid = ('.jpg', '.jpeg', '.png', '.heic')
-        for f in file_paths:
-            if f.lower().endswith(valid):
-                self.start_ingest(f)
-                return 
+        valid = [f for f in file_paths if f.lower().endswith(FileManager.IMAGE_EXTENSIONS)]
+        if len(valid) == 1:
+            self.start_ingest(valid[0])
+        elif valid:
+            self.start_batch_ingest(valid)
 
     def start_ingest(self, file_path):
         self.view.status_label.setText(f"Processing {os.path.basename(file_path)}...")
-        self.view.progress.setVisible(True)
-        self.view.progress.setRange(0, 0)
-        
-        self.thread = QThread()
-        self.worker = IngestWorker(self.model, file_path)
-        self.worker.moveToThread(self.thread)
-        self.thread.started.connect(self.worker.run)
-        self.worker.finished.connect(self.on_ingest_done)
-        self.worker.finished.connect(self.thread.quit)
-        self.worker.finished.connect(self.worker.deleteLater)
-        self.thread.finished.connect(self.thread.deleteLater)
-        self.thread.start()
+        self.scheduler.submit(
+            f"Import {os.path.basename(file_path)}",
+            lambda job: self.model.ingest_photo(file_path),
+            priority=PRIORITY_INGEST,
+            on_done=lambda result: self.on_ingest_done(*result)
+        )
 
     def on_ingest_done(self, file_id, date_str):
-        self.view.progress.setVisible(False)
         self.view.status_label.setText(f"Saved: {date_str}")
         self.refresh_grid()
 
+    def start_batch_ingest(self, file_paths):
+        """Imports many files on a process pool with a single DB write."""
+        self.view.status_label.setText(f"Importing {len(file_paths)} photos...")
+
+        def on_progress(payload):
+            done, total = payload
+            self.view.status_label.setText(f"Importing {done}/{total}...")
+
+        self.scheduler.submit(
+            f"Import {len(file_paths)} photos",
+            lambda job: self.model.ingest_batch(file_paths, None, lambda done, total: job.report((done, total)), job.cancel_event),
+            priority=PRIORITY_INGEST,
+            on_done=self.on_batch_ingest_done,
+            on_cancel=self.refresh_grid,
+            on_progress=on_progress
+        )
+
+    def on_batch_ingest_done(self, added):
+        self.view.status_label.setText(f"Imported {len(added)} photos")
+        self.refresh_grid()
+
+    def select_watch_folder(self):
+        folder = QFileDialog.getExistingDirectory(self.view, "Watch Folder")
+        if not folder:
+            return
+        folders = self.model.get_setting("watch_folders", [])
+        if folder not in folders:
+            self.model.set_setting("watch_folders", folders + [folder])
+        self.sync_watched_folders()
+
+    def on_watched_folder_changed(self, path):
+        self.watch_timer.start()
+
+    def sync_watched_folders(self):
+        """Imports whatever is new in the watched folders; unchanged files are only stat'ed."""
+        folders = self.model.get_setting("watch_folders", [])
+        if not folders:
+            return
+        if self.sync_job is not None:
+            self.watch_timer.start()
+            return
+
+        def work(job):
+            added = self.model.import_folders(folders, None, lambda done, total: job.report((done, total)), job.cancel_event)
+            return added, self._folder_tree(folders)
+
+        def on_progress(payload):
+            done, total = payload
+            self.view.status_label.setText(f"Importing {done}/{total}...")
+
+        self.sync_job = self.scheduler.submit(
+            "Sync watched folders",
+            work,
+            priority=PRIORITY_INGEST,
+            on_done=lambda result: self.on_sync_done(*result),
+            on_error=lambda error: setattr(self, "sync_job", None),
+            on_cancel=lambda: setattr(self, "sync_job", None),
+            on_progress=on_progress
+        )
+
+    @staticmethod
+    def _folder_tree(folders):
+        tree = []
+        for folder in folders:
+            for root, subdirs, _ in os.walk(folder):
+                subdirs[:] = [d for d in subdirs if not d.startswith(".")]
+                tree.append(root)
+        return tree
+
+    def on_sync_done(self, added, tree):
+        self.sync_job = None
+        watched = set(self.watcher.directories())
+        missing = [d for d in tree if d not in watched]
+        if missing:
+            self.watcher.addPaths(missing)
+        if added:
+            self.view.status_label.setText(f"Imported {len(added)} new photos")
+            self.refresh_grid()
+
+    def on_best_of_day_toggled(self, enabled):
+        self.model.set_setting("best_of_day", enabled)
+        self.refresh_grid()
+
+    def on_jobs_changed(self):
+        jobs = self.scheduler.snapshot()
+        self.view.job_queue.set_jobs(jobs)
+        busy = bool(jobs)
+        self.view.progress.setVisible(busy)
+        if busy:
+            self.view.progress.setRange(0, 0)
+
     def refresh_grid(self):
+        """
+        Rebuilds the grid in small batches on the event loop so the window
+        stays responsive while thumbnails are decoded.
+        """
         for i in reversed(range(self.view.grid_layout.count())): 
             item = self.view.grid_layout.itemAt(i)
             if item.widget():
                 item.widget().setParent(None)
 
-        db = self.model.db["photos"]
-        sorted_dates = sorted(db.keys())
-        self.sorted_ids = [db[d] for d in sorted_dates]
-
-        row, col = 0, 0
-        for date in sorted_dates:
-            file_id = db[date]
-            proxy_path = os.path.join(self.model.dirs["proxies"], f"{file_id}.jpg")
-            if os.path.exists(proxy_path):
-                pix = QPixmap(proxy_path)
-                self.view.add_photo_to_grid(pix, date, row, col, file_id)
-                col += 1
-                if col >= 4:
-                    col = 0
-                    row += 1
+        timeline = self.model.get_timeline(best_of_day=self.model.get_setting("best_of_day", False))
+        self.sorted_ids = [file_id for _, file_id in timeline]
+        self.grid_queue = timeline
+        self.grid_cell = 0
+        self.grid_timer.start()
         
         self.view.heatmap.set_data(self.model.db["photos"])
+        if self.preview_dlg is not None and self.preview_dlg.isVisible():
+            self.sync_preview()
+
+    def _populate_grid_batch(self):
+        batch, self.grid_queue = self.grid_queue[:self.GRID_BATCH], self.grid_queue[self.GRID_BATCH:]
+        for date, file_id in batch:
+            pix = self._grid_thumbnail(file_id)
+            if pix is None:
+                continue
+            row, col = divmod(self.grid_cell, 4)
+            self.view.add_photo_to_grid(pix, date, row, col, file_id)
+            self.grid_cell += 1
+
+        if not self.grid_queue:
+            self.grid_timer.stop()
+            self._update_thumbnails()
+            if self.startup_timer is not None:
+                self.startup_timer.mark("grid populated")
+                self.startup_timer.report()
+                self.startup_timer = None
+
+    def _grid_thumbnail(self, file_id):
+        """From the packed store when possible, else decoded from the proxy at grid size."""
+        if self.thumbs is not None:
+            data = self.thumbs.get(file_id)
+            if data is not None:
+                image = QImage.fromData(data)
+                if not image.isNull():
+                    return QPixmap.fromImage(image)
+
+        reader = QImageReader(os.path.join(self.model.dirs["proxies"], f"{file_id}.jpg"))
+        if not reader.canRead():
+            return None
+        size = reader.size()
+        if size.isValid():
+            reader.setScaledSize(size.scaled(200, 200, Qt.AspectRatioMode.KeepAspectRatio))
+        return QPixmap.fromImage(reader.read())
+
+    def _update_thumbnails(self):
+        """
+        Packs thumbnails that are missing; once per session, also checks every
+        proxy's signature so edits made outside the app are picked up.
+        """
+        if self.thumbs is None or self.thumbs_job is not None:
+            return
+        proxies = self.model.dirs["proxies"]
+        ids = list(self.sorted_ids)
+        verify = not self.thumbs_verified
+        thumbs = self.thumbs
+
+        def work(job):
+            if verify:
+                live = set(ids)
+                thumbs.forget([fid for fid in list(thumbs.entries) if fid not in live])
+                stale = thumbs.stale([(fid, os.path.join(proxies, f"{fid}.jpg")) for fid in ids])
+            else:
+                stale = [(fid, os.path.join(proxies, f"{fid}.jpg")) for fid in thumbs.missing(ids)]
+            packed = thumbs.build(stale, job.cancel_event)
+            if thumbs.needs_compaction():
+                thumbs.compact(ids)
+            return packed
+
+        def on_done(packed):
+            self.thumbs_job = None
+            self.thumbs_verified = True
+            if packed:
+                self.refresh_grid()
+
+        self.thumbs_job = self.scheduler.submit(
+            "Pack thumbnails",
+            work,
+            priority=PRIORITY_ANALYSIS,
+            on_done=on_done,
+            on_error=lambda error: setattr(self, "thumbs_job", None),
+            on_cancel=lambda: setattr(self, "thumbs_job", None)
+        )
 
-    
+    def _forget_thumbnail(self, file_id):
+        if self.thumbs is not None:
+            self.thumbs.forget([file_id])
+
+    def open_preview(self):
+        if self.preview_store is None:
+            self.preview_store = PreviewFrameStore(os.path.join(self.model.dirs["cache"], "preview"))
+        if self.preview_dlg is None:
+            self.preview_dlg = PreviewDialog(self.view)
+            self.preview_dlg.audio_requested.connect(self.load_preview_audio)
+        self.sync_preview()
+        self.preview_dlg.show()
+
+    def sync_preview(self):
+        """
+        Fits the frame store to the current timeline and rebuilds only stale
+        frames. A build still running is cancelled first and the sync re-run
+        once it has stopped, since planning may reassign its slots.
+        """
+        if self.preview_job is not None:
+            self.scheduler.cancel(self.preview_job)
+            self.preview_resync = True
+            return
+        ids = list(self.sorted_ids)
+        transforms = self.model.get_transforms()
+        aspect = AlignmentEngine.reference_aspect(self.model.get_landmarks(), ids)
+        items = [(fid, os.path.join(self.model.dirs["proxies"], f"{fid}.jpg"),
+                  {"transform": transforms[fid], "reference_aspect": aspect} if transforms.get(fid) else "")
+                 for fid in ids]
+        stale = self.preview_store.plan(items)
+
+        durations = VideoRenderer.still_durations(self.preview_schedule, len(ids))
+        self.preview_dlg.set_timeline(lambda i: self.preview_store.frame(ids[i]), durations)
+        if not stale:
+            self.preview_dlg.set_status(f"{len(ids)} frames")
+            return
+
+        store = self.preview_store
+        self.preview_job = self.scheduler.submit(
+            "Build preview",
+            lambda job: store.build(stale, job.cancel_event, lambda done, total: job.report((done, total))),
+            priority=PRIORITY_ANALYSIS,
+            on_done=lambda count: self._on_preview_built(len(ids)),
+            on_error=lambda error: self._on_preview_stopped(),
+            on_cancel=self._on_preview_stopped,
+            on_progress=lambda p: self.preview_dlg.set_status(f"Building preview {p[0]}/{p[1]}...")
+        )
+
+    def _on_preview_built(self, count):
+        if self.preview_resync:
+            self._on_preview_stopped()
+            return
+        self.preview_job = None
+        self.preview_dlg.set_status(f"{count} frames")
+        self.preview_dlg.refresh()
+
+    def _on_preview_stopped(self):
+        self.preview_job = None
+        if self.preview_resync:
+            self.preview_resync = False
+            self.sync_preview()
+
+    def load_preview_audio(self, audio_path):
+        count = len(self.sorted_ids)
+
+        def analyze(job):
+            processor = AudioProcessor(self.model.dirs["cache"])
+            processor.load_audio(audio_path)
+            return processor.get_sync_schedule(count)
+
+        def on_done(schedule):
+            self.preview_schedule = schedule
+            self.sync_preview()
+
+        self.scheduler.submit("Beat analysis", analyze, priority=PRIORITY_ANALYSIS, on_done=on_done)
 
     def open_export_dialog(self):
         self.export_dlg = ExportDialog(self.view)
         self.export_dlg.export_requested.connect(self.start_export)
+        self.export_dlg.audio_selected.connect(self.analyze_export_audio)
+        self.export_dlg.settings_changed.connect(self.update_export_estimate)
+        self.export_durations = VideoRenderer.still_durations(None, len(self.sorted_ids))
+        self.update_export_estimate()
         self.export_dlg.exec()
 
-    def start_export(self, audio_path, preset, fps, is_split):
+    def analyze_export_audio(self, audio_path):
+        """Decodes the soundtrack once (or loads its cached analysis) for the dialog's waveform."""
+        count = len(self.sorted_ids)
+        dialog = self.export_dlg
+
+        def analyze(job):
+            processor = AudioProcessor(self.model.dirs["cache"])
+            processor.load_audio(audio_path)
+            if processor.analysis is None:
+                return None, [], None
+            durations = VideoRenderer.still_durations(processor.get_sync_schedule(count), count)
+            cuts = list(itertools.accumulate(durations))[:-1]
+            return processor.analysis, cuts, durations
+
+        def done(result):
+            analysis, cuts, durations = result
+            dialog.set_waveform(audio_path, analysis, cuts)
+            if dialog is self.export_dlg and durations and audio_path == dialog.selected_audio_path:
+                self.export_durations = durations
+                self.update_export_estimate()
+
+        self.scheduler.submit("Analyze audio", analyze, priority=PRIORITY_INTERACTIVE, on_done=done,
+                              on_error=lambda error: dialog.set_waveform(audio_path, None, []))
+
+    def update_export_estimate(self):
+        """Predicts render time and file size for the dialog's current settings from past exports."""
+        dialog = self.export_dlg
+        presets, fps_list, is_split, transition = dialog.current_settings()
+        if not self.sorted_ids or not presets or not fps_list:
+            dialog.set_estimate(None, 0, False)
+            return
+        targets = build_render_targets("estimate.mp4", presets, fps_list)
+        estimate = RenderCalibration(self.model.dirs["data"]).estimate(
+            len(self.sorted_ids), self.export_durations, targets, is_split, transition, bool(dialog.selected_audio_path))
+        dialog.set_estimate(estimate.seconds, estimate.total_bytes, estimate.calibrated)
+
+    def start_export(self, audio_path, presets, fps_list, is_split, transition="cut"):
         output_path, _ = QFileDialog.getSaveFileName(self.view, "Save Video", "my_timelapse.mp4", "MP4 Video (*.mp4)")
         if not output_path:
             self.export_dlg.btn_export.setEnabled(True)
             return
 
-        
-        photos = [os.path.join(self.model.dirs["proxies"], f"{fid}.jpg") for fid in self.sorted_ids]
-        if not photos: return
-
-        
-        self.render_thread = QThread()
-        
-        self.render_worker = RenderWorker(output_path, photos, audio_path, fps, is_split)
-        self.render_worker.moveToThread(self.render_thread)
-        
-        self.render_worker.progress.connect(self.export_dlg.update_progress)
-        self.render_worker.finished.connect(self.on_export_finished)
-        self.render_thread.started.connect(self.render_worker.run)
-        
-        self.render_worker.finished.connect(self.render_thread.quit)
-        self.render_worker.finished.connect(self.render_worker.deleteLater)
-        self.render_thread.finished.connect(self.render_thread.deleteLater)
-        
-        self.render_thread.start()
-
-    def on_export_finished(self, success):
-        self.export_dlg.export_finished()
+        if not self.sorted_ids: return
+        if self.storage_job is not None:
+            self.scheduler.cancel(self.storage_job)
+        targets = build_render_targets(output_path, presets, fps_list)
+        spec = build_export_job(self.model, self.sorted_ids, targets, audio_path, is_split, transition)
+        self.render_job = self.scheduler.submit(
+            "Export video",
+            lambda job: run_render_job(job, spec),
+            priority=PRIORITY_RENDER,
+            on_done=lambda result: self.on_export_finished(*result),
+            on_error=lambda error: self.on_export_finished(False),
+            on_cancel=lambda: self.on_export_finished(False, True),
+            on_progress=self.on_export_progress
+        )
+        self.export_dlg.cancel_requested.connect(self.cancel_export)
+
+    def cancel_export(self):
+        self.scheduler.cancel(self.render_job)
+
+    def on_export_progress(self, message):
+        if message[0] == "progress":
+            self.export_dlg.update_progress(message[1])
+        elif message[0] == "frames":
+            self.export_dlg.update_stats(*message[1:])
+        elif message[0] == "estimate":
+            self.export_dlg.set_estimate(*message[1:])
+        elif message[0] == "memory":
+            for stage, peaks in message[1].items():
+                print(f"Export Memory: {stage} peak {peaks['rss_peak_mb']:.0f} MB")
+
+    def on_export_finished(self, success, cancelled=False):
+        self.render_job = None
+        self.maintain_storage()
+        self.export_dlg.export_finished(cancelled)
+        if cancelled:
+            return
         if success:
             QMessageBox.information(self.view, "Success", "Video exported successfully!")
         else:
@@ -199,51 +574,222 @@ class AppController:
 
     
     def enter_editor(self, file_id):
+        """
+        Shows the editor immediately from cached pixmaps; the body guide and
+        the neighbouring photos are loaded in the background.
+        """
         self.current_editing_id = file_id
-        active_path = os.path.join(self.model.dirs["proxies"], f"{file_id}.jpg")
-        ghost_path = None
-        if file_id in self.sorted_ids:
-            idx = self.sorted_ids.index(file_id)
-            if idx > 0:
-                prev_id = self.sorted_ids[idx - 1]
-                ghost_path = os.path.join(self.model.dirs["proxies"], f"{prev_id}.jpg")
+        ghost_id = self._neighbor_id(file_id, -1)
 
-        self.view.editor.load_images(active_path, ghost_path)
+        active_pix = self._editor_pixmap(file_id)
+        ghost_pix = self._editor_pixmap(ghost_id) if ghost_id else None
+        self.view.editor.show_pixmaps(active_pix, ghost_pix)
+        self._show_transforms(file_id)
+        self._attach_deep_zoom(file_id)
+        self.view.stack.setCurrentIndex(1)
+        if self.onion_enabled and ghost_id:
+            self._update_onion_ghost(file_id)
         
-        if ghost_path:
-            with Image.open(ghost_path) as img:
-                w, h = img.size
-            landmarks = self.ai_pose.get_landmarks(ghost_path)
-            if landmarks:
-                self.view.editor.draw_skeleton(landmarks, w, h)
-                self.view.editor.chk_skeleton.setChecked(True)
+        if ghost_id:
+            cached = self.prefetcher.landmarks_for(ghost_id)
+            if cached is not None:
+                self._show_skeleton(file_id, cached)
             else:
-                self.view.editor.chk_skeleton.setChecked(False)
-        self.view.stack.setCurrentIndex(1)
+                self.prefetcher.request_landmarks(ghost_id)
+        self._prefetch_neighbors(file_id)
+
+    def step_editor(self, delta):
+        if self.view.stack.currentIndex() != 1: return
+        next_id = self._neighbor_id(self.current_editing_id, delta)
+        if next_id:
+            self.enter_editor(next_id)
+
+    def _neighbor_id(self, file_id, delta):
+        if file_id not in self.sorted_ids:
+            return None
+        idx = self.sorted_ids.index(file_id) + delta
+        if 0 <= idx < len(self.sorted_ids):
+            return self.sorted_ids[idx]
+        return None
+
+    def _show_transforms(self, file_id):
+        ghost_id = self._neighbor_id(file_id, -1)
+        self.view.editor.set_transforms(self.model.get_transform(file_id),
+                                        self.model.get_transform(ghost_id) if ghost_id else None)
+
+    def _editor_pixmap(self, file_id):
+        image = self.prefetcher.image(file_id)
+        if image is not None:
+            return QPixmap.fromImage(image)
+        return QPixmap(self.prefetcher.proxy_path(file_id))
+
+    def _prefetch_neighbors(self, file_id):
+        """Next photo needs this one as its ghost; previous needs the one before it."""
+        for delta in (1, -1, -2):
+            neighbor = self._neighbor_id(file_id, delta)
+            if neighbor:
+                self.prefetcher.request_image(neighbor)
+        self.prefetcher.request_landmarks(file_id)
+        before_prev = self._neighbor_id(file_id, -2)
+        if before_prev:
+            self.prefetcher.request_landmarks(before_prev)
+
+    def on_onion_skin_changed(self, enabled, depth, decay):
+        self.onion_enabled = enabled
+        self.onion.set_params(depth, decay)
+        if not self.current_editing_id:
+            return
+        if enabled:
+            self._update_onion_ghost(self.current_editing_id)
+        else:
+            ghost_id = self._neighbor_id(self.current_editing_id, -1)
+            if ghost_id:
+                self.view.editor.set_ghost_pixmap(self._editor_pixmap(ghost_id))
+
+    def _update_onion_ghost(self, file_id):
+        if file_id not in self.sorted_ids:
+            return
+        idx = self.sorted_ids.index(file_id)
+        window = self.sorted_ids[max(0, idx - self.onion.depth):idx]
+        paths = [os.path.join(self.model.dirs["proxies"], f"{fid}.jpg") for fid in window]
+        if not paths:
+            return
+        stored = self.model.get_transforms()
+        transforms = [stored.get(fid) for fid in window]
+        active = self.view.editor.active_item.pixmap()
+        size = (active.width(), active.height()) if any(transforms) and not active.isNull() else None
+
+        def on_done(blended):
+            if blended is not None and file_id == self.current_editing_id and self.onion_enabled:
+                self.view.editor.set_ghost_pixmap(self._array_to_pixmap(blended), aligned=size is not None)
+
+        self.scheduler.submit("Onion skin", lambda job: self.onion.compose(paths, transforms, size),
+                              priority=PRIORITY_INTERACTIVE, on_done=on_done)
+
+    @staticmethod
+    def _array_to_pixmap(rgb):
+        h, w = rgb.shape[:2]
+        image = QImage(rgb.data, w, h, rgb.strides[0], QImage.Format.Format_RGB888)
+        return QPixmap.fromImage(image)
+
+    def _attach_deep_zoom(self, file_id):
+        """
+        Lets the editor zoom past proxy resolution using tiles of the original,
+        with the proxy's edits (rotation, deflicker) repeated on it. The
+        pyramid is replaced whenever those edits change.
+        Skipped if the proxy still does not have the original's shape.
+        """
+        edits = self.model.get_edit(file_id)
+        pyramid = self.pyramids.get(file_id)
+        if pyramid is not None and pyramid.edits != (dict(edits) if edits else None):
+            self.tile_loader.invalidate(file_id)
+            pyramid = None
+        if pyramid is None:
+            original = self.model.get_original_path(file_id)
+            if original is None:
+                self.view.editor.set_deep_zoom(file_id, None)
+                return
+            try:
+                pyramid = TilePyramid(original, os.path.join(self.model.dirs["cache"], "tiles", file_id), edits)
+            except Exception as e:
+                print(f"Tile Pyramid Error: {e}")
+                self.view.editor.set_deep_zoom(file_id, None)
+                return
+            self.pyramids[file_id] = pyramid
+
+        proxy = self.view.editor.active_item.pixmap()
+        same_shape = proxy.height() > 0 and abs(proxy.width() / proxy.height() - pyramid.width / pyramid.height) < 0.02
+        self.view.editor.set_deep_zoom(file_id, pyramid if same_shape else None)
+
+    def on_tiles_needed(self, keys):
+        self.tile_loader.retain(keys)
+        for key in keys:
+            image = self.tile_loader.tile(key)
+            if image is not None:
+                self.view.editor.show_tile(key, QPixmap.fromImage(image))
+            else:
+                self.tile_loader.request(self.pyramids[key[0]], key)
+
+    def on_tile_ready(self, key):
+        if key[0] == self.current_editing_id:
+            self.view.editor.show_tile(key, QPixmap.fromImage(self.tile_loader.tile(key)))
+
+    def on_landmarks_ready(self, file_id):
+        if file_id == self._neighbor_id(self.current_editing_id, -1):
+            self._show_skeleton(self.current_editing_id, self.prefetcher.landmarks_for(file_id))
+
+    def _show_skeleton(self, file_id, result):
+        if file_id != self.current_editing_id:
+            return
+        landmarks, w, h = result
+        if landmarks:
+            self.view.editor.draw_skeleton(landmarks, w, h)
+            self.view.editor.chk_skeleton.setChecked(True)
+        else:
+            self.view.editor.chk_skeleton.setChecked(False)
 
     def exit_editor(self):
+        self.view.editor.set_deep_zoom(None, None)
+        self.tile_loader.retain([])
         self.view.stack.setCurrentIndex(0)
         self.refresh_grid()
 
     def rotate_image(self):
         if not self.current_editing_id: return
+        if self.current_editing_id in self.commands_in_flight:
+            self.view.status_label.setText("Rotate: wait for the running edit to finish")
+            return
         path = os.path.join(self.model.dirs["proxies"], f"{self.current_editing_id}.jpg")
-        cmd = RotateCommand(path, -90)
+        cmd = RotateCommand(path, -90, self.model)
         self.invoker.execute_command(cmd)
+        self.prefetcher.invalidate(self.current_editing_id)
+        self._forget_thumbnail(self.current_editing_id)
+        self.model.forget_landmarks([self.current_editing_id])
+        self.model.forget_photo_info([self.current_editing_id])
+        self.index_photos()
+        self.onion.invalidate(path)
         self.view.editor.refresh_active(path)
+        self._show_transforms(self.current_editing_id)
+        self._attach_deep_zoom(self.current_editing_id)
 
     def undo_action(self):
         if not self.current_editing_id: return
+        if self.commands_in_flight:
+            self.view.status_label.setText("Undo: wait for the running edit to finish")
+            return
         self.invoker.undo()
+        self.prefetcher.invalidate(self.current_editing_id)
+        self._forget_thumbnail(self.current_editing_id)
+        self.model.forget_landmarks([self.current_editing_id])
+        self.model.forget_photo_info([self.current_editing_id])
+        self.index_photos()
         path = os.path.join(self.model.dirs["proxies"], f"{self.current_editing_id}.jpg")
+        self.onion.invalidate(path)
         self.view.editor.refresh_active(path)
+        self._show_transforms(self.current_editing_id)
+        self._attach_deep_zoom(self.current_editing_id)
 
     def run_auto_align(self):
         if not self.current_editing_id: return
-        path = os.path.join(self.model.dirs["proxies"], f"{self.current_editing_id}.jpg")
-        cmd = AutoAlignCommand(path)
-        self.invoker.execute_command(cmd)
-        self.view.editor.refresh_active(path)
+        cmd = AutoAlignCommand(self.align_engine, [self.current_editing_id], self.sorted_ids,
+                               neighbours=self.ALIGN_NEIGHBOURS)
+        self._run_align("Auto-align", cmd, PRIORITY_INTERACTIVE)
+        self.index_landmarks()
+
+    def run_align_all(self):
+        if not self.sorted_ids: return
+        cmd = AutoAlignCommand(self.align_engine, self.sorted_ids)
+        self._run_align("Align all", cmd, PRIORITY_ANALYSIS)
+
+    def _run_align(self, name, cmd, priority):
+        """Alignment only changes stored transforms, so no cached pixels are invalidated."""
+        def on_done(aligned):
+            self.invoker.push(cmd)
+            self.view.status_label.setText(f"Aligned {len(aligned)} photos")
+            if self.current_editing_id:
+                self._show_transforms(self.current_editing_id)
+
+        self.scheduler.submit(name, lambda job: cmd.execute(), priority=priority, on_done=on_done)
 
     def run_deflicker(self):
         if not self.current_editing_id: return
@@ -256,9 +802,39 @@ class AppController:
                 ghost_path = os.path.join(self.model.dirs["proxies"], f"{prev_id}.jpg")
 
         if ghost_path:
-            cmd = DeflickerCommand(path, ghost_path)
-            self.invoker.execute_command(cmd)
-            self.view.editor.refresh_active(path)
+            cmd = DeflickerCommand(path, ghost_path, self.model)
+            self._run_command("Deflicker", cmd, path)
+
+    def _run_command(self, name, cmd, path):
+        """
+        Executes an editor command off the UI thread. It is recorded for undo
+        right away (Undo waits while it runs), and a photo only ever has one
+        command in flight.
+        """
+        file_id = os.path.splitext(os.path.basename(path))[0]
+        if file_id in self.commands_in_flight:
+            self.view.status_label.setText(f"{name}: wait for the running edit to finish")
+            return
+        self.commands_in_flight[file_id] = cmd
+        self.invoker.push(cmd)
+
+        def on_failed(*args):
+            self.commands_in_flight.pop(file_id, None)
+            self.invoker.discard(cmd)
+
+        def on_done(result):
+            self.commands_in_flight.pop(file_id, None)
+            self.prefetcher.invalidate(file_id)
+            self._forget_thumbnail(file_id)
+            self.model.forget_photo_info([file_id])
+            self.index_photos()
+            self.onion.invalidate(path)
+            if file_id == self.current_editing_id:
+                self.view.editor.refresh_active(path)
+                self._attach_deep_zoom(file_id)
+
+        self.scheduler.submit(name, lambda job: cmd.execute(), priority=PRIORITY_INTERACTIVE, on_done=on_done,
+                              on_error=on_failed, on_cancel=on_failed)
 
     def run_gap_fill(self):
         if not self.current_editing_id: return
@@ -266,17 +842,35 @@ class AppController:
         try: idx = self.sorted_ids.index(self.current_editing_id)
         except ValueError: return
         if idx >= len(self.sorted_ids) - 1: return
+        current_id = self.current_editing_id
         next_id = self.sorted_ids[idx + 1]
 
-        cmd = GenerateGapFillCommand(self.current_editing_id, next_id, self.model.dirs)
-        new_id = cmd.execute() 
-        if new_id:
-            current_date_key = [k for k, v in self.model.db["photos"].items() if v == self.current_editing_id][0]
-            try:
-                dt = datetime.strptime(current_date_key, "%Y-%m-%d %H-%M-%S")
-                new_dt = dt + timedelta(hours=12)
-                new_date_str = new_dt.strftime("%Y-%m-%d %H-%M-%S")
-                self.model.db["photos"][new_date_str] = new_id
-                self.model._save_db()
-            except Exception as e:
-                print(f"DB Update Error: {e}")
\ No newline at end of file
+        cmd = GenerateGapFillCommand(current_id, next_id, self.model.dirs)
+        self.scheduler.submit(
+            "Fill gap",
+            lambda job: cmd.execute(),
+            priority=PRIORITY_INTERACTIVE,
+            on_done=lambda new_id: self._register_gap_fill(current_id, new_id)
+        )
+
+    def _register_gap_fill(self, current_id, new_id):
+        if not new_id:
+            return
+        current_date_key = [k for k, v in self.model.db["photos"].items() if v == current_id][0]
+        try:
+            dt = datetime.strptime(current_date_key[:19], "%Y-%m-%d %H-%M-%S")
+            new_dt = dt + timedelta(hours=12)
+            new_date_str = new_dt.strftime("%Y-%m-%d %H-%M-%S")
+            self.model.add_photos({new_date_str: new_id})
+        except Exception as e:
+            print(f"DB Update Error: {e}")
+
+    def run_batch_gap_fill(self):
+        cmd = BatchGapFillCommand(self.model)
+
+        def on_done(created):
+            self.invoker.push(cmd)
+            self.view.status_label.setText(f"Filled {len(cmd.created)} missing days")
+            self.refresh_grid()
+
+        self.scheduler.submit("Fill all gaps", lambda job: cmd.execute(), priority=PRIORITY_ANALYSIS, on_done=on_done)
@@ -2,7 +2,8 @@ from abc import ABC, abstractmethod
 from PIL import Image
 import os
 import uuid
-from app.model.ai_pose import PoseDetector
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from app.model.image_processor import ImageProcessor
 
 class Command(ABC):
@@ -23,9 +24,18 @@ class CommandInvoker:
 
     def execute_command(self, command):
         command.execute()
+        self.push(command)
+
+    def push(self, command):
+        """Records a command that was already executed (e.g. on a worker thread)."""
         self.history.append(command)
         self.redo_stack.clear() 
 
+    def discard(self, command):
+        """Drops a recorded command that never ran (failed or cancelled)."""
+        if command in self.history:
+            self.history.remove(command)
+
     def undo(self):
         if not self.history:
             return
@@ -43,16 +53,34 @@ class CommandInvoker:
 
 
 class RotateCommand(Command):
-    def __init__(self, file_path, angle):
+    """
+    Rotating changes the proxy's geometry, so its alignment transform (if a
+    'file_manager' is given) no longer fits: it is cleared, and put back on
+    undo. The rotation is also recorded as an edit for the original.
+    """
+    def __init__(self, file_path, angle, file_manager=None):
         self.path = file_path
         self.angle = angle
+        self.manager = file_manager
+        self.file_id = os.path.splitext(os.path.basename(file_path))[0]
+        self.previous_transform = None
+        self.previous_edit = None
 
     def execute(self):
         self._rotate(self.angle)
+        if self.manager is not None:
+            self.previous_transform = self.manager.get_transform(self.file_id)
+            if self.previous_transform is not None:
+                self.manager.set_transforms({self.file_id: None})
+            self.previous_edit = self.manager.record_edits({self.file_id: {"rotation": self.angle}})[self.file_id]
 
     def undo(self):
         
         self._rotate(-self.angle)
+        if self.manager is not None:
+            self.manager.set_edits({self.file_id: self.previous_edit})
+            if self.previous_transform is not None:
+                self.manager.set_transforms({self.file_id: self.previous_transform})
 
     def _rotate(self, angle):
         try:
@@ -63,72 +91,97 @@ class RotateCommand(Command):
             print(f"Rotate Error: {e}")
 
 class AutoAlignCommand(Command):
-    def __init__(self, file_path):
-        self.path = file_path
-        self.detector = PoseDetector()
-        self.backup = None 
+    """
+    Solves alignment for 'file_ids' against the whole timeline and stores
+    the transforms as parameters; the photos themselves are never rewritten.
+    Photos without a face are registered against their neighbours; any that
+    still cannot be aligned keep whatever transform they had.
+    With 'neighbours', faces are only detected in the targets and that many
+    photos either side; the others are solved from cached landmarks.
+    """
+    def __init__(self, engine, file_ids, timeline_ids=None, neighbours=None):
+        self.engine = engine
+        self.file_ids = list(file_ids)
+        self.timeline_ids = list(timeline_ids or file_ids)
+        self.neighbours = neighbours
+        self.applied = None
+        self.previous = {}
 
     def execute(self):
-        
-        try:
-            with Image.open(self.path) as img:
-                self.backup = img.copy()
-        except Exception as e:
-            print(f"Backup failed: {e}")
-            return
+        if self.applied is None:
+            solved = self.engine.align(self.timeline_ids, targets=self.file_ids, detect=self._detect_ids())
+            self.applied = {fid: solved[fid] for fid in self.file_ids if fid in solved}
 
-        
-        current_angle = self.detector.get_eye_angle(self.path)
-        
-        if current_angle is not None:
-            
-            correction = -current_angle
-            print(f"Auto-Align: Correcting by {correction:.2f} degrees")
-            self._rotate(correction)
+        stored = self.engine.manager.get_transforms()
+        self.previous = {fid: stored.get(fid) for fid in self.applied}
+        self.engine.manager.set_transforms(self.applied)
+        if self.applied:
+            print(f"Auto-Align: Aligned {len(self.applied)} of {len(self.file_ids)} photos.")
         else:
-            print("Auto-Align: No eyes detected.")
+            print("Auto-Align: No face detected and registration failed.")
+        return list(self.applied)
 
     def undo(self):
-        
-        if self.backup:
-            try:
-                self.backup.save(self.path, quality=95)
-                print("Auto-Align undone.")
-            except Exception as e:
-                print(f"Undo Error: {e}")
+        if self.previous:
+            self.engine.manager.set_transforms(self.previous)
+            print("Auto-Align undone.")
 
-    def _rotate(self, angle):
-        with Image.open(self.path) as img:
-            
-            rotated = img.rotate(angle, expand=False, resample=Image.BICUBIC)
-            rotated.save(self.path, quality=95)
+    def _detect_ids(self):
+        if self.neighbours is None:
+            return None
+        targets = set(self.file_ids)
+        found = set(targets)
+        for i, fid in enumerate(self.timeline_ids):
+            if fid in targets:
+                found.update(self.timeline_ids[max(0, i - self.neighbours):i + self.neighbours + 1])
+        return [fid for fid in self.timeline_ids if fid in found]
 
 class DeflickerCommand(Command):
-    def __init__(self, active_path, reference_path):
+    """
+    The undo backup is the photo's file as it was on disk: already
+    compressed, and restored byte for byte instead of re-encoded.
+    With a 'file_manager', the correction is also recorded as an edit
+    (exposure levels) for the original.
+    """
+    def __init__(self, active_path, reference_path, file_manager=None):
         self.active = active_path
         self.ref = reference_path
+        self.manager = file_manager
+        self.file_id = os.path.splitext(os.path.basename(active_path))[0]
         self.backup = None 
+        self.previous_edit = None
+        self.recorded = False
 
     def execute(self):
         
         try:
-            with Image.open(self.active) as img:
-                self.backup = img.copy()
+            with open(self.active, "rb") as f:
+                self.backup = f.read()
         except Exception as e:
             print(f"Backup failed: {e}")
             return
 
         
+        levels = ImageProcessor.exposure_levels(self.active, self.ref)
         corrected_img = ImageProcessor.match_histograms(self.active, self.ref)
         if corrected_img:
             corrected_img.save(self.active, quality=95)
+            if self.manager is not None and levels is not None:
+                self.previous_edit = self.manager.record_edits({self.file_id: {"levels": levels}})[self.file_id]
+                self.recorded = True
             print("Deflicker applied.")
 
     def undo(self):
         
         if self.backup:
             try:
-                self.backup.save(self.active, quality=95)
+                tmp_path = self.active + ".undo"
+                with open(tmp_path, "wb") as f:
+                    f.write(self.backup)
+                os.replace(tmp_path, self.active)
+                if self.recorded:
+                    self.manager.set_edits({self.file_id: self.previous_edit})
+                    self.recorded = False
                 print("Deflicker undone.")
             except Exception as e:
                 print(f"Undo Error: {e}")
@@ -167,4 +220,69 @@ class GenerateGapFillCommand(Command):
     def undo(self):
         if self.generated_file_path and os.path.exists(self.generated_file_path):
             os.remove(self.generated_file_path)
-            print("Gap Fill Undone (File Deleted)")
\ No newline at end of file
+            print("Gap Fill Undone (File Deleted)")
+
+class BatchGapFillCommand(Command):
+    """Fills every missing day on the timeline in one undoable step."""
+    CHUNK_SIZE = 16
+
+    def __init__(self, file_manager, max_workers=None):
+        self.manager = file_manager
+        self.max_workers = max_workers or os.cpu_count() or 4
+        self.created = {}
+
+    def execute(self):
+        gaps = self.manager.find_missing_days()
+        if not gaps:
+            print("Gap Fill: Timeline has no missing days.")
+            return {}
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            for entries in pool.map(self._fill_gap, gaps):
+                self.created.update(entries)
+
+        self.manager.add_photos(self.created)
+        print(f"Gap Fill: Generated {len(self.created)} frames across {len(gaps)} gaps.")
+        return dict(self.created)
+
+    def undo(self):
+        if not self.created:
+            return
+        self.manager.remove_photos(self.created.keys())
+        for file_id in self.created.values():
+            path = os.path.join(self.manager.dirs["proxies"], f"{file_id}.jpg")
+            if os.path.exists(path):
+                os.remove(path)
+        print(f"Gap Fill Undone ({len(self.created)} frames deleted)")
+        self.created = {}
+
+    def _fill_gap(self, gap):
+        key_a, key_b, missing_days = gap
+        id_a = self.manager.db["photos"][key_a]
+        id_b = self.manager.db["photos"][key_b]
+        proxies = self.manager.dirs["proxies"]
+        entries = {}
+        try:
+            with Image.open(os.path.join(proxies, f"{id_a}.jpg")) as img:
+                img_a = img.convert("RGB")
+            with Image.open(os.path.join(proxies, f"{id_b}.jpg")) as img:
+                img_b = img.convert("RGB")
+
+            if img_a.size != img_b.size:
+                img_b = img_b.resize(img_a.size, Image.Resampling.LANCZOS)
+
+            a = np.asarray(img_a, dtype=np.float32)
+            b = np.asarray(img_b, dtype=np.float32)
+            count = len(missing_days)
+            time_part = key_a[10:19]
+
+            for start in range(0, count, self.CHUNK_SIZE):
+                stop = min(start + self.CHUNK_SIZE, count)
+                frames = ImageProcessor.interpolate_frames(a, b, count, start, stop)
+                for day, frame in zip(missing_days[start:stop], frames):
+                    new_id = str(uuid.uuid4())
+                    Image.fromarray(frame).save(os.path.join(proxies, f"{new_id}.jpg"), quality=90)
+                    entries[day + time_part] = new_id
+        except Exception as e:
+            print(f"Gap Fill Error: {e}")
+        return entries
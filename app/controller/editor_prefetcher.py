@@ -0,0 +1,101 @@
+import os
+from collections import OrderedDict
+from PyQt6.QtCore import QObject, pyqtSignal
+from PyQt6.QtGui import QImage
+from PIL import Image
+
+from app.controller.job_scheduler import PRIORITY_INTERACTIVE
+
+
+class EditorPrefetcher(QObject):
+    """
+    Loads proxy images and body landmarks for the photos around the one
+    being edited, on the scheduler's interactive class, so stepping
+    through the timeline finds everything already decoded.
+    """
+    image_ready = pyqtSignal(str)
+    landmarks_ready = pyqtSignal(str)
+
+    def __init__(self, scheduler, pose_detector, proxy_dir, capacity=8, landmark_capacity=256):
+        super().__init__()
+        self.scheduler = scheduler
+        self.pose = pose_detector
+        self.proxy_dir = proxy_dir
+        self.capacity = capacity
+        self.landmark_capacity = landmark_capacity
+        self.images = OrderedDict()
+        self.landmarks = OrderedDict()
+        self.pending = {}
+
+    def proxy_path(self, file_id):
+        return os.path.join(self.proxy_dir, f"{file_id}.jpg")
+
+    def image(self, file_id):
+        """Cached QImage for file_id, or None if it has not been loaded yet."""
+        image = self.images.get(file_id)
+        if image is not None:
+            self.images.move_to_end(file_id)
+        return image
+
+    def landmarks_for(self, file_id):
+        """Cached (landmarks, width, height) for file_id, or None."""
+        result = self.landmarks.get(file_id)
+        if result is not None:
+            self.landmarks.move_to_end(file_id)
+        return result
+
+    def request_image(self, file_id):
+        if file_id in self.images or ("image", file_id) in self.pending:
+            return
+        path = self.proxy_path(file_id)
+        self._submit("image", file_id, lambda job: QImage(path), self._store_image)
+
+    def request_landmarks(self, file_id):
+        if file_id in self.landmarks or ("landmarks", file_id) in self.pending:
+            return
+        path = self.proxy_path(file_id)
+        self._submit("landmarks", file_id, lambda job: self._detect(path), self._store_landmarks)
+
+    def invalidate(self, file_id):
+        """Drops cached data for a photo whose proxy was just modified."""
+        self.images.pop(file_id, None)
+        self.landmarks.pop(file_id, None)
+        for key in [("image", file_id), ("landmarks", file_id)]:
+            job = self.pending.pop(key, None)
+            if job is not None:
+                self.scheduler.cancel(job)
+
+    def _submit(self, kind, file_id, fn, store):
+        key = (kind, file_id)
+        self.pending[key] = self.scheduler.submit(
+            f"Prefetch {kind}",
+            fn,
+            priority=PRIORITY_INTERACTIVE,
+            on_done=lambda result: self._finish(key, result, store),
+            on_error=lambda error: self.pending.pop(key, None),
+            on_cancel=lambda: self.pending.pop(key, None)
+        )
+
+    def _finish(self, key, result, store):
+        if self.pending.pop(key, None) is None:
+            return
+        store(key[1], result)
+
+    def _store_image(self, file_id, image):
+        if image is None or image.isNull():
+            return
+        self.images[file_id] = image
+        while len(self.images) > self.capacity:
+            self.images.popitem(last=False)
+        self.image_ready.emit(file_id)
+
+    def _store_landmarks(self, file_id, result):
+        self.landmarks[file_id] = result
+        while len(self.landmarks) > self.landmark_capacity:
+            self.landmarks.popitem(last=False)
+        self.landmarks_ready.emit(file_id)
+
+    def _detect(self, path):
+        with Image.open(path) as img:
+            w, h = img.size
+        return self.pose.get_landmarks(path), w, h
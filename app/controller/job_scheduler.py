@@ -0,0 +1,192 @@
+import itertools
+import threading
+from collections import deque
+from PyQt6.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_INGEST = 1
+PRIORITY_ANALYSIS = 2
+PRIORITY_RENDER = 3
+
+PRIORITY_NAMES = {
+    PRIORITY_INTERACTIVE: "Interactive",
+    PRIORITY_INGEST: "Ingest",
+    PRIORITY_ANALYSIS: "Analysis",
+    PRIORITY_RENDER: "Render",
+}
+
+
+class Job:
+    """A unit of background work. 'fn' is called as fn(job) on a pool thread."""
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    def __init__(self, job_id, name, priority, fn, on_done=None, on_error=None, on_cancel=None, on_progress=None):
+        self.id = job_id
+        self.name = name
+        self.priority = priority
+        self.fn = fn
+        self.on_done = on_done
+        self.on_error = on_error
+        self.on_cancel = on_cancel
+        self.on_progress = on_progress
+        self.state = self.QUEUED
+        self.result = None
+        self.error = None
+        self.cancel_event = threading.Event()
+        self._signals = None
+
+    def is_cancelled(self):
+        return self.cancel_event.is_set()
+
+    def report(self, payload):
+        """Thread-safe progress report; delivered to on_progress on the UI thread."""
+        if self._signals is not None:
+            self._signals.progress.emit(self, payload)
+
+
+class _JobSignals(QObject):
+    finished = pyqtSignal(object)
+    progress = pyqtSignal(object, object)
+
+
+class _JobRunnable(QRunnable):
+    def __init__(self, job):
+        super().__init__()
+        self.job = job
+        self.setAutoDelete(True)
+
+    def run(self):
+        job = self.job
+        try:
+            job.result = job.fn(job)
+            job.state = Job.CANCELLED if job.is_cancelled() and job.result is None else Job.DONE
+        except Exception as e:
+            print(f"Job Error ({job.name}): {e}")
+            job.error = e
+            job.state = Job.FAILED
+        job._signals.finished.emit(job)
+
+
+class JobScheduler(QObject):
+    """
+    Runs background work in priority classes with per-class concurrency limits.
+    Each class has its own slots, so a long import or export can never take
+    the workers that editor interactions need.
+    """
+    queue_changed = pyqtSignal()
+
+    DEFAULT_LIMITS = {
+        PRIORITY_INTERACTIVE: 2,
+        PRIORITY_INGEST: 2,
+        PRIORITY_ANALYSIS: 1,
+        PRIORITY_RENDER: 1,
+    }
+
+    def __init__(self, limits=None):
+        super().__init__()
+        self.limits = dict(self.DEFAULT_LIMITS)
+        if limits:
+            self.limits.update({int(k): int(v) for k, v in limits.items()})
+
+        self.pool = QThreadPool()
+        self.pool.setMaxThreadCount(sum(self.limits.values()))
+        self.pending = {priority: deque() for priority in self.limits}
+        self.running = {}
+        self._ids = itertools.count(1)
+        self._signals = _JobSignals()
+        self._signals.finished.connect(self._on_finished)
+        self._signals.progress.connect(self._on_progress)
+
+    def submit(self, name, fn, priority=PRIORITY_ANALYSIS, on_done=None, on_error=None, on_cancel=None, on_progress=None):
+        job = Job(next(self._ids), name, priority, fn, on_done, on_error, on_cancel, on_progress)
+        job._signals = self._signals
+        self.pending.setdefault(priority, deque()).append(job)
+        self._dispatch()
+        self.queue_changed.emit()
+        return job
+
+    def cancel(self, job):
+        """Drops a queued job, or asks a running job to stop at its next check."""
+        if job is None:
+            return
+        queue = self.pending.get(job.priority)
+        if queue is not None and job in queue:
+            queue.remove(job)
+            job.state = Job.CANCELLED
+            job.cancel_event.set()
+            if job.on_cancel:
+                job.on_cancel()
+            self.queue_changed.emit()
+        elif job.id in self.running:
+            job.cancel_event.set()
+
+    def cancel_job_id(self, job_id):
+        for job in self.jobs():
+            if job.id == job_id:
+                self.cancel(job)
+                return
+
+    def cancel_class(self, priority):
+        for job in list(self.pending.get(priority, ())):
+            self.cancel(job)
+        for job in list(self.running.values()):
+            if job.priority == priority:
+                self.cancel(job)
+
+    def set_limit(self, priority, limit):
+        self.limits[priority] = max(1, int(limit))
+        self.pool.setMaxThreadCount(sum(self.limits.values()))
+        self._dispatch()
+
+    def jobs(self):
+        """Running jobs first, then queued jobs in dispatch order."""
+        queued = [job for priority in sorted(self.pending) for job in self.pending[priority]]
+        return list(self.running.values()) + queued
+
+    def snapshot(self):
+        return [{
+            "id": job.id,
+            "name": job.name,
+            "class": PRIORITY_NAMES.get(job.priority, str(job.priority)),
+            "state": job.state,
+        } for job in self.jobs()]
+
+    def wait_for_done(self, msecs=-1):
+        return self.pool.waitForDone(msecs)
+
+    def _active_count(self, priority):
+        return sum(1 for job in self.running.values() if job.priority == priority)
+
+    def _dispatch(self):
+        for priority in sorted(self.pending):
+            queue = self.pending[priority]
+            while queue and self._active_count(priority) < self.limits.get(priority, 1):
+                job = queue.popleft()
+                job.state = Job.RUNNING
+                self.running[job.id] = job
+                self.pool.start(_JobRunnable(job), -priority)
+
+    def _on_finished(self, job):
+        self.running.pop(job.id, None)
+        try:
+            if job.state == Job.FAILED:
+                if job.on_error:
+                    job.on_error(job.error)
+            elif job.state == Job.CANCELLED:
+                if job.on_cancel:
+                    job.on_cancel()
+            elif job.on_done:
+                job.on_done(job.result)
+        except Exception as e:
+            print(f"Job Callback Error ({job.name}): {e}")
+        self._dispatch()
+        self.queue_changed.emit()
+
+    def _on_progress(self, job, payload):
+        if job.on_progress:
+            job.on_progress(payload)
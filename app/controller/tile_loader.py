@@ -0,0 +1,69 @@
+from collections import OrderedDict
+from PyQt6.QtCore import QObject, pyqtSignal
+from PyQt6.QtGui import QImage
+
+from app.controller.job_scheduler import PRIORITY_INTERACTIVE
+
+
+class TileLoader(QObject):
+    """
+    Decodes deep-zoom tiles on the scheduler's interactive class and keeps
+    the most recently used ones as QImages. Requests for tiles that are no
+    longer visible are cancelled before they start.
+    """
+    tile_ready = pyqtSignal(object)
+    TILE_MB = 0.25
+
+    def __init__(self, scheduler, capacity=256):
+        super().__init__()
+        self.scheduler = scheduler
+        self.capacity = capacity
+        self.tiles = OrderedDict()
+        self.pending = {}
+
+    def tile(self, key):
+        """Cached QImage for key = (file_id, level, col, row), or None."""
+        image = self.tiles.get(key)
+        if image is not None:
+            self.tiles.move_to_end(key)
+        return image
+
+    def request(self, pyramid, key):
+        if key in self.tiles or key in self.pending:
+            return
+        _, level, col, row = key
+        self.pending[key] = self.scheduler.submit(
+            "Load tile",
+            lambda job: self._decode(pyramid, level, col, row),
+            priority=PRIORITY_INTERACTIVE,
+            on_done=lambda image: self._store(key, image),
+            on_error=lambda error: self.pending.pop(key, None),
+            on_cancel=lambda: self.pending.pop(key, None)
+        )
+
+    def retain(self, keys):
+        """Cancels queued requests that are not in 'keys' (e.g. scrolled out of view)."""
+        keys = set(keys)
+        for key in [k for k in self.pending if k not in keys]:
+            job = self.pending.pop(key)
+            self.scheduler.cancel(job)
+
+    def invalidate(self, file_id):
+        for key in [k for k in self.tiles if k[0] == file_id]:
+            del self.tiles[key]
+        for key in [k for k in self.pending if k[0] == file_id]:
+            self.scheduler.cancel(self.pending.pop(key))
+
+    def _store(self, key, image):
+        if self.pending.pop(key, None) is None or image is None:
+            return
+        self.tiles[key] = image
+        while len(self.tiles) > self.capacity:
+            self.tiles.popitem(last=False)
+        self.tile_ready.emit(key)
+
+    @staticmethod
+    def _decode(pyramid, level, col, row):
+        rgb = pyramid.load_tile(level, col, row)
+        h, w = rgb.shape[:2]
+        return QImage(rgb.data, w, h, rgb.strides[0], QImage.Format.Format_RGB888).copy()
@@ -1,20 +1,41 @@
 import sys
-from PyQt6.QtWidgets import QApplication
-from app.view.ui_main import TimeFlowWindow
-from app.controller.app_controller import AppController
+import time
+
+
+class StartupTimer:
+    """Records how long each startup phase takes and prints one report."""
+    def __init__(self):
+        self.start = self.last = time.perf_counter()
+        self.phases = []
+
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def report(self):
+        lines = [f"  {phase:<18}{seconds * 1000:8.1f} ms" for phase, seconds in self.phases]
+        lines.append(f"  {'total':<18}{(self.last - self.start) * 1000:8.1f} ms")
+        print("Startup timing:\n" + "\n".join(lines))
 
 def main():
+    timer = StartupTimer()
+    from PyQt6.QtWidgets import QApplication
     app = QApplication(sys.argv)
-    
-    
-    
-    
+    timer.mark("qt init")
+
+    from app.view.ui_main import TimeFlowWindow
+    timer.mark("view imports")
 
     window = TimeFlowWindow()
-    controller = AppController(window)
-    
     window.show()
+    app.processEvents()
+    timer.mark("first frame")
+
+    from app.controller.app_controller import AppController
+    controller = AppController(window, startup_timer=timer)
+    timer.mark("controller")
     sys.exit(app.exec())
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,46 +1,63 @@
 import numpy as np
-import cv2
 import math
+import threading
 from PIL import Image
 
+from app.model import tracing
 
-try:
-    import mediapipe as mp
-    if not hasattr(mp, 'solutions'):
-        raise ImportError("MediaPipe broken")
-    HAS_AI = True
-except:
-    HAS_AI = False
+
+def _load_mediapipe():
+    try:
+        import mediapipe as mp
+        if not hasattr(mp, 'solutions'):
+            raise ImportError("MediaPipe broken")
+        return mp
+    except:
+        return None
 
 class PoseDetector:
+    """
+    Face/body landmark detection. MediaPipe and OpenCV are imported, and
+    their models built, on the first detection rather than at construction.
+    """
     def __init__(self):
         self.face_mesh = None
         self.pose = None
-        
-        
-        if HAS_AI:
-            try:
-                
-                self.mp_face_mesh = mp.solutions.face_mesh
-                self.face_mesh = self.mp_face_mesh.FaceMesh(
-                    static_image_mode=True,
-                    max_num_faces=1,
-                    refine_landmarks=True,
-                    min_detection_confidence=0.5
-                )
-                
-                
-                self.mp_pose = mp.solutions.pose
-                self.pose = self.mp_pose.Pose(
-                    static_image_mode=True,
-                    model_complexity=1,
-                    min_detection_confidence=0.5
-                )
-            except:
-                print("⚠️ AI Init Failed. Falling back to OpenCV.")
+        self.eye_cascade = None
+        self._loaded = False
+        self._lock = threading.Lock()
 
-        
-        self.eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
+    def _ensure_models(self):
+        with self._lock:
+            if self._loaded:
+                return
+            self._loaded = True
+
+            mp = _load_mediapipe()
+            if mp is not None:
+                try:
+                    
+                    self.mp_face_mesh = mp.solutions.face_mesh
+                    self.face_mesh = self.mp_face_mesh.FaceMesh(
+                        static_image_mode=True,
+                        max_num_faces=1,
+                        refine_landmarks=True,
+                        min_detection_confidence=0.5
+                    )
+                    
+                    
+                    self.mp_pose = mp.solutions.pose
+                    self.pose = self.mp_pose.Pose(
+                        static_image_mode=True,
+                        model_complexity=1,
+                        min_detection_confidence=0.5
+                    )
+                except:
+                    print("⚠️ AI Init Failed. Falling back to OpenCV.")
+
+            
+            import cv2
+            self.eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
 
     
     def get_landmarks(self, image_path):
@@ -48,12 +65,14 @@ class PoseDetector:
         Returns list of (x,y) for body skeleton.
         Used by the Green Wireframe feature.
         """
+        self._ensure_models()
         if not self.pose: return None
         
         try:
             pil_img = Image.open(image_path).convert('RGB')
             np_img = np.array(pil_img)
-            results = self.pose.process(np_img)
+            with self._lock, tracing.span("pose.inference", model="pose"):
+                results = self.pose.process(np_img)
             
             if not results.pose_landmarks:
                 return None
@@ -71,6 +90,7 @@ class PoseDetector:
         """
         Returns angle to rotate face so eyes are horizontal.
         """
+        self._ensure_models()
         
         if self.face_mesh:
             angle = self._get_angle_ai(image_path)
@@ -79,11 +99,64 @@ class PoseDetector:
         
         return self._get_angle_opencv(image_path)
 
+    def get_face_points(self, image_path):
+        """
+        Stable face points for alignment, normalized to the image size:
+        [left eye, right eye, nose tip, mouth left, mouth right, chin].
+        Points that could not be found are None (the OpenCV fallback only
+        finds the eyes). Returns None when no face is found.
+        """
+        self._ensure_models()
+        if self.face_mesh:
+            points = self._face_points_ai(image_path)
+            if points is not None: return points
+        return self._face_points_opencv(image_path)
+
+    def _face_points_ai(self, image_path):
+        try:
+            pil_img = Image.open(image_path).convert('RGB')
+            np_img = np.array(pil_img)
+            with self._lock, tracing.span("pose.inference", model="face_mesh"):
+                results = self.face_mesh.process(np_img)
+
+            if not results.multi_face_landmarks:
+                return None
+
+            lm = results.multi_face_landmarks[0].landmark
+            points = []
+            for group in self.FACE_POINTS:
+                points.append((sum(lm[i].x for i in group) / len(group), sum(lm[i].y for i in group) / len(group)))
+            return points
+        except:
+            return None
+
+    def _face_points_opencv(self, image_path):
+        import cv2
+
+        try:
+            img = cv2.imread(image_path)
+            if img is None: return None
+
+            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            with tracing.span("pose.opencv"):
+                eyes = self.eye_cascade.detectMultiScale(gray, 1.3, 5)
+            if len(eyes) < 2: return None
+
+            eyes = sorted(eyes, key=lambda x: x[0])
+            h, w = img.shape[:2]
+            left = ((eyes[0][0] + eyes[0][2] / 2) / w, (eyes[0][1] + eyes[0][3] / 2) / h)
+            right = ((eyes[-1][0] + eyes[-1][2] / 2) / w, (eyes[-1][1] + eyes[-1][3] / 2) / h)
+            return [left, right, None, None, None, None]
+        except Exception as e:
+            print(f"OpenCV Error: {e}")
+            return None
+
     def _get_angle_ai(self, image_path):
         try:
             pil_img = Image.open(image_path).convert('RGB')
             np_img = np.array(pil_img)
-            results = self.face_mesh.process(np_img)
+            with self._lock, tracing.span("pose.inference", model="face_mesh"):
+                results = self.face_mesh.process(np_img)
 
             if not results.multi_face_landmarks:
                 return None
@@ -99,12 +172,15 @@ class PoseDetector:
             return None
 
     def _get_angle_opencv(self, image_path):
+        import cv2
+
         try:
             img = cv2.imread(image_path)
             if img is None: return None
             
             gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            eyes = self.eye_cascade.detectMultiScale(gray, 1.3, 5)
+            with tracing.span("pose.opencv"):
+                eyes = self.eye_cascade.detectMultiScale(gray, 1.3, 5)
             
             if len(eyes) < 2: return None 
 
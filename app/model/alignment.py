@@ -0,0 +1,248 @@
+import os
+import math
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+
+
+IDENTITY = (1.0, 0.0, 0.0, 0.0)
+
+
+class AlignmentEngine:
+    """
+    Solves one similarity transform (rotation, scale, translation) per photo
+    mapping its cached face points onto a common reference, for the whole
+    timeline in one vectorized least-squares pass.
+    Transforms are [a, b, tx, ty] in units of the photo's width:
+        x' = a*x - b*y + tx,   y' = b*x + a*y + ty
+    so the same parameters apply to proxies and originals alike; pixels are
+    only resampled when a preview or export frame is produced.
+    Photos without a usable face are chained to their aligned neighbours by
+    phase-correlation registration (see PhaseCorrelator).
+    """
+    MAX_ITERATIONS = 100
+    TOLERANCE = 1e-10
+
+    def __init__(self, file_manager, detector):
+        self.manager = file_manager
+        self.detector = detector
+
+    @staticmethod
+    def detect_points(detector, path):
+        """Landmark cache entry for one image: normalized points plus aspect (h / w)."""
+        with Image.open(path) as img:
+            w, h = img.size
+        return {"points": detector.get_face_points(path), "aspect": h / w}
+
+    def collect_landmarks(self, file_ids, cancel_event=None, max_workers=None):
+        """Detects face points for photos not in the landmark cache (one DB write)."""
+        cached = self.manager.get_landmarks()
+        missing = [fid for fid in file_ids if fid not in cached]
+        if missing:
+            proxies = self.manager.dirs["proxies"]
+
+            def work(file_id):
+                if cancel_event is not None and cancel_event.is_set():
+                    return file_id, None
+                try:
+                    return file_id, self.detect_points(self.detector, os.path.join(proxies, f"{file_id}.jpg"))
+                except Exception as e:
+                    print(f"Landmark Error: {e}")
+                    return file_id, None
+
+            with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count() or 4) as pool:
+                found = {fid: entry for fid, entry in pool.map(work, missing) if entry is not None}
+            self.manager.set_landmarks(found)
+            cached = self.manager.get_landmarks()
+        return {fid: cached.get(fid) for fid in file_ids}
+
+    def align(self, file_ids, cancel_event=None, targets=None, detect=None):
+        """
+        Returns {file_id: [a, b, tx, ty]} for every photo that could be aligned.
+        'targets' limits registration to the photos actually being aligned;
+        'detect' limits face detection, the rest use the landmark cache as is.
+        """
+        if detect is None:
+            landmarks = self.collect_landmarks(file_ids, cancel_event)
+        else:
+            self.collect_landmarks(detect, cancel_event)
+            cached = self.manager.get_landmarks()
+            landmarks = {fid: cached.get(fid) for fid in file_ids}
+        transforms = self.solve_landmarks(file_ids, landmarks)
+        if len(transforms) < len(file_ids):
+            self.register_faceless(file_ids, transforms, targets, cancel_event=cancel_event)
+        return transforms
+
+    def register_faceless(self, file_ids, transforms, targets=None, max_workers=None, cancel_event=None):
+        """
+        Fills 'transforms' in place for photos without one: T_i = T_(i-1) * M_i
+        forward along the timeline, where M_i registers photo i onto photo
+        i - 1, then backwards from the next aligned photo for leading ones.
+        With no face anywhere, the first photo is the reference.
+        """
+        from app.model.registration import PhaseCorrelator
+
+        n = len(file_ids)
+        matrices = [self._to_matrix(transforms.get(fid)) for fid in file_ids]
+        if not transforms and n:
+            matrices[0] = np.eye(3)
+
+        faceless = [i for i in range(n) if matrices[i] is None]
+        if targets is not None:
+            targets = set(targets)
+            faceless = self._segments_around(matrices, [i for i, fid in enumerate(file_ids) if fid in targets])
+        needed = {i for j in faceless for i in (j, j + 1)}
+
+        proxies = self.manager.dirs["proxies"]
+        paths = [os.path.join(proxies, f"{fid}.jpg") for fid in file_ids]
+        pairs = PhaseCorrelator().register_sequence(paths, needed, max_workers, cancel_event)
+
+        for i in range(1, n):
+            if matrices[i] is None and matrices[i - 1] is not None and i in pairs:
+                matrices[i] = matrices[i - 1] @ pairs[i][0]
+        for i in range(n - 2, -1, -1):
+            if matrices[i] is None and matrices[i + 1] is not None and i + 1 in pairs:
+                matrices[i] = matrices[i + 1] @ np.linalg.inv(pairs[i + 1][0])
+
+        for i in faceless:
+            m = matrices[i]
+            if m is not None:
+                transforms[file_ids[i]] = [float(m[0, 0]), float(m[1, 0]), float(m[0, 2]), float(m[1, 2])]
+        return transforms
+
+    @staticmethod
+    def reference_aspect(landmarks, file_ids):
+        """
+        Height / width of the reference frame the transforms map into: the
+        median aspect of the photos, so a timeline mixing orientations is
+        framed for most of its photos (see ImageProcessor.fit_to_canvas).
+        Returns None when no aspect is known.
+        """
+        aspects = sorted(entry["aspect"] for entry in (landmarks.get(fid) for fid in file_ids)
+                         if entry and entry.get("aspect"))
+        return aspects[len(aspects) // 2] if aspects else None
+
+    @staticmethod
+    def _segments_around(matrices, indices):
+        """Unaligned photos in the runs (between aligned ones) that contain 'indices'."""
+        found = set()
+        for j in indices:
+            if matrices[j] is not None:
+                continue
+            lo = j
+            while lo > 0 and matrices[lo - 1] is None:
+                lo -= 1
+            hi = j
+            while hi < len(matrices) - 1 and matrices[hi + 1] is None:
+                hi += 1
+            found.update(range(lo, hi + 1))
+        return sorted(found)
+
+    @staticmethod
+    def _to_matrix(transform):
+        if transform is None:
+            return None
+        a, b, tx, ty = transform
+        return np.array([[a, -b, tx], [b, a, ty], [0.0, 0.0, 1.0]])
+
+    @classmethod
+    def solve_landmarks(cls, file_ids, landmarks):
+        sets = []
+        for file_id in file_ids:
+            entry = landmarks.get(file_id) or {}
+            points = entry.get("points") or []
+            aspect = entry.get("aspect", 1.0)
+            sets.append([(p[0], p[1] * aspect) if p is not None else (np.nan, np.nan) for p in points]
+                        or [(np.nan, np.nan)])
+        width = max(len(s) for s in sets)
+        padded = np.full((len(sets), width, 2), np.nan)
+        for i, s in enumerate(sets):
+            padded[i, :len(s)] = s
+
+        params, usable = cls.solve(padded)
+        return {fid: [float(v) for v in params[i]] for i, fid in enumerate(file_ids) if usable[i]}
+
+    @classmethod
+    def solve(cls, point_sets):
+        """
+        point_sets: (N, K, 2) array, NaN where a point is missing.
+        The reference is the mean aligned shape, re-estimated until it stops
+        moving (at most MAX_ITERATIONS times) and kept level (eyes
+        horizontal) at the original mean position and size.
+        Returns: (params (N, 4), usable (N,) bool).
+        """
+        pts = np.asarray(point_sets, dtype=np.float64)
+        present = ~np.isnan(pts).any(axis=2)
+        src = np.nan_to_num(pts)
+        params = np.tile(np.array(IDENTITY), (len(pts), 1))
+
+        usable = present.sum(axis=1) >= 2
+        if not usable.any():
+            return params, usable
+
+        ref, ref_present = cls._mean_shape(src[usable], present[usable])
+        weights = present & ref_present[None, :]
+        usable &= weights.sum(axis=1) >= 2
+        anchor_centroid, anchor_scale = cls._centroid_scale(ref, ref_present)
+
+        src, weights = src[usable], weights[usable].astype(np.float64)
+        ref = cls._level(ref, ref_present, anchor_centroid, anchor_scale)
+        for _ in range(cls.MAX_ITERATIONS):
+            fitted = cls._fit(src, weights, ref)
+            mean, _ = cls._mean_shape(cls.apply(fitted, src), weights > 0)
+            level = cls._level(mean, ref_present, anchor_centroid, anchor_scale)
+            change = np.abs(level - ref)[ref_present].max()
+            ref = level
+            if change < cls.TOLERANCE:
+                break
+        params[usable] = cls._fit(src, weights, ref)
+        return params, usable
+
+    @staticmethod
+    def apply(params, points):
+        """Applies (N, 4) params to (N, K, 2) points."""
+        a, b, tx, ty = (params[:, i, None] for i in range(4))
+        x, y = points[..., 0], points[..., 1]
+        return np.stack([a * x - b * y + tx, b * x + a * y + ty], axis=-1)
+
+    @staticmethod
+    def _fit(src, weights, ref):
+        """Closed-form weighted least-squares similarity for every row at once."""
+        total = weights.sum(axis=1)
+        mean_p = (weights[..., None] * src).sum(axis=1) / total[:, None]
+        mean_q = (weights[..., None] * ref[None]).sum(axis=1) / total[:, None]
+        p = src - mean_p[:, None]
+        q = ref[None] - mean_q[:, None]
+
+        denom = (weights * (p ** 2).sum(axis=2)).sum(axis=1)
+        denom = np.where(denom > 1e-12, denom, 1.0)
+        a = (weights * (p[..., 0] * q[..., 0] + p[..., 1] * q[..., 1])).sum(axis=1) / denom
+        b = (weights * (p[..., 0] * q[..., 1] - p[..., 1] * q[..., 0])).sum(axis=1) / denom
+        tx = mean_q[:, 0] - (a * mean_p[:, 0] - b * mean_p[:, 1])
+        ty = mean_q[:, 1] - (b * mean_p[:, 0] + a * mean_p[:, 1])
+        return np.stack([a, b, tx, ty], axis=1)
+
+    @staticmethod
+    def _mean_shape(points, present):
+        counts = present.sum(axis=0)
+        total = (points * present[..., None]).sum(axis=0)
+        mean = total / np.maximum(counts, 1)[:, None]
+        return mean, counts > 0
+
+    @staticmethod
+    def _centroid_scale(shape, present):
+        pts = shape[present]
+        centroid = pts.mean(axis=0)
+        scale = math.sqrt(((pts - centroid) ** 2).sum(axis=1).mean()) or 1.0
+        return centroid, scale
+
+    @classmethod
+    def _level(cls, shape, present, centroid, scale):
+        current_centroid, current_scale = cls._centroid_scale(shape, present)
+        rel = shape - current_centroid
+        if present[0] and present[1]:
+            eye = rel[1] - rel[0]
+            angle = math.atan2(eye[1], eye[0])
+            c, s = math.cos(-angle), math.sin(-angle)
+            rel = rel @ np.array([[c, s], [-s, c]])
+        return rel * (scale / current_scale) + centroid
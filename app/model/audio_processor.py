@@ -1,46 +1,234 @@
-import librosa
 import numpy as np
 import os
+import hashlib
+
+from app.model import tracing
+from app.model.storage import touch
+
+
+class WaveformPyramid:
+    """
+    Min/max peaks at 'base_bin' samples per bin, halved level by level, so a
+    waveform can be drawn at any zoom by reading about one bin per pixel.
+    """
+    MIN_BINS = 64
+
+    def __init__(self, levels, sr, base_bin):
+        self.levels = levels
+        self.sr = sr
+        self.base_bin = base_bin
+
+    @classmethod
+    def from_base(cls, mins, maxs, sr, base_bin):
+        levels = [(mins, maxs)]
+        while len(mins) > cls.MIN_BINS:
+            if len(mins) % 2:
+                mins, maxs = np.append(mins, mins[-1]), np.append(maxs, maxs[-1])
+            mins = np.minimum(mins[0::2], mins[1::2])
+            maxs = np.maximum(maxs[0::2], maxs[1::2])
+            levels.append((mins, maxs))
+        return cls(levels, sr, base_bin)
+
+    def peak(self):
+        mins, maxs = self.levels[-1]
+        if not len(mins):
+            return 0.0
+        return float(max(-mins.min(), maxs.max()))
+
+    def peaks(self, start, end, columns):
+        """
+        (mins, maxs) for 'columns' equal slices of [start, end] seconds, read
+        from the coarsest level that still has a bin per column.
+        """
+        mins, maxs = self.levels[0]
+        if columns <= 0 or not len(mins) or end <= start:
+            return np.zeros(max(columns, 0), np.float32), np.zeros(max(columns, 0), np.float32)
+
+        samples_per_column = (end - start) * self.sr / columns
+        level = 0
+        while level + 1 < len(self.levels) and self.base_bin * 2 ** (level + 1) <= samples_per_column:
+            level += 1
+        mins, maxs = self.levels[level]
+        bin_samples = self.base_bin * 2 ** level
+
+        edges = np.linspace(start * self.sr / bin_samples, end * self.sr / bin_samples, columns + 1)
+        edges = np.clip(edges.astype(np.int64), 0, len(mins) - 1)
+        starts = edges[:-1]
+        stop = max(int(edges[-1]), int(starts[-1]) + 1)
+        return np.minimum.reduceat(mins[:stop], starts), np.maximum.reduceat(maxs[:stop], starts)
+
+
+class AudioAnalysis:
+    """
+    Everything the UI and the renderer need from a soundtrack, produced by a
+    single streaming decode and persisted as one .npz next to the caches.
+    """
+    def __init__(self, sr, duration, tempo, beat_times, onset_envelope, hop_length, pyramid):
+        self.sr = sr
+        self.duration = duration
+        self.tempo = tempo
+        self.beat_times = beat_times
+        self.onset_envelope = onset_envelope
+        self.hop_length = hop_length
+        self.pyramid = pyramid
+
+    def save(self, path):
+        arrays = {
+            "meta": np.array([self.sr, self.duration, self.tempo, self.hop_length, self.pyramid.base_bin], dtype=np.float64),
+            "beat_times": np.asarray(self.beat_times, dtype=np.float64),
+            "onset_envelope": self.onset_envelope,
+        }
+        for i, (mins, maxs) in enumerate(self.pyramid.levels):
+            arrays[f"min{i}"] = mins
+            arrays[f"max{i}"] = maxs
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            sr, duration, tempo, hop_length, base_bin = data["meta"]
+            levels = []
+            while f"min{len(levels)}" in data:
+                levels.append((data[f"min{len(levels)}"], data[f"max{len(levels)}"]))
+            pyramid = WaveformPyramid(levels, int(sr), int(base_bin))
+            return cls(int(sr), float(duration), float(tempo), data["beat_times"], data["onset_envelope"],
+                       int(hop_length), pyramid)
+
 
 class AudioProcessor:
-    def __init__(self):
+    HOP = 512
+    N_FFT = 2048
+    BLOCK_FRAMES = 256
+    PEAK_BIN = 256
+
+    def __init__(self, cache_dir=None):
         self.audio_path = None
         self.beat_times = []
         self.duration = 0
+        self.analysis = None
+        self.cache_dir = os.path.join(cache_dir, "audio") if cache_dir else None
 
     def load_audio(self, file_path):
         """
-        Loads an audio file and detects beats.
+        Analyzes an audio file (or loads its cached analysis) and detects beats.
         Returns: (duration_in_seconds, estimated_tempo)
         """
         try:
             self.audio_path = file_path
-            
-            
-            
-            y, sr = librosa.load(file_path, sr=None)
-            self.duration = librosa.get_duration(y=y, sr=sr)
-            
-            
-            
-            y_harmonic, y_percussive = librosa.effects.hpss(y)
-            
-            
-            tempo, beat_frames = librosa.beat.beat_track(y=y_percussive, sr=sr)
-            
-            
-            self.beat_times = librosa.frames_to_time(beat_frames, sr=sr)
-            
-            
+            self.analysis = self.analyze(file_path)
+            self.duration = self.analysis.duration
+            self.beat_times = np.asarray(self.analysis.beat_times)
+
             if len(self.beat_times) > 0 and self.beat_times[0] > 1.0:
                self.beat_times = np.insert(self.beat_times, 0, 0.0)
 
-            return self.duration, tempo
+            return self.duration, self.analysis.tempo
 
         except Exception as e:
             print(f"Audio Error: {e}")
             return 0, 0
 
+    def analyze(self, file_path):
+        """
+        One streaming pass over the decoded audio builds the min/max peak
+        pyramid and the onset envelope (log-mel spectral flux) block by block;
+        beats are tracked on the envelope. Blocks are framed uncentered, so
+        the envelope is front-padded to line up with librosa's frame times.
+        The result is cached per file (path, size, mtime).
+        """
+        cache_path = self._cache_path(file_path)
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with tracing.span("audio.cache_load"):
+                    analysis = AudioAnalysis.load(cache_path)
+                touch(cache_path)
+                return analysis
+            except Exception as e:
+                print(f"Audio Cache Error: {e}")
+
+        import librosa
+
+        sr, blocks = self._blocks(file_path)
+        step = self.BLOCK_FRAMES * self.HOP
+        mins, maxs, flux = [], [], []
+        total = 0
+        previous = None
+
+        blocks = iter(blocks)
+        while True:
+            with tracing.span("audio.decode"):
+                block = next(blocks, None)
+            if block is None:
+                break
+            samples = block[:step]
+            total += len(samples)
+            full = len(samples) - len(samples) % self.PEAK_BIN
+            bins = samples[:full].reshape(-1, self.PEAK_BIN)
+            mins.append(bins.min(axis=1))
+            maxs.append(bins.max(axis=1))
+            if full < len(samples):
+                mins.append(samples[full:].min(keepdims=True))
+                maxs.append(samples[full:].max(keepdims=True))
+
+            if len(block) < self.N_FFT:
+                continue
+            with tracing.span("audio.onset"):
+                mel = librosa.feature.melspectrogram(y=block, sr=sr, n_fft=self.N_FFT, hop_length=self.HOP, center=False)
+                db = librosa.power_to_db(mel, top_db=None)
+                prior = db[:, :1] if previous is None else previous
+                flux.append(np.maximum(0.0, np.diff(np.hstack([prior, db]), axis=1)).mean(axis=0))
+                previous = db[:, -1:]
+
+        envelope = np.concatenate([np.zeros(self.N_FFT // (2 * self.HOP))] + flux).astype(np.float32)
+        with tracing.span("audio.beat_track"):
+            tempo, beat_frames = librosa.beat.beat_track(onset_envelope=envelope, sr=sr, hop_length=self.HOP)
+        beat_times = librosa.frames_to_time(beat_frames, sr=sr, hop_length=self.HOP)
+
+        pyramid = WaveformPyramid.from_base(
+            np.concatenate(mins).astype(np.float32) if mins else np.zeros(0, np.float32),
+            np.concatenate(maxs).astype(np.float32) if maxs else np.zeros(0, np.float32),
+            sr, self.PEAK_BIN
+        )
+        analysis = AudioAnalysis(sr, total / sr, float(np.atleast_1d(tempo)[0]), beat_times, envelope, self.HOP, pyramid)
+        if cache_path:
+            analysis.save(cache_path)
+        return analysis
+
+    def _blocks(self, file_path):
+        """
+        (sample_rate, iterator of mono blocks of BLOCK_FRAMES analysis frames).
+        Streams through soundfile where the format allows; otherwise decodes
+        in full and slices the same overlapping blocks.
+        """
+        import librosa
+
+        try:
+            sr = librosa.get_samplerate(file_path)
+            return sr, librosa.stream(file_path, block_length=self.BLOCK_FRAMES, frame_length=self.N_FFT,
+                                      hop_length=self.HOP, mono=True)
+        except Exception:
+            with tracing.span("audio.decode", streamed=False):
+                y, sr = librosa.load(file_path, sr=None, mono=True)
+            step = self.BLOCK_FRAMES * self.HOP
+            overlap = self.N_FFT - self.HOP
+            return sr, (y[i:i + step + overlap] for i in range(0, len(y), step))
+
+    def _cache_path(self, file_path):
+        if not self.cache_dir:
+            return None
+        try:
+            st = os.stat(file_path)
+            signature = f"{os.path.abspath(file_path)}:{st.st_size}:{st.st_mtime_ns}"
+        except OSError:
+            return None
+        os.makedirs(self.cache_dir, exist_ok=True)
+        digest = hashlib.sha1(signature.encode()).hexdigest()[:16]
+        return os.path.join(self.cache_dir, f"{digest}.npz")
+
     def get_sync_schedule(self, num_photos):
         """
         Matches photos to beats.
@@ -2,20 +2,64 @@ import os
 import shutil
 import uuid
 import json
-from datetime import datetime
+import threading
+import multiprocessing as mp
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
 from PIL import Image, ImageOps, ExifTags
-from pillow_heif import register_heif_opener
 
-register_heif_opener()
+from app.model import tracing, memory
+from app.model.scan_index import ScanIndex
+from app.model.storage import StorageManager
+from app.model.image_processor import ImageProcessor
+from app.model.similarity_index import SimilarityIndex
+
+_heif_lock = threading.Lock()
+_heif_registered = False
+
+def register_heif():
+    """Registers the HEIC/HEIF opener with Pillow the first time an original is read."""
+    global _heif_registered
+    with _heif_lock:
+        if not _heif_registered:
+            from pillow_heif import register_heif_opener
+            register_heif_opener()
+            _heif_registered = True
+
+_worker_manager = None
+
+def _init_ingest_worker(root_path):
+    global _worker_manager
+    _worker_manager = FileManager(root_path)
+
+def _prepare_in_worker(file_path):
+    try:
+        return _worker_manager.prepare_photo(file_path)
+    except Exception as e:
+        print(f"Ingest Error ({file_path}): {e}")
+        return None
+    finally:
+        tracing.flush()
 
 class FileManager:
+    PROXY_SIZE = 500
+    IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.heic')
+    INGEST_WORKER_MB = 200
+
     def __init__(self, root_path):
         self.root_path = root_path
         self.dirs = {
             "originals": os.path.join(root_path, "originals"),
             "proxies": os.path.join(root_path, "proxies"),
             "data": os.path.join(root_path, "data"), 
+            "cache": os.path.join(root_path, "cache"),
         }
+        self.proxy_levels = [(self.PROXY_SIZE, self.dirs["proxies"])]
+        self._originals = None
+        self._scan_index = None
+        self._memory_budget = None
+        self._storage = None
+        self._db_lock = threading.RLock()
         self.db_path = os.path.join(self.dirs["data"], "project.json")
         self._init_folders()
         self.db = self._load_db()
@@ -33,30 +77,382 @@ class FileManager:
 
     def _save_db(self):
         """Saves memory state to JSON file."""
-        with open(self.db_path, 'w') as f:
-            json.dump(self.db, f, indent=4)
+        with self._db_lock:
+            tmp_path = self.db_path + ".tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(self.db, f, indent=4)
+            os.replace(tmp_path, self.db_path)
+
+    def get_setting(self, key, default=None):
+        return self.db.get("settings", {}).get(key, default)
+
+    def set_setting(self, key, value):
+        with self._db_lock:
+            self.db.setdefault("settings", {})[key] = value
+            self._save_db()
+
+    @property
+    def memory_budget(self):
+        """The 'memory_budget_mb' setting as a MemoryBudget, unless overridden for this session."""
+        if self._memory_budget is not None:
+            return self._memory_budget
+        return memory.MemoryBudget(self.get_setting(memory.MemoryBudget.SETTING))
+
+    @memory_budget.setter
+    def memory_budget(self, budget):
+        self._memory_budget = budget
+
+    @property
+    def storage(self):
+        """Disk accounting, cache quotas and orphan cleanup for this project."""
+        if self._storage is None:
+            self._storage = StorageManager(self)
+        return self._storage
+
+    def add_photos(self, entries):
+        """Adds many {date_str: file_id} entries with a single DB write."""
+        if not entries:
+            return
+        with self._db_lock:
+            self.db["photos"].update(entries)
+            self._save_db()
+
+    def remove_photos(self, date_keys):
+        """Removes many date entries with a single DB write."""
+        removed = False
+        with self._db_lock:
+            per_photo = [self.db.get(k, {}) for k in ("photo_info", "landmarks", "transforms", "edits")]
+            for key in date_keys:
+                file_id = self.db["photos"].pop(key, None)
+                if file_id is not None:
+                    for table in per_photo:
+                        table.pop(file_id, None)
+                    removed = True
+            if removed:
+                self._save_db()
+
+    def get_timeline(self, best_of_day=False):
+        """
+        Sorted [(date_str, file_id)]. With best_of_day, only the sharpest
+        shot of each calendar day is kept.
+        """
+        photos = self.db["photos"]
+        timeline = [(date_str, photos[date_str]) for date_str in sorted(photos)]
+        if not best_of_day:
+            return timeline
+
+        info = self.db.get("photo_info", {})
+        best = {}
+        for date_str, file_id in timeline:
+            score = (info.get(file_id) or {}).get("sharpness", 0.0)
+            day = date_str[:10]
+            if day not in best or score > best[day][0]:
+                best[day] = (score, date_str, file_id)
+        return [(date_str, file_id) for _, date_str, file_id in sorted(best.values(), key=lambda b: b[1])]
+
+    def similarity_index(self):
+        info = self.db.get("photo_info", {})
+        return SimilarityIndex({fid: i.get("phash") for fid, i in info.items() if i})
+
+    def find_near_duplicates(self, radius=6):
+        """Groups of file ids whose perceptual hashes differ by at most 'radius' bits."""
+        return self.similarity_index().groups(radius)
+
+    def index_missing_info(self, max_workers=None, cancel_event=None):
+        """Computes hash/sharpness for photos ingested before they were recorded."""
+        info = self.db.get("photo_info", {})
+        missing = [fid for fid in self.db["photos"].values() if fid not in info]
+        if not missing:
+            return 0
+
+        def work(file_id):
+            if cancel_event is not None and cancel_event.is_set():
+                return file_id, None
+            return file_id, self._photo_info(os.path.join(self.dirs["proxies"], f"{file_id}.jpg"))
+
+        with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count() or 4) as pool:
+            results = [(fid, i) for fid, i in pool.map(work, missing) if i is not None]
+        with self._db_lock:
+            self.db.setdefault("photo_info", {}).update(results)
+            self._save_db()
+        return len(results)
+
+    def forget_photo_info(self, file_ids):
+        """Drops hash/sharpness after the proxy's pixels changed, so index_missing_info recomputes them."""
+        with self._db_lock:
+            info = self.db.get("photo_info", {})
+            removed = [fid for fid in file_ids if info.pop(fid, None) is not None]
+            if removed:
+                self._save_db()
+
+    def get_landmarks(self):
+        return self.db.get("landmarks", {})
+
+    def set_landmarks(self, entries):
+        """Caches {file_id: {"points", "aspect"}} with a single DB write."""
+        if not entries:
+            return
+        with self._db_lock:
+            self.db.setdefault("landmarks", {}).update(entries)
+            self._save_db()
+
+    def forget_landmarks(self, file_ids):
+        """Drops cached landmarks after the proxy's geometry changed (e.g. rotate)."""
+        with self._db_lock:
+            landmarks = self.db.get("landmarks", {})
+            removed = [fid for fid in file_ids if landmarks.pop(fid, None) is not None]
+            if removed:
+                self._save_db()
+
+    def get_transforms(self):
+        """{file_id: [a, b, tx, ty]} alignment transforms, see AlignmentEngine."""
+        return self.db.get("transforms", {})
+
+    def get_transform(self, file_id):
+        return self.db.get("transforms", {}).get(file_id)
+
+    def set_transforms(self, transforms):
+        """Stores many transforms with a single DB write; a None value removes one."""
+        with self._db_lock:
+            stored = self.db.setdefault("transforms", {})
+            for file_id, transform in transforms.items():
+                if transform is None:
+                    stored.pop(file_id, None)
+                else:
+                    stored[file_id] = list(transform)
+            self._save_db()
+
+    def get_edits(self):
+        """
+        {file_id: {"rotation": degrees, "levels": [gain, offset]}}: edits
+        baked into the proxy that the original does not have yet. Renders
+        and deep zoom repeat them on the original (ImageProcessor.apply_edits).
+        """
+        return self.db.get("edits", {})
+
+    def get_edit(self, file_id):
+        return self.db.get("edits", {}).get(file_id)
+
+    def set_edits(self, edits):
+        """Stores many edit entries with a single DB write; a None value removes one."""
+        with self._db_lock:
+            stored = self.db.setdefault("edits", {})
+            for file_id, edit in edits.items():
+                if not edit:
+                    stored.pop(file_id, None)
+                else:
+                    stored[file_id] = dict(edit)
+            self._save_db()
+
+    def record_edits(self, changes):
+        """
+        Composes {file_id: {"rotation": degrees, "levels": [gain, offset]}}
+        onto the stored edits (rotations add, levels chain), with one DB write.
+        Returns: {file_id: previous entry or None}, for undo via set_edits.
+        """
+        with self._db_lock:
+            stored = self.db.setdefault("edits", {})
+            previous = {}
+            for file_id, change in changes.items():
+                before = stored.get(file_id)
+                previous[file_id] = dict(before) if before else None
+                edit = dict(before or {})
+                rotation = (edit.get("rotation", 0) + change.get("rotation", 0)) % 360
+                if rotation:
+                    edit["rotation"] = rotation
+                else:
+                    edit.pop("rotation", None)
+                if change.get("levels"):
+                    gain, offset = change["levels"]
+                    old_gain, old_offset = edit.get("levels") or (1.0, 0.0)
+                    edit["levels"] = [old_gain * gain, old_offset * gain + offset]
+                if edit:
+                    stored[file_id] = edit
+                else:
+                    stored.pop(file_id, None)
+            self._save_db()
+        return previous
+
+    def get_date_index(self):
+        """
+        Groups the timeline by calendar day.
+        Returns: {"YYYY-MM-DD": [date_str, ...]} with each list sorted.
+        """
+        index = {}
+        for date_str in sorted(self.db["photos"].keys()):
+            index.setdefault(date_str[:10], []).append(date_str)
+        return index
+
+    def find_missing_days(self):
+        """
+        Walks the date index and finds every run of days without a photo.
+        Returns: list of (prev_date_str, next_date_str, [missing "YYYY-MM-DD", ...])
+        """
+        index = self.get_date_index()
+        days = sorted(index.keys())
+        gaps = []
+        for day_a, day_b in zip(days, days[1:]):
+            try:
+                dt_a = datetime.strptime(day_a, "%Y-%m-%d")
+                dt_b = datetime.strptime(day_b, "%Y-%m-%d")
+            except ValueError:
+                continue
+
+            span = (dt_b - dt_a).days
+            if span <= 1:
+                continue
+
+            missing = [(dt_a + timedelta(days=d)).strftime("%Y-%m-%d") for d in range(1, span)]
+            gaps.append((index[day_a][-1], index[day_b][0], missing))
+        return gaps
 
     def ingest_photo(self, file_path):
+        prepared = self.prepare_photo(file_path)
+        self.commit_photos([prepared])
+        return prepared[0], prepared[1]
+
+    def prepare_photo(self, file_path):
+        """
+        Copies the original and writes its proxy without touching the DB, so
+        files can be prepared in parallel (even in other processes) and
+        registered together with commit_photos.
+        Returns: (file_id, date_str, original_file_name, photo_info)
+        """
+        register_heif()
         file_id = str(uuid.uuid4())
         
         
         ext = os.path.splitext(file_path)[1].lower()
         original_dest = os.path.join(self.dirs["originals"], f"{file_id}{ext}")
-        shutil.copy2(file_path, original_dest)
+        with tracing.span("ingest.copy"):
+            shutil.copy2(file_path, original_dest)
 
         
-        date_str = self._get_date_taken(original_dest)
+        with tracing.span("ingest.exif"):
+            date_str = self._get_date_taken(original_dest)
         
         
         proxy_dest = os.path.join(self.dirs["proxies"], f"{file_id}.jpg")
-        self._create_proxy(original_dest, proxy_dest)
-        
-        
-        if date_str:
-            self.db["photos"][date_str] = file_id
-            self._save_db()
-            
-        return file_id, date_str
+        with tracing.span("ingest.proxy"):
+            self._create_proxy(original_dest, proxy_dest)
+
+        with tracing.span("ingest.info"):
+            info = self._photo_info(proxy_dest)
+        tracing.count("ingest.photos")
+        return file_id, date_str, os.path.basename(original_dest), info
+
+    def commit_photos(self, prepared):
+        """
+        Registers results of prepare_photo with a single DB write. Shots that
+        share a timestamp get a ' #n' suffix instead of replacing each other.
+        """
+        with self._db_lock:
+            photos = self.db["photos"]
+            info = self.db.setdefault("photo_info", {})
+            for file_id, date_str, original_name, photo_info in prepared:
+                if self._originals is not None:
+                    self._originals[file_id] = original_name
+                if photo_info:
+                    info[file_id] = photo_info
+                if date_str:
+                    key, n = date_str, 1
+                    while key in photos and photos[key] != file_id:
+                        n += 1
+                        key = f"{date_str} #{n}"
+                    photos[key] = file_id
+            if prepared:
+                self._save_db()
+
+    def _photo_info(self, proxy_path):
+        """Perceptual hash (hex) and sharpness of a proxy, or None."""
+        try:
+            with Image.open(proxy_path) as img:
+                img = img.convert("RGB")
+                return {
+                    "phash": f"{ImageProcessor.perceptual_hash(img):016x}",
+                    "sharpness": round(ImageProcessor.sharpness(img), 2),
+                }
+        except Exception as e:
+            print(f"Photo Info Error: {e}")
+            return None
+
+    def ingest_batch(self, file_paths, max_workers=None, progress_callback=None, cancel_event=None):
+        """
+        Prepares many files on a process pool and commits them all at once.
+        The pool shrinks to what the memory budget allows (each worker
+        decodes a full-size original).
+        Returns: list of (source_path, file_id, date_str) for the photos that were added.
+        """
+        file_paths = list(file_paths)
+        total = len(file_paths)
+        if not total:
+            return []
+
+        workers = self.memory_budget.fit(min(max_workers or os.cpu_count() or 4, total), self.INGEST_WORKER_MB)
+        ctx = mp.get_context("spawn")
+        with tracing.span("ingest.batch", photos=total), memory.stage("ingest.batch"), \
+                ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                                    initializer=_init_ingest_worker, initargs=(self.root_path,)) as pool:
+            futures = [pool.submit(_prepare_in_worker, path) for path in file_paths]
+            for done, future in enumerate(futures, 1):
+                if cancel_event is not None and cancel_event.is_set():
+                    for pending in futures:
+                        pending.cancel()
+                    break
+                future.result()
+                if progress_callback:
+                    progress_callback(done, total)
+
+        results = [(path, f.result()) for path, f in zip(file_paths, futures) if not f.cancelled()]
+        results = [(path, prepared) for path, prepared in results if prepared is not None]
+        self.commit_photos([prepared for _, prepared in results])
+        return [(path, prepared[0], prepared[1]) for path, prepared in results]
+
+    @property
+    def scan_index(self):
+        if self._scan_index is None:
+            self._scan_index = ScanIndex(self.dirs["data"], self.IMAGE_EXTENSIONS)
+        return self._scan_index
+
+    def import_folders(self, folders, max_workers=None, progress_callback=None, cancel_event=None):
+        """
+        Batch-ingests only the files in 'folders' that were not imported before.
+        Returns: same as ingest_batch.
+        """
+        new_paths = self.scan_index.scan(folders, cancel_event)
+        added = self.ingest_batch(new_paths, max_workers, progress_callback, cancel_event)
+        self.scan_index.mark_imported((path, file_id) for path, file_id, _ in added)
+        return added
+
+    def get_original_path(self, file_id):
+        if self._originals is None:
+            self._originals = {os.path.splitext(name)[0]: name for name in os.listdir(self.dirs["originals"])}
+        name = self._originals.get(file_id)
+        return os.path.join(self.dirs["originals"], name) if name else None
+
+    def get_render_source(self, file_id, frame_size):
+        """
+        Picks the cheapest file that still covers 'frame_size' (width, height)
+        once letterboxed: the smallest adequate proxy level, else the original,
+        which the render brings up to date with the proxy's edits (get_edits).
+        """
+        target_w, target_h = frame_size
+        fallback = None
+        for _, folder in sorted(self.proxy_levels):
+            path = os.path.join(folder, f"{file_id}.jpg")
+            if not os.path.exists(path):
+                continue
+            fallback = path
+            try:
+                with Image.open(path) as img:
+                    w, h = img.size
+            except Exception:
+                continue
+            if min(target_w / w, target_h / h) <= 1.0:
+                return path
+
+        original = self.get_original_path(file_id)
+        return original or fallback
 
     def _get_date_taken(self, path):
         """Extracts EXIF Date or returns Today+UniqueTime if missing."""
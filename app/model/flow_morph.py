@@ -0,0 +1,197 @@
+import os
+import hashlib
+import threading
+import cv2
+from collections import OrderedDict
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+from app.model.storage import touch
+
+
+class FlowMorpher:
+    """
+    Builds in-between frames for adjacent stills from dense optical flow.
+    Flow is computed once per pair on downscaled luma and cached in memory
+    (the most recent MEMORY_FLOWS pairs) and optionally on disk, so
+    re-exports only pay for the remapping. With 'flow_paths' the flow is
+    computed on frames in a shared flow space instead of the output frames,
+    so one flow serves every output size.
+    """
+    MEMORY_FLOWS = 64
+
+    def __init__(self, cache_dir=None, flow_width=320, max_workers=None):
+        self.cache_dir = cache_dir
+        self.flow_width = flow_width
+        self.max_workers = max_workers or os.cpu_count() or 4
+        self._flows = OrderedDict()
+        self._flows_lock = threading.Lock()
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def morph_sequence(self, photo_paths, frame_counts, flow_paths=None, mappings=None):
+        """
+        Synthesizes the transitions of a whole timeline in parallel across pairs.
+        frame_counts[i] is the number of in-between frames from photo i to i+1.
+        flow_paths / mappings: optional, one per photo (see morph_frames).
+        Returns: {i: uint8 array (count, h, w, 3)} for every pair with count > 0.
+        """
+        jobs = [(i, photo_paths[i], photo_paths[i + 1], frame_counts[i])
+                for i in range(len(photo_paths) - 1) if frame_counts[i] > 0]
+
+        results = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            futures = {i: pool.submit(self.morph_frames, a, b, count,
+                                      flow_paths[i:i + 2] if flow_paths else None,
+                                      mappings[i:i + 2] if mappings else None)
+                       for i, a, b, count in jobs}
+            for i, future in futures.items():
+                frames = future.result()
+                if frames is not None:
+                    results[i] = frames
+        return results
+
+    def morph_frames(self, path_a, path_b, count, flow_paths=None, mappings=None):
+        """
+        Returns 'count' frames morphing A into B (endpoints excluded),
+        or None if either image cannot be read.
+        flow_paths: the pair as frames in a shared flow space, where the flow
+        is computed (and cached) instead; mappings: per photo, the
+        (scale, x, y) taking its flow-space pixels to its pixels in A/B.
+        """
+        try:
+            img_a = self._read_rgb(path_a)
+            img_b = self._read_rgb(path_b)
+            if img_a is None or img_b is None:
+                return None
+
+            h, w = img_a.shape[:2]
+            if img_b.shape[:2] != (h, w):
+                img_b = cv2.resize(img_b, (w, h), interpolation=cv2.INTER_AREA)
+
+            if flow_paths is not None:
+                flow_ab, flow_ba = self.get_flow(*flow_paths)
+                flow_ab = self._map_flow(flow_ab, mappings[0], mappings[1], w, h)
+                flow_ba = self._map_flow(flow_ba, mappings[1], mappings[0], w, h)
+            else:
+                flow_ab, flow_ba = self.get_flow(path_a, path_b, img_a, img_b)
+                flow_ab = self._upscale_flow(flow_ab, w, h)
+                flow_ba = self._upscale_flow(flow_ba, w, h)
+
+            grid_y, grid_x = np.mgrid[0:h, 0:w].astype(np.float32)
+            ts = np.arange(1, count + 1, dtype=np.float32) / (count + 1)
+
+            map_ax = grid_x[None] - ts[:, None, None] * flow_ab[None, ..., 0]
+            map_ay = grid_y[None] - ts[:, None, None] * flow_ab[None, ..., 1]
+            map_bx = grid_x[None] - (1 - ts)[:, None, None] * flow_ba[None, ..., 0]
+            map_by = grid_y[None] - (1 - ts)[:, None, None] * flow_ba[None, ..., 1]
+
+            frames = np.empty((count, h, w, 3), dtype=np.uint8)
+            for k, t in enumerate(ts):
+                warped_a = cv2.remap(img_a, map_ax[k], map_ay[k], cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+                warped_b = cv2.remap(img_b, map_bx[k], map_by[k], cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+                cv2.addWeighted(warped_a, float(1 - t), warped_b, float(t), 0.0, dst=frames[k])
+            return frames
+
+        except Exception as e:
+            print(f"Morph Error: {e}")
+            return None
+
+    def get_flow(self, path_a, path_b, img_a=None, img_b=None):
+        """Returns (flow A->B, flow B->A) at flow resolution, cached."""
+        key = self._cache_key(path_a, path_b)
+        with self._flows_lock:
+            if key in self._flows:
+                self._flows.move_to_end(key)
+                return self._flows[key]
+
+        cache_path = os.path.join(self.cache_dir, f"{key}.npz") if self.cache_dir else None
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with np.load(cache_path) as data:
+                    flows = (data["ab"].astype(np.float32), data["ba"].astype(np.float32))
+                touch(cache_path)
+                self._remember(key, flows)
+                return flows
+            except Exception as e:
+                print(f"Flow Cache Error: {e}")
+
+        if img_a is None: img_a = self._read_rgb(path_a)
+        if img_b is None: img_b = self._read_rgb(path_b)
+
+        gray_a = self._downscale_gray(img_a)
+        gray_b = self._downscale_gray(img_b)
+        if gray_b.shape != gray_a.shape:
+            gray_b = cv2.resize(gray_b, (gray_a.shape[1], gray_a.shape[0]), interpolation=cv2.INTER_AREA)
+
+        flow_ab = cv2.calcOpticalFlowFarneback(gray_a, gray_b, None, 0.5, 3, 15, 3, 5, 1.2, 0)
+        flow_ba = cv2.calcOpticalFlowFarneback(gray_b, gray_a, None, 0.5, 3, 15, 3, 5, 1.2, 0)
+        flows = (flow_ab, flow_ba)
+        self._remember(key, flows)
+
+        if cache_path:
+            try:
+                np.savez_compressed(cache_path, ab=flow_ab.astype(np.float16), ba=flow_ba.astype(np.float16))
+            except Exception as e:
+                print(f"Flow Cache Error: {e}")
+        return flows
+
+    def _remember(self, key, flows):
+        with self._flows_lock:
+            self._flows[key] = flows
+            while len(self._flows) > self.MEMORY_FLOWS:
+                self._flows.popitem(last=False)
+
+    def _cache_key(self, path_a, path_b):
+        parts = [str(self.flow_width)]
+        for path in (path_a, path_b):
+            try:
+                st = os.stat(path)
+                parts.append(f"{path}:{st.st_size}:{st.st_mtime_ns}")
+            except OSError:
+                parts.append(path)
+        return hashlib.sha1("|".join(parts).encode()).hexdigest()
+
+    def _downscale_gray(self, img):
+        gray = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
+        h, w = gray.shape
+        if w > self.flow_width:
+            scale = self.flow_width / w
+            gray = cv2.resize(gray, (self.flow_width, max(1, int(round(h * scale)))), interpolation=cv2.INTER_AREA)
+        return gray
+
+    @staticmethod
+    def _upscale_flow(flow, w, h):
+        fh, fw = flow.shape[:2]
+        if (fw, fh) == (w, h):
+            return flow
+        scaled = cv2.resize(flow, (w, h), interpolation=cv2.INTER_LINEAR)
+        scaled[..., 0] *= w / fw
+        scaled[..., 1] *= h / fh
+        return scaled
+
+    @staticmethod
+    def _map_flow(flow, src_mapping, dst_mapping, w, h):
+        """
+        Flow from a shared flow space to a (w, h) output: each output pixel is
+        taken back into the source photo's flow space, displaced there, and
+        the landing point mapped out through the destination photo's mapping.
+        """
+        src_scale, src_x, src_y = src_mapping
+        dst_scale, dst_x, dst_y = dst_mapping
+        grid_y, grid_x = np.mgrid[0:h, 0:w].astype(np.float32)
+        flow_x = (grid_x - src_x) / src_scale
+        flow_y = (grid_y - src_y) / src_scale
+        sampled = cv2.remap(flow, flow_x, flow_y, cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+        mapped = np.empty((h, w, 2), dtype=np.float32)
+        mapped[..., 0] = dst_scale * (flow_x + sampled[..., 0]) + dst_x - grid_x
+        mapped[..., 1] = dst_scale * (flow_y + sampled[..., 1]) + dst_y - grid_y
+        return mapped
+
+    @staticmethod
+    def _read_rgb(path):
+        img = cv2.imread(path)
+        if img is None:
+            return None
+        return cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
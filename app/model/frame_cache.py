@@ -0,0 +1,133 @@
+import os
+import json
+import hashlib
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageOps
+
+from app.model import tracing
+from app.model.storage import touch
+from app.model.image_processor import ImageProcessor
+
+
+class FrameCache:
+    """
+    Output-sized, letterboxed copies of timeline photos.
+    Each source is resized once per target size; later exports at the same
+    size reuse the cached JPEG as long as the source file, its alignment
+    transform and its edits (see FileManager.get_edits) are unchanged.
+    """
+    def __init__(self, cache_dir, size, max_workers=None, quality=95):
+        self.size = tuple(size)
+        self.cache_dir = os.path.join(cache_dir, f"{self.size[0]}x{self.size[1]}")
+        self.max_workers = max_workers or os.cpu_count() or 4
+        self.quality = quality
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def prepare(self, source_paths, progress_callback=None, transforms=None, edits=None, reference_aspect=None):
+        """
+        Renders every missing frame in parallel.
+        Returns: list of cached frame paths, in the same order as source_paths.
+        """
+        return self.prepare_all([self], source_paths, progress_callback, self.max_workers, transforms=transforms,
+                                edits=edits, reference_aspect=reference_aspect)[0]
+
+    @staticmethod
+    def prepare_all(caches, source_paths, progress_callback=None, max_workers=None, cancel_event=None, transforms=None,
+                    edits=None, reference_aspect=None):
+        """
+        Fills several caches (one per output size) from a single decode of
+        each source. Sources that every cache already holds are not opened.
+        Once cancel_event is set, remaining sources are skipped.
+        transforms: optional alignment transform per source (None = as is).
+        edits: optional edits per source, applied before the transform.
+        reference_aspect: see ImageProcessor.fit_to_canvas.
+        Returns: one list of frame paths per cache.
+        """
+        results = [[None] * len(source_paths) for _ in caches]
+        total = len(source_paths)
+        max_workers = max_workers or os.cpu_count() or 4
+        transforms = transforms or [None] * total
+        edits = edits or [None] * total
+
+        def work(i):
+            source = source_paths[i]
+            transform = transforms[i]
+            edit = edits[i]
+            if cancel_event is not None and cancel_event.is_set():
+                return i, [source] * len(caches)
+            dests = [cache.path_for(source, transform, edit, reference_aspect) for cache in caches]
+            missing = [(cache, dest) for cache, dest in zip(caches, dests) if not os.path.exists(dest)]
+            for dest in set(dests) - {dest for _, dest in missing}:
+                touch(dest)
+            if missing:
+                try:
+                    largest = (max(cache.size[0] for cache, _ in missing),
+                               max(cache.size[1] for cache, _ in missing))
+                    with tracing.span("frames.decode"):
+                        rgb = FrameCache._decode(source, largest, edit)
+                    for cache, dest in missing:
+                        frame = ImageProcessor.fit_to_canvas(rgb, cache.size, transform=transform,
+                                                             reference_aspect=reference_aspect)
+                        with tracing.span("frames.write"):
+                            cache._write(frame, dest)
+                except Exception as e:
+                    print(f"Frame Cache Error: {e}")
+                    dests = [source if not os.path.exists(dest) else dest for dest in dests]
+            return i, dests
+
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            for done, (i, dests) in enumerate(pool.map(work, range(total)), start=1):
+                for k, dest in enumerate(dests):
+                    results[k][i] = dest
+                if progress_callback:
+                    progress_callback(done, total)
+        return results
+
+    def get(self, source_path, transform=None, edit=None, reference_aspect=None):
+        """Returns the cached frame for source_path, rendering it if needed."""
+        dest = self.path_for(source_path, transform, edit, reference_aspect)
+        if os.path.exists(dest):
+            touch(dest)
+            return dest
+        try:
+            self._render(source_path, dest, transform, edit, reference_aspect)
+            return dest
+        except Exception as e:
+            print(f"Frame Cache Error: {e}")
+            return source_path
+
+    def path_for(self, source_path, transform=None, edit=None, reference_aspect=None):
+        try:
+            st = os.stat(source_path)
+            signature = f"{source_path}:{st.st_size}:{st.st_mtime_ns}"
+        except OSError:
+            signature = source_path
+        if transform is not None:
+            signature += ":" + ",".join(f"{v:.6f}" for v in transform)
+            if reference_aspect:
+                signature += f"@{reference_aspect:.6f}"
+        if edit:
+            signature += ":" + json.dumps(edit, sort_keys=True)
+        digest = hashlib.sha1(signature.encode()).hexdigest()[:16]
+        name = os.path.splitext(os.path.basename(source_path))[0]
+        return os.path.join(self.cache_dir, f"{name}-{digest}.jpg")
+
+    def _render(self, source_path, dest, transform=None, edit=None, reference_aspect=None):
+        rgb = self._decode(source_path, self.size, edit)
+        self._write(ImageProcessor.fit_to_canvas(rgb, self.size, transform=transform,
+                                                 reference_aspect=reference_aspect), dest)
+
+    def _write(self, frame, dest):
+        tmp_path = dest + ".tmp"
+        Image.fromarray(frame).save(tmp_path, "JPEG", quality=self.quality)
+        os.replace(tmp_path, dest)
+
+    @staticmethod
+    def _decode(source_path, size, edit=None):
+        with Image.open(source_path) as img:
+            if img.format == "JPEG":
+                img.draft("RGB", (max(size), max(size)) if edit else size)
+            img = ImageOps.exif_transpose(img)
+            img = ImageProcessor.apply_edits(img, edit)
+            return np.asarray(img.convert("RGB"))
@@ -1,14 +1,18 @@
-import cv2
 import numpy as np
 from PIL import Image
 
+from app.model import tracing
+
 class ImageProcessor:
     @staticmethod
+    @tracing.traced("deflicker.match")
     def match_histograms(source_path, reference_path):
         """
         Adjusts the brightness/contrast of 'source' to match 'reference'.
         Returns: A PIL Image object (corrected).
         """
+        import cv2
+
         try:
             
             src = cv2.imread(source_path)
@@ -17,46 +21,160 @@ class ImageProcessor:
             if src is None or ref is None:
                 return None
 
-            
-            
-            
-            src_yuv = cv2.cvtColor(src, cv2.COLOR_BGR2YUV)
-            ref_yuv = cv2.cvtColor(ref, cv2.COLOR_BGR2YUV)
+            levels = ImageProcessor._luma_levels(src, ref)
+            src_rgb = cv2.cvtColor(src, cv2.COLOR_BGR2RGB)
+            return Image.fromarray(ImageProcessor.apply_levels(src_rgb, levels))
 
-            
-            src_y, src_u, src_v = cv2.split(src_yuv)
-            ref_y, ref_u, ref_v = cv2.split(ref_yuv)
+        except Exception as e:
+            print(f"Deflicker Error: {e}")
+            return None
 
-            
-            
-            
-            
-            src_mean, src_std = cv2.meanStdDev(src_y)
-            ref_mean, ref_std = cv2.meanStdDev(ref_y)
+    @staticmethod
+    def exposure_levels(source_path, reference_path):
+        """
+        The luma gain and offset match_histograms applies to 'source', so the
+        same correction can be repeated on the full-resolution original.
+        Returns: (gain, offset), or None if either image cannot be read.
+        """
+        import cv2
 
-            
-            src_m, src_s = src_mean[0][0], src_std[0][0]
-            ref_m, ref_s = ref_mean[0][0], ref_std[0][0]
+        src = cv2.imread(source_path)
+        ref = cv2.imread(reference_path)
+        if src is None or ref is None:
+            return None
+        return ImageProcessor._luma_levels(src, ref)
 
-            
-            if src_s == 0: src_s = 1.0
+    @staticmethod
+    def _luma_levels(src_bgr, ref_bgr):
+        import cv2
 
-            
-            
-            result_y = (src_y.astype(float) - src_m) * (ref_s / src_s) + ref_m
-            
-            
-            result_y = np.clip(result_y, 0, 255).astype(np.uint8)
+        src_y = cv2.cvtColor(src_bgr, cv2.COLOR_BGR2YUV)[..., 0]
+        ref_y = cv2.cvtColor(ref_bgr, cv2.COLOR_BGR2YUV)[..., 0]
 
-            
-            result_yuv = cv2.merge([result_y, src_u, src_v])
-            result_bgr = cv2.cvtColor(result_yuv, cv2.COLOR_YUV2BGR)
+        src_mean, src_std = cv2.meanStdDev(src_y)
+        ref_mean, ref_std = cv2.meanStdDev(ref_y)
+        src_m, src_s = src_mean[0][0], src_std[0][0]
+        ref_m, ref_s = ref_mean[0][0], ref_std[0][0]
+        if src_s == 0: src_s = 1.0
 
-            
-            
-            result_rgb = cv2.cvtColor(result_bgr, cv2.COLOR_BGR2RGB)
-            return Image.fromarray(result_rgb)
+        gain = ref_s / src_s
+        return float(gain), float(ref_m - src_m * gain)
 
-        except Exception as e:
-            print(f"Deflicker Error: {e}")
-            return None
\ No newline at end of file
+    @staticmethod
+    def apply_levels(rgb, levels):
+        """Scales the luma of an RGB uint8 array by (gain, offset), leaving the chroma alone."""
+        import cv2
+
+        gain, offset = levels
+        yuv = cv2.cvtColor(np.ascontiguousarray(rgb), cv2.COLOR_RGB2YUV)
+        yuv[..., 0] = np.clip(yuv[..., 0].astype(np.float32) * gain + offset, 0, 255).astype(np.uint8)
+        return cv2.cvtColor(yuv, cv2.COLOR_YUV2RGB)
+
+    @staticmethod
+    def apply_edits(img, edits):
+        """
+        Repeats a proxy's edits (see FileManager.get_edits) on a PIL image
+        of the original: the rotation, then the exposure levels.
+        """
+        if not edits:
+            return img
+        rotation = edits.get("rotation", 0) % 360
+        if rotation:
+            img = img.rotate(rotation, expand=True)
+        if edits.get("levels"):
+            img = Image.fromarray(ImageProcessor.apply_levels(np.asarray(img.convert("RGB")), edits["levels"]))
+        return img
+
+    @staticmethod
+    @tracing.traced("gapfill.interpolate")
+    def interpolate_frames(img_a, img_b, count, start=0, stop=None):
+        """
+        Cross-dissolves the in-between frames of an evenly spaced A->B sequence
+        of 'count' frames. 'start'/'stop' select a slice so long gaps can be
+        generated in chunks.
+        Accepts PIL Images or uint8 arrays of the same size.
+        Returns: uint8 array shaped (stop - start, h, w, channels).
+        """
+        stop = count if stop is None else min(stop, count)
+        a = np.asarray(img_a, dtype=np.float32)
+        b = np.asarray(img_b, dtype=np.float32)
+        if stop <= start:
+            return np.empty((0,) + a.shape, dtype=np.uint8)
+
+        weights = np.arange(start + 1, stop + 1, dtype=np.float32) / (count + 1)
+        weights = weights.reshape((-1,) + (1,) * a.ndim)
+
+        frames = a[None] + weights * (b - a)[None]
+        return np.clip(frames + 0.5, 0, 255).astype(np.uint8)
+
+    @staticmethod
+    @tracing.traced("frame.fit")
+    def fit_to_canvas(img, size, out=None, transform=None, reference_aspect=None):
+        """
+        Letterboxes an RGB image into a (width, height) frame, keeping aspect ratio.
+        If 'out' is given (e.g. a view into a larger canvas) it is written in place.
+        'transform' is an alignment [a, b, tx, ty] (see AlignmentEngine) into
+        the reference frame, a rect one unit wide and 'reference_aspect' high
+        (default: this photo's own aspect). That rect is letterboxed instead,
+        so every aligned photo shares one scale and origin per panel whatever
+        its orientation, and the pixels are resampled only once.
+        Returns: uint8 array shaped (height, width, 3).
+        """
+        import cv2
+
+        target_w, target_h = size
+        src = np.asarray(img)
+        h, w = src.shape[:2]
+
+        if out is None:
+            out = np.zeros((target_h, target_w, 3), dtype=np.uint8)
+
+        if transform is not None:
+            a, b, tx, ty = transform
+            aspect = reference_aspect or h / w
+            scale = min(target_w, target_h / aspect)
+            x = (target_w - scale) / 2
+            y = (target_h - scale * aspect) / 2
+            k = scale / w
+            matrix = np.float32([[k * a, -k * b, scale * tx + x],
+                                 [k * b, k * a, scale * ty + y]])
+            interpolation = cv2.INTER_LINEAR if k * np.hypot(a, b) < 1 else cv2.INTER_CUBIC
+            out[:] = cv2.warpAffine(src, matrix, (target_w, target_h), flags=interpolation,
+                                    borderMode=cv2.BORDER_CONSTANT, borderValue=(0, 0, 0))
+            return out
+
+        scale = min(target_w / w, target_h / h)
+        new_w = max(1, min(target_w, int(round(w * scale))))
+        new_h = max(1, min(target_h, int(round(h * scale))))
+        interpolation = cv2.INTER_AREA if scale < 1 else cv2.INTER_CUBIC
+        resized = cv2.resize(src, (new_w, new_h), interpolation=interpolation)
+
+        out[:] = 0
+        x = (target_w - new_w) // 2
+        y = (target_h - new_h) // 2
+        out[y:y + new_h, x:x + new_w] = resized
+        return out
+
+    @staticmethod
+    def perceptual_hash(img, hash_size=8):
+        """
+        64-bit DCT hash of a PIL image: the lowest 8x8 frequencies of a 32x32
+        grayscale copy, thresholded at their median. Near-duplicates differ
+        in only a few bits. Returns: int.
+        """
+        n = hash_size * 4
+        gray = np.asarray(img.convert("L").resize((n, n), Image.Resampling.LANCZOS), dtype=np.float64)
+        k = np.arange(n)
+        basis = np.cos(np.pi * (2 * k[None, :] + 1) * k[:, None] / (2 * n))
+        low = (basis @ gray @ basis.T)[:hash_size, :hash_size].ravel()
+        bits = low > np.median(low[1:])
+        return int("".join("1" if b else "0" for b in bits), 2)
+
+    @staticmethod
+    def sharpness(img):
+        """Variance of the Laplacian of a PIL image; higher means sharper."""
+        gray = np.asarray(img.convert("L"), dtype=np.float32)
+        if gray.shape[0] < 3 or gray.shape[1] < 3:
+            return 0.0
+        lap = gray[1:-1, :-2] + gray[1:-1, 2:] + gray[:-2, 1:-1] + gray[2:, 1:-1] - 4 * gray[1:-1, 1:-1]
+        return float(lap.var())
@@ -0,0 +1,247 @@
+"""Per-stage memory peaks (MemoryMonitor) and the project's soft memory budget (MemoryBudget)."""
+import os
+import sys
+import time
+import threading
+import tracemalloc
+
+from app.model import tracing
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+MB = 2 ** 20
+
+
+def rss_mb():
+    """Resident set size of this process in MB (peak RSS where the current value is unavailable)."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / MB
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / MB
+    except ImportError:
+        pass
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (MB if sys.platform == "darwin" else 1024)
+    return 0.0
+
+
+def children_rss_mb():
+    """Summed resident set size in MB of all processes descended from this one."""
+    try:
+        pids = _descendants()
+        return sum(_statm_rss(pid) for pid in pids) * os.sysconf("SC_PAGE_SIZE") / MB
+    except OSError:
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return 0.0
+    total = 0
+    for child in psutil.Process().children(recursive=True):
+        try:
+            total += child.memory_info().rss
+        except psutil.Error:
+            pass
+    return total / MB
+
+
+def _descendants():
+    children = {}
+    for name in os.listdir("/proc"):
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat", "r") as f:
+                ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+        except (OSError, ValueError, IndexError):
+            continue
+        children.setdefault(ppid, []).append(int(name))
+    found, pending = [], [os.getpid()]
+    while pending:
+        kids = children.get(pending.pop(), [])
+        found.extend(kids)
+        pending.extend(kids)
+    return found
+
+
+def _statm_rss(pid):
+    try:
+        with open(f"/proc/{pid}/statm", "r") as f:
+            return int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def system_memory_mb():
+    """Physical memory of the machine in MB, or None if it cannot be read."""
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / MB
+    except (ValueError, OSError, AttributeError):
+        pass
+    try:
+        import psutil
+        return psutil.virtual_memory().total / MB
+    except ImportError:
+        return None
+
+
+class MemoryBudget:
+    SETTING = "memory_budget_mb"
+
+    def __init__(self, limit_mb=None):
+        self.limit_mb = float(limit_mb) if limit_mb else None
+
+    def headroom_mb(self):
+        """MB left under the budget, or None without a budget."""
+        if self.limit_mb is None:
+            return None
+        return max(0.0, self.limit_mb - rss_mb())
+
+    def fit(self, requested, unit_mb, share=1.0):
+        """
+        How many of 'requested' units of about 'unit_mb' each fit into 'share'
+        of the remaining headroom (between 1 and requested).
+        """
+        requested = max(1, int(requested))
+        headroom = self.headroom_mb()
+        if headroom is None or unit_mb <= 0:
+            return requested
+        return max(1, min(requested, int(headroom * share // unit_mb)))
+
+    def __repr__(self):
+        return f"MemoryBudget({self.limit_mb!r})"
+
+
+def default_budget(fraction=0.5):
+    """A budget of 'fraction' of physical memory, for stages that must stay bounded even without a setting."""
+    total = system_memory_mb()
+    return MemoryBudget(total * fraction if total else None)
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_STAGE = _NullStage()
+
+
+class _Stage:
+    __slots__ = ("monitor", "name", "start")
+
+    def __init__(self, monitor, name):
+        self.monitor = monitor
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.monitor._enter(self.name)
+        return self
+
+    def __exit__(self, *exc):
+        self.monitor._exit(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class MemoryMonitor:
+    INTERVAL = 0.25
+
+    def __init__(self, include_children=False):
+        self.include_children = include_children
+        self.running = False
+        self.stages = {}
+        self._active = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._owns_tracemalloc = False
+
+    def start(self, trace_python=False):
+        if self.running:
+            return
+        self.running = True
+        self._stop.clear()
+        if trace_python and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._owns_tracemalloc = True
+        self._thread = threading.Thread(target=self._sample, name="memory-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if not self.running:
+            return
+        self.running = False
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        if self._owns_tracemalloc:
+            tracemalloc.stop()
+            self._owns_tracemalloc = False
+
+    def stage(self, name):
+        if not self.running:
+            return _NULL_STAGE
+        return _Stage(self, name)
+
+    def report(self):
+        """{stage: {seconds, rss_peak_mb, rss_end_mb[, python_peak_mb]}} for finished stages."""
+        with self._lock:
+            return {name: dict(record) for name, record in self.stages.items()}
+
+    def _enter(self, name):
+        current = self._rss()
+        with self._lock:
+            self._fold_python()
+            self._active[name] = {"rss_peak_mb": current, "python_peak_mb": 0.0}
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+
+    def _exit(self, name, seconds):
+        current = self._rss()
+        with self._lock:
+            self._fold_python()
+            peaks = self._active.pop(name, {"rss_peak_mb": current, "python_peak_mb": 0.0})
+            record = {
+                "seconds": round(seconds, 3),
+                "rss_peak_mb": round(max(peaks["rss_peak_mb"], current), 1),
+                "rss_end_mb": round(current, 1),
+            }
+            if tracemalloc.is_tracing():
+                record["python_peak_mb"] = round(peaks["python_peak_mb"], 1)
+            self.stages[name] = record
+
+    def _rss(self):
+        return rss_mb() + children_rss_mb() if self.include_children else rss_mb()
+
+    def _fold_python(self):
+        if not tracemalloc.is_tracing():
+            return
+        peak = tracemalloc.get_traced_memory()[1] / MB
+        for peaks in self._active.values():
+            peaks["python_peak_mb"] = max(peaks["python_peak_mb"], peak)
+
+    def _sample(self):
+        while not self._stop.wait(self.INTERVAL):
+            current = self._rss()
+            with self._lock:
+                for peaks in self._active.values():
+                    peaks["rss_peak_mb"] = max(peaks["rss_peak_mb"], current)
+            tracing.gauge("memory.rss_mb", round(current, 1))
+
+
+monitor = MemoryMonitor()
+stage = monitor.stage
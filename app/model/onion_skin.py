@@ -0,0 +1,127 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+from PIL import Image
+
+
+class OnionSkinBlender:
+    """
+    Blends the N frames before the active photo with exponentially decaying
+    weights (newest = 1, then decay, decay^2, ...).
+    Decoded frames are cached, and stepping forward one photo updates the
+    running weighted sum instead of recomposing the whole window.
+    Given alignment transforms and the active photo's size, every frame is
+    first warped by its own transform into the active photo's frame (one
+    reference unit = the active photo's width), so the blend is shown as is.
+    """
+    RESYNC_EVERY = 64
+
+    def __init__(self, depth=4, decay=0.6, cache_size=32):
+        self.depth = depth
+        self.decay = decay
+        self.cache_size = cache_size
+        self.frames = OrderedDict()
+        self._lock = threading.Lock()
+        self._reset()
+
+    def set_params(self, depth, decay):
+        with self._lock:
+            self.depth = max(1, int(depth))
+            self.decay = min(max(float(decay), 0.05), 1.0)
+            self._reset()
+
+    def invalidate(self, path):
+        """Drops a cached frame whose file changed on disk."""
+        with self._lock:
+            for key in [k for k in self.frames if k[0] == path]:
+                del self.frames[key]
+            if any(key[0] == path for key in self.window):
+                self._reset()
+
+    def compose(self, paths, transforms=None, size=None):
+        """
+        paths: the frames before the active photo, oldest first.
+        transforms: optional [a, b, tx, ty] per path (None = identity), and
+        size: the active photo's (width, height) they are warped into.
+        Only the last 'depth' entries are used.
+        Returns: uint8 RGB array, or None if nothing could be read.
+        """
+        with self._lock:
+            transforms = list(transforms) if transforms is not None else [None] * len(paths)
+            keys = [(path, tuple(t) if t else None, tuple(size) if size else None)
+                    for path, t in zip(paths, transforms)][-self.depth:]
+            if not keys:
+                return None
+
+            if self._slides_forward(keys):
+                newest = self._frame(keys[-1], self.sum.shape[:2])
+                oldest = self._frame(self.window[0], self.sum.shape[:2])
+                self.sum *= self.decay
+                self.sum -= (self.decay ** self.depth) * oldest
+                self.sum += newest
+                self.steps += 1
+            else:
+                self._full_pass(keys)
+            self.window = keys
+
+            blended = self.sum / self.weight_total
+            return np.clip(blended + 0.5, 0, 255).astype(np.uint8)
+
+    def _slides_forward(self, keys):
+        return (self.sum is not None
+                and len(self.window) == self.depth
+                and len(keys) == self.depth
+                and self.window[1:] == keys[:-1]
+                and self.steps < self.RESYNC_EVERY)
+
+    def _full_pass(self, keys):
+        size = None
+        stack = []
+        for key in reversed(keys):
+            frame = self._frame(key, size)
+            if size is None:
+                size = frame.shape[:2]
+            stack.append(frame)
+
+        weights = self.decay ** np.arange(len(stack), dtype=np.float32)
+        self.sum = np.tensordot(weights, np.stack(stack), axes=1)
+        self.weight_total = float(weights.sum())
+        self.steps = 0
+
+    def _frame(self, key, size=None):
+        frame = self.frames.get(key)
+        if frame is None:
+            path, transform, target = key
+            with Image.open(path) as img:
+                frame = np.asarray(img.convert("RGB"), dtype=np.float32)
+            if target is not None:
+                frame = self._warp(frame, transform, target)
+            self.frames[key] = frame
+            while len(self.frames) > self.cache_size:
+                self.frames.popitem(last=False)
+        else:
+            self.frames.move_to_end(key)
+
+        if size is not None and frame.shape[:2] != size:
+            import cv2
+            frame = cv2.resize(frame, (size[1], size[0]), interpolation=cv2.INTER_AREA)
+        return frame
+
+    @staticmethod
+    def _warp(frame, transform, size):
+        """Maps a frame into a (width, height) canvas where one reference unit is 'width' pixels."""
+        import cv2
+
+        a, b, tx, ty = transform or (1.0, 0.0, 0.0, 0.0)
+        width, height = size
+        k = width / frame.shape[1]
+        matrix = np.float32([[k * a, -k * b, width * tx],
+                             [k * b, k * a, width * ty]])
+        return cv2.warpAffine(frame, matrix, (width, height), flags=cv2.INTER_LINEAR,
+                              borderMode=cv2.BORDER_CONSTANT, borderValue=(0, 0, 0))
+
+    def _reset(self):
+        self.window = []
+        self.sum = None
+        self.weight_total = 1.0
+        self.steps = 0
@@ -0,0 +1,181 @@
+import os
+import json
+import itertools
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+
+from app.model.image_processor import ImageProcessor
+
+
+class PreviewFrameStore:
+    """
+    Preview-resolution timeline frames in one uint8 memory-mapped file
+    (slots x height x width x 3). Each photo owns a slot; a slot is only
+    re-rendered when the signature of its source changes, and the slots of
+    photos that left the timeline are handed to new ones.
+    The file only ever grows, so a build still writing through the previous
+    memory map writes to the same file; callers should still let a build
+    finish (or cancel it) before planning again, since plan() may reassign
+    the slots of removed photos.
+    """
+    def __init__(self, cache_dir, size=(320, 320)):
+        self.cache_dir = cache_dir
+        self.size = tuple(size)
+        self.data_path = os.path.join(cache_dir, "frames.u8")
+        self.index_path = os.path.join(cache_dir, "index.json")
+        self.slots = {}
+        self.signatures = {}
+        self.capacity = 0
+        self.frames = None
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load()
+
+    def plan(self, items):
+        """
+        Assigns slots for new photos (reusing those of photos not in 'items',
+        growing the file if needed) and returns the items whose frames are
+        missing or stale.
+        items: list of (file_id, source_path, extra_key) where extra_key
+        captures edits that do not touch the source file: the alignment
+        {"transform": [a, b, tx, ty], "reference_aspect": r} that build()
+        applies (see ImageProcessor.fit_to_canvas), or "" for none.
+        """
+        live = {item[0] for item in items}
+        with self._lock:
+            for file_id in [fid for fid in self.slots if fid not in live]:
+                del self.slots[file_id]
+                self.signatures.pop(file_id, None)
+            used = set(self.slots.values())
+            free = (slot for slot in itertools.count() if slot not in used)
+            for file_id in live:
+                if file_id not in self.slots:
+                    self.slots[file_id] = next(free)
+            self._ensure_capacity(max(self.slots.values()) + 1 if self.slots else 0)
+            signatures = dict(self.signatures)
+        self._save_index()
+
+        stale = []
+        for item in items:
+            if signatures.get(item[0]) != self._signature(item[1], item[2]):
+                stale.append(item)
+        return stale
+
+    def build(self, stale, cancel_event=None, progress_callback=None, max_workers=None):
+        """Renders stale frames into their slots in parallel. Safe to run off the UI thread."""
+        total = len(stale)
+        done = 0
+
+        def work(item):
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            file_id, path, extra = item
+            signature = self._signature(path, extra)
+            with self._lock:
+                frames = self.frames
+                slot = self.slots.get(file_id)
+            if frames is None or slot is None or slot >= len(frames):
+                return None
+            try:
+                with Image.open(path) as img:
+                    rgb = np.asarray(img.convert("RGB"))
+                alignment = extra or {}
+                ImageProcessor.fit_to_canvas(rgb, self.size, out=frames[slot],
+                                             transform=alignment.get("transform"),
+                                             reference_aspect=alignment.get("reference_aspect"))
+                return file_id, slot, signature
+            except Exception as e:
+                print(f"Preview Error: {e}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count() or 4) as pool:
+            for result in pool.map(work, stale):
+                done += 1
+                if result is not None:
+                    file_id, slot, signature = result
+                    with self._lock:
+                        if self.slots.get(file_id) == slot:
+                            self.signatures[file_id] = signature
+                if progress_callback:
+                    progress_callback(done, total)
+
+        with self._lock:
+            frames = self.frames
+        if frames is not None:
+            frames.flush()
+        self._save_index()
+        return total
+
+    def is_ready(self, file_id):
+        return file_id in self.signatures
+
+    def frame(self, file_id):
+        """View into the memory map for file_id (height x width x 3), or None."""
+        slot = self.slots.get(file_id)
+        if slot is None or self.frames is None or not self.is_ready(file_id):
+            return None
+        return self.frames[slot]
+
+    def forget(self, file_ids):
+        """Marks frames as stale so the next build renders them again."""
+        with self._lock:
+            for file_id in file_ids:
+                self.signatures.pop(file_id, None)
+
+    def _signature(self, path, extra):
+        try:
+            st = os.stat(path)
+            return f"{st.st_size}:{st.st_mtime_ns}:{extra}"
+        except OSError:
+            return None
+
+    def _ensure_capacity(self, needed):
+        """Grows the memory map to hold 'needed' slots; called with the lock held."""
+        if self.frames is not None and needed <= self.capacity:
+            return
+        capacity = max(64, self.capacity)
+        while capacity < needed:
+            capacity *= 2
+
+        w, h = self.size
+        shape = (capacity, h, w, 3)
+        if self.frames is not None:
+            self.frames.flush()
+            self.frames = None
+        with open(self.data_path, "r+b" if os.path.exists(self.data_path) else "w+b") as f:
+            f.truncate(int(np.prod(shape)))
+        self.frames = np.memmap(self.data_path, dtype=np.uint8, mode="r+", shape=shape)
+        self.capacity = capacity
+
+    def _load(self):
+        if not os.path.exists(self.index_path) or not os.path.exists(self.data_path):
+            return
+        try:
+            with open(self.index_path, "r") as f:
+                index = json.load(f)
+            if tuple(index.get("size", ())) != self.size:
+                return
+            self.slots = index.get("slots", {})
+            self.signatures = index.get("signatures", {})
+            self.capacity = index.get("capacity", 0)
+            if self.capacity:
+                w, h = self.size
+                self.frames = np.memmap(self.data_path, dtype=np.uint8, mode="r+", shape=(self.capacity, h, w, 3))
+        except Exception as e:
+            print(f"Preview Index Error: {e}")
+            self.slots, self.signatures, self.capacity, self.frames = {}, {}, 0, None
+
+    def _save_index(self):
+        with self._lock:
+            index = {
+                "size": list(self.size),
+                "capacity": self.capacity,
+                "slots": dict(self.slots),
+                "signatures": dict(self.signatures),
+            }
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self.index_path)
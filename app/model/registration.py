@@ -0,0 +1,176 @@
+import os
+import math
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+
+
+class PhaseCorrelator:
+    """
+    Fourier-Mellin registration between consecutive photos, for frames
+    where no face can be found. Rotation and scale come from phase
+    correlation of log-polar magnitude spectra; translation from phase
+    correlation of the de-rotated images. Everything runs on downscaled
+    luma padded to a SIZE x SIZE square.
+    Each frame's spectra are computed once and shared by the pairs on both
+    sides of it.
+    """
+    SIZE = 256
+    CHUNK = 32
+    MIN_PEAK = 0.05
+
+    def __init__(self, size=SIZE):
+        self.size = size
+        self.window = np.outer(np.hanning(size), np.hanning(size)).astype(np.float32)
+        freq = np.cos(np.pi * np.fft.fftshift(np.fft.fftfreq(size)))
+        x = freq[:, None] * freq[None, :]
+        self.highpass = ((1.0 - x) * (2.0 - x)).astype(np.float32)
+        self.log_scale = size / math.log(size / 2)
+        self.center = np.array([size / 2, size / 2])
+
+    def register_sequence(self, paths, needed, max_workers=None, cancel_event=None):
+        """
+        Registers photo i against photo i - 1 for every i in 'needed',
+        streaming through the timeline in chunks so only a chunk's spectra
+        are held in memory at once.
+        Returns: {i: (3x3 matrix mapping photo i's width units onto photo i - 1's, peak)}.
+        """
+        needed = sorted(i for i in set(needed) if 0 < i < len(paths))
+        results = {}
+        spectra = {}
+
+        with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count() or 4) as pool:
+            for start in range(0, len(needed), self.CHUNK):
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                chunk = needed[start:start + self.CHUNK]
+                frames = sorted({j for i in chunk for j in (i - 1, i)} - set(spectra))
+                spectra.update(zip(frames, pool.map(self._safe_spectra, [paths[j] for j in frames])))
+
+                pairs = [(spectra[i - 1], spectra[i]) for i in chunk]
+                for i, result in zip(chunk, pool.map(lambda pair: self._safe_register(*pair), pairs)):
+                    if result is not None:
+                        results[i] = result
+
+                last = chunk[-1]
+                spectra = {last: spectra[last]}
+        return results
+
+    def spectra(self, path):
+        """
+        Per-frame data: (square luma, FFT of the windowed square,
+        FFT of its log-polar magnitude spectrum, image width in square
+        pixels, image offset in the square).
+        """
+        size = self.size
+        with Image.open(path) as img:
+            img.draft("L", (size, size))
+            gray = img.convert("L")
+        w, h = gray.size
+        k = size / max(w, h)
+        new_w, new_h = max(1, round(w * k)), max(1, round(h * k))
+        luma = np.asarray(gray.resize((new_w, new_h), Image.Resampling.BILINEAR), dtype=np.float32)
+
+        square = np.full((size, size), luma.mean(), dtype=np.float32)
+        ox, oy = (size - new_w) // 2, (size - new_h) // 2
+        square[oy:oy + new_h, ox:ox + new_w] = luma
+
+        spectrum = self._fft(square)
+        return square, spectrum, self._log_polar_fft(spectrum), new_w, (ox, oy)
+
+    def register(self, frame_a, frame_b):
+        """
+        Similarity mapping frame_b's width units onto frame_a's, or None when
+        the correlation peak is too weak to trust. The magnitude spectrum is
+        symmetric, so the angle is only known up to 180 degrees; both
+        candidates are tried and the stronger translation peak wins.
+        Returns: (3x3 matrix, peak).
+        """
+        import cv2
+
+        square_b = frame_b[0]
+        d_angle, d_log, _ = self._correlate(frame_a[2], frame_b[2])
+        theta = d_angle * 2 * math.pi / self.size
+        scale = math.exp(-d_log / self.log_scale)
+
+        best = None
+        for angle in (theta, theta + math.pi):
+            rs = scale * self._rotation(angle)
+            inverse = np.hstack([rs, (self.center - rs @ self.center)[:, None]])
+            derotated = cv2.warpAffine(square_b, inverse, (self.size, self.size),
+                                       flags=cv2.INTER_LINEAR | cv2.WARP_INVERSE_MAP,
+                                       borderMode=cv2.BORDER_REPLICATE)
+            dy, dx, peak = self._correlate(frame_a[1], self._fft(derotated))
+            if best is None or peak > best[0]:
+                best = (peak, rs, np.array([dx, dy]))
+
+        peak, rs, shift = best
+        if peak < self.MIN_PEAK:
+            return None
+
+        warp = np.eye(3)
+        warp[:2, :2] = rs
+        warp[:2, 2] = self.center - rs @ self.center + rs @ shift
+        matrix = np.linalg.inv(self._placement(frame_a)) @ np.linalg.inv(warp) @ self._placement(frame_b)
+        return matrix, float(peak)
+
+    def _safe_spectra(self, path):
+        try:
+            return self.spectra(path)
+        except Exception as e:
+            print(f"Registration Error: {e}")
+            return None
+
+    def _safe_register(self, frame_a, frame_b):
+        if frame_a is None or frame_b is None:
+            return None
+        try:
+            return self.register(frame_a, frame_b)
+        except Exception as e:
+            print(f"Registration Error: {e}")
+            return None
+
+    def _fft(self, square):
+        return np.fft.fft2((square - square.mean()) * self.window).astype(np.complex64)
+
+    def _log_polar_fft(self, spectrum):
+        import cv2
+
+        magnitude = (np.abs(np.fft.fftshift(spectrum)) * self.highpass).astype(np.float32)
+        polar = cv2.warpPolar(magnitude, (self.size, self.size), (self.size / 2, self.size / 2), self.size / 2,
+                              cv2.INTER_LINEAR | cv2.WARP_POLAR_LOG)
+        return np.fft.fft2(polar).astype(np.complex64)
+
+    def _correlate(self, spectrum_a, spectrum_b):
+        """
+        Phase correlation. Returns (dy, dx, peak) with b(x) ~ a(x - d), to
+        sub-pixel precision; peak near 1 means a confident match.
+        """
+        n = self.size
+        cross = spectrum_b * np.conj(spectrum_a)
+        cross /= np.abs(cross) + 1e-9
+        surface = np.fft.ifft2(cross).real
+        py, px = np.unravel_index(int(np.argmax(surface)), surface.shape)
+        peak = surface[py, px]
+
+        dy = py + self._subpixel(surface[(py - 1) % n, px], peak, surface[(py + 1) % n, px])
+        dx = px + self._subpixel(surface[py, (px - 1) % n], peak, surface[py, (px + 1) % n])
+        if dy > n / 2: dy -= n
+        if dx > n / 2: dx -= n
+        return dy, dx, peak
+
+    @staticmethod
+    def _subpixel(left, center, right):
+        denom = left - 2 * center + right
+        return 0.0 if abs(denom) < 1e-12 else 0.5 * (left - right) / denom
+
+    @staticmethod
+    def _rotation(angle):
+        c, s = math.cos(angle), math.sin(angle)
+        return np.array([[c, -s], [s, c]])
+
+    @staticmethod
+    def _placement(frame):
+        """Maps width units of the photo to pixels of its padded square."""
+        width, (ox, oy) = frame[3], frame[4]
+        return np.array([[width, 0.0, ox], [0.0, width, oy], [0.0, 0.0, 1.0]])
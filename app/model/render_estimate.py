@@ -0,0 +1,152 @@
+"""Export time and size prediction, calibrated from past renders."""
+import os
+import json
+
+from app.model.video_renderer import VideoRenderer
+
+
+class RenderEstimate:
+    def __init__(self, assembly_seconds, audio_seconds, encode_seconds, frames, sizes, calibrated):
+        self.assembly_seconds = assembly_seconds
+        self.audio_seconds = audio_seconds
+        self.encode_seconds = encode_seconds
+        self.frames = frames
+        self.sizes = sizes
+        self.calibrated = calibrated
+
+    @property
+    def seconds(self):
+        return self.assembly_seconds + self.audio_seconds + self.encode_seconds
+
+    @property
+    def total_bytes(self):
+        return sum(self.sizes)
+
+    @property
+    def encode_rate(self):
+        """Predicted frames per second across all targets."""
+        return self.frames / self.encode_seconds if self.encode_seconds > 0 else 0.0
+
+    def remaining_before_encode(self, assembled_fraction):
+        """Seconds left while frames are still being assembled."""
+        return self.assembly_seconds * (1.0 - assembled_fraction) + self.audio_seconds + self.encode_seconds
+
+
+class RenderCalibration:
+    FILE_NAME = "render_calibration.json"
+    SMOOTHING = 0.3
+    AUDIO_BYTES_PER_SECOND = 192000 / 8
+    DEFAULT_PIXELS = 1920 * 1080
+    DEFAULTS = {
+        "seconds_per_photo": 0.05,
+        "pixels_per_second": 1920 * 1080 * 60.0,
+        "bytes_per_pixel_frame": 0.01,
+        "audio_seconds": 2.0,
+    }
+
+    def __init__(self, data_dir):
+        self.path = os.path.join(data_dir, self.FILE_NAME)
+        self.entries = self._load()
+
+    def estimate(self, photo_count, durations, targets, split_screen=False, transition="cut", audio=False):
+        """Predicted RenderEstimate for rendering 'targets' from a timeline with these still durations."""
+        total_duration = float(sum(durations))
+        mode = self._mode_key(transition, split_screen)
+
+        frames = 0
+        pixel_frames = 0
+        sizes = []
+        for target in targets:
+            count = VideoRenderer._frame_count(total_duration, target.fps)
+            key = self._target_key(target.resolution, target.fps, mode)
+            pixels = self._pixels(target.resolution, key)
+            frames += count
+            pixel_frames += count * pixels
+            bytes_per_pixel_frame = self._value("bytes_per_pixel_frame", key, mode)
+            size = count * pixels * bytes_per_pixel_frame
+            if audio:
+                size += total_duration * self.AUDIO_BYTES_PER_SECOND
+            sizes.append(int(size))
+
+        return RenderEstimate(
+            photo_count * self._value("seconds_per_photo", "assembly"),
+            self._value("audio_seconds", "audio") if audio else 0.0,
+            pixel_frames / self._value("pixels_per_second", mode),
+            frames,
+            sizes,
+            mode in self.entries,
+        )
+
+    def record(self, stats, split_screen=False, transition="cut"):
+        """Folds the stats of a finished VideoRenderer.render into the calibration and saves it."""
+        mode = self._mode_key(transition, split_screen)
+        if stats.get("photos") and stats.get("assembly_seconds") is not None:
+            self._update("assembly", "seconds_per_photo", stats["assembly_seconds"] / stats["photos"])
+        if stats.get("audio_seconds") is not None:
+            self._update("audio", "audio_seconds", stats["audio_seconds"])
+
+        targets = stats.get("targets", [])
+        pixel_frames = sum(t["frames"] * t["width"] * t["height"] for t in targets)
+        if pixel_frames and stats.get("encode_seconds"):
+            self._update(mode, "pixels_per_second", pixel_frames / stats["encode_seconds"])
+        for t in targets:
+            if not t["frames"] or not t.get("bytes"):
+                continue
+            pixels = t["width"] * t["height"]
+            rate = t["bytes"] / (t["frames"] * pixels)
+            self._update(mode, "bytes_per_pixel_frame", rate)
+            key = self._target_key(t.get("resolution"), t["fps"], mode)
+            self._update(key, "bytes_per_pixel_frame", rate)
+            if not t.get("resolution"):
+                self.entries[key]["pixels"] = pixels
+        self._save()
+
+    def _value(self, metric, *keys):
+        for key in keys:
+            value = self.entries.get(key, {}).get(metric)
+            if value:
+                return value
+        return self.DEFAULTS[metric]
+
+    def _update(self, key, metric, value):
+        entry = self.entries.setdefault(key, {"samples": 0})
+        previous = entry.get(metric)
+        entry[metric] = value if previous is None else previous + self.SMOOTHING * (value - previous)
+        entry["samples"] += 1
+
+    @staticmethod
+    def _target_key(resolution, fps, mode):
+        """Source-sized targets share one key, whatever size the photos turned out to be."""
+        if not resolution:
+            return f"source@{fps}/{mode}"
+        w, h = resolution
+        return f"{w}x{h}@{fps}/{mode}"
+
+    def _pixels(self, resolution, key):
+        if not resolution:
+            return self.entries.get(key, {}).get("pixels") or self.DEFAULT_PIXELS
+        w, h = resolution
+        return w * h
+
+    @staticmethod
+    def _mode_key(transition, split_screen):
+        return f"{transition}/{'split' if split_screen else 'full'}"
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Calibration Error: {e}")
+            return {}
+
+    def _save(self):
+        try:
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(self.entries, f, indent=2)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            print(f"Calibration Error: {e}")
@@ -0,0 +1,237 @@
+import os
+import re
+import time
+import multiprocessing as mp
+
+from app.model import tracing, memory
+from app.model.alignment import AlignmentEngine
+from app.model.video_renderer import VideoRenderer, RenderTarget
+
+
+def preset_slug(preset):
+    """'TikTok/Reels (1080x1920)' -> 'tiktok_reels'; used in file names and on the command line."""
+    return re.sub(r"[^a-z0-9]+", "_", preset.split(" (")[0].lower()).strip("_")
+
+
+def build_render_targets(output_path, presets, fps_list):
+    """One target per preset/fps pair; extra outputs get a suffixed file name."""
+    combos = [(preset, fps) for preset in presets for fps in fps_list]
+    if len(combos) == 1:
+        preset, fps = combos[0]
+        return [RenderTarget(output_path, VideoRenderer.PRESET_RESOLUTIONS.get(preset), fps)]
+
+    base, ext = os.path.splitext(output_path)
+    targets = []
+    for preset, fps in combos:
+        path = f"{base}_{preset_slug(preset)}_{fps}fps{ext or '.mp4'}"
+        targets.append(RenderTarget(path, VideoRenderer.PRESET_RESOLUTIONS.get(preset), fps))
+    return targets
+
+
+def build_export_job(file_manager, file_ids, targets, audio_path=None, split_screen=False, transition="cut"):
+    """
+    Job description for run_export_job. Sources are the cheapest files that
+    still cover the largest panel among the targets; alignment transforms
+    travel alongside and are applied when the frames are letterboxed, as do
+    the proxy edits for every photo rendered from its original.
+    """
+    panel_sizes = [VideoRenderer.panel_size_for(t.resolution, split_screen) for t in targets if t.resolution]
+    if panel_sizes:
+        largest = (max(w for w, _ in panel_sizes), max(h for _, h in panel_sizes))
+        photos = [file_manager.get_render_source(fid, largest) for fid in file_ids]
+    else:
+        photos = [os.path.join(file_manager.dirs["proxies"], f"{fid}.jpg") for fid in file_ids]
+    stored = file_manager.get_transforms()
+    transforms = [stored.get(fid) for fid in file_ids]
+    reference_aspect = AlignmentEngine.reference_aspect(file_manager.get_landmarks(), file_ids) if any(transforms) else None
+    stored_edits = file_manager.get_edits()
+    edits = [stored_edits.get(fid) if path == file_manager.get_original_path(fid) else None
+             for fid, path in zip(file_ids, photos)]
+
+    return {
+        "targets": targets,
+        "photos": photos,
+        "transforms": transforms if any(transforms) else None,
+        "edits": edits if any(edits) else None,
+        "reference_aspect": reference_aspect,
+        "audio_path": audio_path,
+        "split_screen": split_screen,
+        "transition": transition,
+        "cache_dir": file_manager.dirs["cache"],
+        "data_dir": file_manager.dirs["data"],
+        "memory_budget_mb": file_manager.memory_budget.limit_mb,
+    }
+
+
+def run_export_job(job, conn, cancel_event):
+    """
+    Child-process entry point. Analyzes the audio, predicts the render from
+    past calibration, renders every target (recording its timings when it
+    succeeds) and streams progress back over 'conn' as tuples:
+        ("progress", percent)
+        ("estimate", seconds, total_bytes, calibrated)
+        ("frames", frames_written, total_frames, frames_per_second, eta_seconds)
+        ("memory", {stage: peaks})
+        ("finished", success, cancelled)
+    """
+    from app.model.audio_processor import AudioProcessor
+    from app.model.file_manager import register_heif
+    from app.model.render_estimate import RenderCalibration
+
+    register_heif()
+    memory.monitor.start(trace_python=tracing.tracer.enabled)
+    success = False
+    try:
+        schedule = None
+        if job["audio_path"]:
+            processor = AudioProcessor(job["cache_dir"])
+            with tracing.span("export.beat_analysis"), memory.stage("export.beat_analysis"):
+                processor.load_audio(job["audio_path"])
+            schedule = processor.get_sync_schedule(len(job["photos"]))
+
+        targets = job["targets"]
+        renderer = VideoRenderer(
+            targets[0].export_path,
+            job["photos"],
+            job["audio_path"],
+            schedule,
+            targets[0].fps,
+            job["split_screen"],
+            transition=job["transition"],
+            cache_dir=job["cache_dir"],
+            targets=targets,
+            cancel_event=cancel_event,
+            transforms=job.get("transforms"),
+            edits=job.get("edits"),
+            reference_aspect=job.get("reference_aspect"),
+            memory_budget=memory.MemoryBudget(job.get("memory_budget_mb"))
+        )
+
+        calibration = RenderCalibration(job["data_dir"])
+        estimate = calibration.estimate(len(job["photos"]), VideoRenderer.still_durations(schedule, len(job["photos"])),
+                                        targets, job["split_screen"], job["transition"], bool(job["audio_path"]))
+        conn.send(("estimate", estimate.seconds, estimate.total_bytes, estimate.calibrated))
+
+        reporter = _ProgressReporter(conn, estimate)
+        with tracing.span("export.render", targets=len(targets), photos=len(job["photos"])), \
+                memory.stage("export.render"):
+            success = renderer.render(reporter.on_progress, reporter.on_frames)
+        if success:
+            calibration.record(renderer.stats, job["split_screen"], job["transition"])
+    except Exception as e:
+        print(f"Render Process Error: {e}")
+    finally:
+        memory.monitor.stop()
+        tracing.flush()
+        conn.send(("memory", memory.monitor.report()))
+        conn.send(("finished", bool(success), cancel_event.is_set()))
+        conn.close()
+
+
+class _ProgressReporter:
+    """
+    Throttles renderer callbacks into pipe messages with throughput and ETA.
+    With an estimate, the ETA counts down the predicted assembly and encode
+    time before the first frame, and afterwards the observed encode rate is
+    blended with the predicted one (worth PRIOR_SECONDS of encoding) so the
+    first readings do not swing.
+    """
+    INTERVAL = 0.1
+    PRIOR_SECONDS = 3.0
+
+    def __init__(self, conn, estimate=None):
+        self.conn = conn
+        self.estimate = estimate
+        self.last_percent = -1
+        self.last_sent = 0.0
+        self.encode_start = None
+
+    def on_progress(self, percent):
+        if percent != self.last_percent:
+            self.last_percent = percent
+            self.conn.send(("progress", percent))
+            if self.estimate is not None and self.encode_start is None and percent < 30:
+                eta = self.estimate.remaining_before_encode(percent / 30)
+                self.conn.send(("frames", 0, self.estimate.frames, 0.0, eta))
+
+    def on_frames(self, done, total):
+        now = time.monotonic()
+        if self.encode_start is None:
+            self.encode_start = now
+        if now - self.last_sent < self.INTERVAL and done < total:
+            return
+        self.last_sent = now
+
+        elapsed = now - self.encode_start
+        rate = done / elapsed if elapsed > 0 else 0.0
+        expected = rate
+        if self.estimate is not None and self.estimate.encode_rate > 0:
+            prior = self.estimate.encode_rate
+            expected = (done + prior * self.PRIOR_SECONDS) / (elapsed + self.PRIOR_SECONDS)
+        eta = (total - done) / expected if expected > 0 else -1.0
+        self.conn.send(("frames", done, total, rate, eta))
+
+
+class RenderProcess:
+    """
+    Runs an export in a separate process so encoding never competes with
+    the UI for the GIL. The parent polls messages without blocking.
+    """
+    CANCEL_GRACE = 5.0
+
+    def __init__(self, job):
+        self.job = job
+        self.ctx = mp.get_context("spawn")
+        self.cancel_event = self.ctx.Event()
+        self.conn = None
+        self.process = None
+        self.cancel_requested_at = None
+        self.finished = False
+
+    def start(self):
+        parent_conn, child_conn = self.ctx.Pipe(duplex=False)
+        self.conn = parent_conn
+        self.process = self.ctx.Process(target=run_export_job, args=(self.job, child_conn, self.cancel_event), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def poll(self):
+        """Returns all pending messages; never blocks."""
+        messages = []
+        try:
+            while self.conn and self.conn.poll():
+                message = self.conn.recv()
+                if message[0] == "finished":
+                    self.finished = True
+                messages.append(message)
+        except (EOFError, OSError):
+            pass
+
+        if not self.finished and self.process and not self.process.is_alive():
+            self.finished = True
+            cancelled = self.cancel_event.is_set()
+            if cancelled:
+                self._remove_partial_outputs()
+            messages.append(("finished", False, cancelled))
+
+        if not self.finished and self.cancel_requested_at is not None:
+            if time.monotonic() - self.cancel_requested_at > self.CANCEL_GRACE:
+                self.process.terminate()
+        return messages
+
+    def cancel(self):
+        if self.cancel_requested_at is None:
+            self.cancel_requested_at = time.monotonic()
+            self.cancel_event.set()
+
+    def is_running(self):
+        return self.process is not None and not self.finished
+
+    def _remove_partial_outputs(self):
+        for target in self.job["targets"]:
+            for path in (target.export_path, VideoRenderer.video_only_path(target.export_path)):
+                if os.path.exists(path):
+                    try:
+                        os.remove(path)
+                    except OSError as e:
+                        print(f"Cleanup Error: {e}")
@@ -0,0 +1,112 @@
+import os
+import json
+import hashlib
+import threading
+
+
+class ScanIndex:
+    """
+    Remembers (size, mtime, content hash) for every file seen in watched
+    folders, persisted in data/scan_index.json. A re-scan only stats files;
+    only new or changed files are hashed, and content that was already
+    imported (e.g. a renamed or copied file) is not imported again.
+    """
+    HASH_CHUNK = 1 << 20
+
+    def __init__(self, data_dir, extensions):
+        self.path = os.path.join(data_dir, "scan_index.json")
+        self.extensions = tuple(extensions)
+        self.entries = {}
+        self._lock = threading.Lock()
+        self._load()
+
+    def scan(self, folders, cancel_event=None):
+        """
+        Walks 'folders' and returns the paths whose content has not been imported yet.
+        """
+        with self._lock:
+            imported = {e["hash"]: e["file_id"] for e in self.entries.values() if e.get("file_id")}
+            queued = set()
+            new_paths = []
+            seen = set()
+            roots = [os.path.abspath(folder) for folder in folders]
+
+            for path, st in self._walk(roots):
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                seen.add(path)
+                entry = self.entries.get(path)
+                if entry is None or entry["size"] != st.st_size or entry["mtime_ns"] != st.st_mtime_ns:
+                    try:
+                        digest = self._hash(path)
+                    except OSError as e:
+                        print(f"Scan Error ({path}): {e}")
+                        continue
+                    entry = {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "hash": digest, "file_id": None}
+                    self.entries[path] = entry
+
+                if entry.get("file_id"):
+                    continue
+                if entry["hash"] in imported:
+                    entry["file_id"] = imported[entry["hash"]]
+                elif entry["hash"] not in queued:
+                    queued.add(entry["hash"])
+                    new_paths.append(path)
+
+            if cancel_event is None or not cancel_event.is_set():
+                for path in [p for p in self.entries if p not in seen and self._under(p, roots)]:
+                    del self.entries[path]
+            self._save()
+            return new_paths
+
+    def mark_imported(self, imported):
+        """imported: iterable of (source_path, file_id) from the batch ingest."""
+        with self._lock:
+            for path, file_id in imported:
+                entry = self.entries.get(os.path.abspath(path))
+                if entry is not None:
+                    entry["file_id"] = file_id
+            self._save()
+
+    def _walk(self, roots):
+        stack = list(roots)
+        while stack:
+            folder = stack.pop()
+            try:
+                with os.scandir(folder) as it:
+                    for entry in it:
+                        if entry.name.startswith("."):
+                            continue
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.name.lower().endswith(self.extensions):
+                            yield entry.path, entry.stat()
+            except OSError as e:
+                print(f"Scan Error ({folder}): {e}")
+
+    def _hash(self, path):
+        digest = hashlib.sha1()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(self.HASH_CHUNK), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _under(path, roots):
+        return any(path == root or path.startswith(root + os.sep) for root in roots)
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r") as f:
+                self.entries = json.load(f)
+        except Exception as e:
+            print(f"Scan Index Error: {e}")
+            self.entries = {}
+
+    def _save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.path)
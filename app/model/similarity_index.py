@@ -0,0 +1,83 @@
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class BKTree:
+    """
+    Burkhard-Keller tree over 64-bit hashes. A radius query only descends
+    into children whose edge distance is within [d - r, d + r], so finding
+    near-duplicates does not compare against every photo.
+    """
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, value, item):
+        self.size += 1
+        if self.root is None:
+            self.root = [value, [item], {}]
+            return
+        node = self.root
+        while True:
+            distance = hamming(value, node[0])
+            if distance == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [value, [item], {}]
+                return
+            node = child
+
+    def query(self, value, radius):
+        """Returns [(distance, item)] for every item within 'radius' bits."""
+        found = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            distance = hamming(value, node[0])
+            if distance <= radius:
+                found.extend((distance, item) for item in node[1])
+            for edge, child in node[2].items():
+                if distance - radius <= edge <= distance + radius:
+                    stack.append(child)
+        return found
+
+
+class SimilarityIndex:
+    """Near-duplicate queries over {file_id: hash_hex} from the project DB."""
+    def __init__(self, hashes):
+        self.hashes = {fid: int(h, 16) for fid, h in hashes.items() if h}
+        self.tree = BKTree()
+        for file_id, value in self.hashes.items():
+            self.tree.add(value, file_id)
+
+    def near(self, file_id, radius=6):
+        value = self.hashes.get(file_id)
+        if value is None:
+            return []
+        return sorted((d, fid) for d, fid in self.tree.query(value, radius) if fid != file_id)
+
+    def groups(self, radius=6):
+        """
+        Clusters of near-duplicates (burst shots, re-imports), largest first.
+        Photos with no near neighbour are left out.
+        """
+        parent = {fid: fid for fid in self.hashes}
+
+        def find(fid):
+            while parent[fid] != fid:
+                parent[fid] = parent[parent[fid]]
+                fid = parent[fid]
+            return fid
+
+        for file_id, value in self.hashes.items():
+            for _, other in self.tree.query(value, radius):
+                root_a, root_b = find(file_id), find(other)
+                if root_a != root_b:
+                    parent[root_b] = root_a
+
+        clusters = {}
+        for file_id in self.hashes:
+            clusters.setdefault(find(file_id), []).append(file_id)
+        return sorted((c for c in clusters.values() if len(c) > 1), key=len, reverse=True)
@@ -0,0 +1,182 @@
+"""Disk usage per category, cache quotas and orphan cleanup for a project."""
+import os
+import time
+
+
+def touch(path):
+    """Marks a cache file as used, so LRU eviction keeps it (eviction goes by mtime)."""
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+
+
+class StorageManager:
+    """
+    Evicts the regenerable caches oldest use first, to DEFAULT_QUOTAS in MB
+    as overridden by the 'storage_quotas' setting (None = unlimited).
+    """
+    SETTING = "storage_quotas"
+    EVICTABLE = ("flow", "frames", "tiles", "audio")
+    DEFAULT_QUOTAS = {"flow": 1024, "frames": 4096, "tiles": 2048, "audio": 256}
+    ORPHAN_GRACE = 3600
+    TEMP_SUFFIXES = (".tmp", ".deflicker.jpg", ".undo")
+
+    def __init__(self, file_manager):
+        self.manager = file_manager
+
+    @property
+    def quotas(self):
+        quotas = dict(self.DEFAULT_QUOTAS)
+        quotas.update(self.manager.get_setting(self.SETTING) or {})
+        return quotas
+
+    def category_dirs(self):
+        dirs = {name: path for name, path in self.manager.dirs.items() if name != "cache"}
+        cache = self.manager.dirs["cache"]
+        for name in sorted(os.listdir(cache)) if os.path.isdir(cache) else []:
+            if os.path.isdir(os.path.join(cache, name)):
+                dirs[name] = os.path.join(cache, name)
+        return dirs
+
+    def usage(self):
+        """{category: {"files": count, "bytes": total}}."""
+        result = {}
+        for name, folder in self.category_dirs().items():
+            files = self._files(folder)
+            result[name] = {"files": len(files), "bytes": sum(size for _, size, _ in files)}
+        return result
+
+    def enforce_quotas(self, cancel_event=None):
+        """
+        Deletes the least recently used files of every evictable category
+        over its quota. Returns: {category: bytes_freed}.
+        """
+        freed = {}
+        dirs = self.category_dirs()
+        for name, limit_mb in self.quotas.items():
+            if name not in self.EVICTABLE or name not in dirs or limit_mb is None:
+                continue
+            units = self._units(dirs[name], by_folder=name == "tiles")
+            excess = sum(size for _, size, _ in units) - limit_mb * 2 ** 20
+            for paths, size, _ in sorted(units, key=lambda u: u[2]):
+                if excess <= 0 or (cancel_event is not None and cancel_event.is_set()):
+                    break
+                if all([self._remove(path) for path in paths]):
+                    excess -= size
+                    freed[name] = freed.get(name, 0) + size
+            self._prune_empty(dirs[name])
+        return freed
+
+    def clean_orphans(self, cancel_event=None):
+        """
+        Returns: {"entries": [date keys removed], "file_ids": [ids dropped],
+        "files": count, "bytes": freed}.
+        """
+        manager = self.manager
+        report = {"entries": [], "file_ids": [], "files": 0, "bytes": 0}
+        cutoff = time.time() - self.ORPHAN_GRACE
+
+        proxies = manager.dirs["proxies"]
+        orphaned = [(key, fid) for key, fid in list(manager.db["photos"].items())
+                    if not os.path.exists(os.path.join(proxies, f"{fid}.jpg")) and not manager.get_original_path(fid)]
+        if orphaned:
+            manager.remove_photos([key for key, _ in orphaned])
+            report["entries"] = [key for key, _ in orphaned]
+            report["file_ids"] = [fid for _, fid in orphaned]
+
+        live = set(manager.db["photos"].values())
+        with manager._db_lock:
+            stale = False
+            for table in ("photo_info", "landmarks", "transforms", "edits"):
+                entries = manager.db.get(table, {})
+                for fid in [fid for fid in entries if fid not in live]:
+                    del entries[fid]
+                    stale = True
+            if stale:
+                manager._save_db()
+
+        for name in ("originals", "proxies"):
+            for path, size, changed in self._files(manager.dirs[name]):
+                if cancel_event is not None and cancel_event.is_set():
+                    return report
+                if changed > cutoff:
+                    continue
+                base = os.path.basename(path)
+                file_id = os.path.splitext(base)[0]
+                if base.endswith(self.TEMP_SUFFIXES) or file_id not in live:
+                    if self._remove(path):
+                        report["files"] += 1
+                        report["bytes"] += size
+        if report["files"]:
+            manager._originals = None
+
+        tiles = os.path.join(manager.dirs["cache"], "tiles")
+        if os.path.isdir(tiles):
+            for file_id in os.listdir(tiles):
+                if file_id not in live:
+                    for path, size, _ in self._files(os.path.join(tiles, file_id)):
+                        if self._remove(path):
+                            report["files"] += 1
+                            report["bytes"] += size
+            self._prune_empty(tiles)
+
+        for path, size, changed in self._files(manager.dirs["cache"]):
+            if changed <= cutoff and os.path.basename(path).endswith(self.TEMP_SUFFIXES) and self._remove(path):
+                report["files"] += 1
+                report["bytes"] += size
+        return report
+
+    def maintain(self, cancel_event=None):
+        """Background pass: orphan cleanup, then quota enforcement. Returns both reports."""
+        orphans = self.clean_orphans(cancel_event)
+        freed = self.enforce_quotas(cancel_event)
+        return {"orphans": orphans, "evicted": freed}
+
+    @staticmethod
+    def _files(folder):
+        """[(path, size, last_change)] under folder; last_change also covers copies that kept an old mtime."""
+        found = []
+        for root, _, names in os.walk(folder):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                found.append((path, st.st_size, max(st.st_mtime, st.st_ctime)))
+        return found
+
+    @classmethod
+    def _units(cls, folder, by_folder=False):
+        """
+        [(paths, size, last_use)] eviction units: single files, or with
+        by_folder every directory's files together, last used when its newest file was.
+        """
+        files = cls._files(folder)
+        if not by_folder:
+            return [([path], size, changed) for path, size, changed in files]
+        groups = {}
+        for path, size, changed in files:
+            paths, total, last = groups.get(os.path.dirname(path), ([], 0, 0.0))
+            paths.append(path)
+            groups[os.path.dirname(path)] = (paths, total + size, max(last, changed))
+        return list(groups.values())
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return True
+        except OSError as e:
+            print(f"Storage Error: {e}")
+            return False
+
+    @staticmethod
+    def _prune_empty(folder):
+        for root, _, _ in os.walk(folder, topdown=False):
+            if root != folder:
+                try:
+                    os.rmdir(root)
+                except OSError:
+                    pass
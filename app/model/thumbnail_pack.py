@@ -0,0 +1,185 @@
+import io
+import os
+import json
+import mmap
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+
+
+class ThumbnailPack:
+    """
+    Grid thumbnails packed into one append-only file (thumbs.pack) with an
+    offset index (thumbs.json), read through mmap. Loading the grid becomes
+    a few sequential reads instead of one open/stat per photo.
+    Replaced or forgotten thumbnails leave dead bytes behind; compact()
+    rewrites the live ones in timeline order.
+    """
+    COMPACT_RATIO = 0.5
+
+    def __init__(self, cache_dir, size=200, quality=85):
+        self.cache_dir = cache_dir
+        self.size = size
+        self.quality = quality
+        self.data_path = os.path.join(cache_dir, "thumbs.pack")
+        self.index_path = os.path.join(cache_dir, "thumbs.json")
+        self.entries = {}
+        self.garbage = 0
+        self._map = None
+        self._lock = threading.RLock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load()
+
+    def __contains__(self, file_id):
+        return file_id in self.entries
+
+    def get(self, file_id):
+        """JPEG bytes of the thumbnail, or None."""
+        with self._lock:
+            entry = self.entries.get(file_id)
+            if entry is None:
+                return None
+            offset, length, _ = entry
+            view = self._view(offset + length)
+            return None if view is None else view[offset:offset + length]
+
+    def missing(self, file_ids):
+        return [fid for fid in file_ids if fid not in self.entries]
+
+    def stale(self, items):
+        """items: (file_id, source_path). Returns those whose source changed since packing."""
+        result = []
+        for file_id, path in items:
+            entry = self.entries.get(file_id)
+            if entry is None or entry[2] != self._signature(path):
+                result.append((file_id, path))
+        return result
+
+    def build(self, items, cancel_event=None, progress_callback=None, max_workers=None):
+        """Encodes thumbnails in parallel and appends them. Returns the packed file ids."""
+        total = len(items)
+        packed = []
+        if not total:
+            return packed
+
+        def encode(item):
+            if cancel_event is not None and cancel_event.is_set():
+                return None
+            file_id, path = item
+            try:
+                signature = self._signature(path)
+                with Image.open(path) as img:
+                    img.draft("RGB", (self.size, self.size))
+                    img = img.convert("RGB")
+                    img.thumbnail((self.size, self.size))
+                    buffer = io.BytesIO()
+                    img.save(buffer, "JPEG", quality=self.quality)
+                return file_id, buffer.getvalue(), signature
+            except Exception as e:
+                print(f"Thumbnail Error: {e}")
+                return None
+
+        with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count() or 4) as pool:
+            with open(self.data_path, "ab") as f:
+                for done, result in enumerate(pool.map(encode, items), 1):
+                    if result is not None:
+                        file_id, data, signature = result
+                        with self._lock:
+                            offset = f.tell()
+                            f.write(data)
+                            f.flush()
+                            self._replace(file_id, [offset, len(data), signature])
+                        packed.append(file_id)
+                    if progress_callback:
+                        progress_callback(done, total)
+
+        with self._lock:
+            self._save_index()
+        return packed
+
+    def forget(self, file_ids):
+        with self._lock:
+            for file_id in file_ids:
+                entry = self.entries.pop(file_id, None)
+                if entry is not None:
+                    self.garbage += entry[1]
+            self._save_index()
+
+    def needs_compaction(self):
+        size = os.path.getsize(self.data_path) if os.path.exists(self.data_path) else 0
+        return size > 0 and self.garbage > size * self.COMPACT_RATIO
+
+    def compact(self, order=None):
+        """
+        Rewrites live thumbnails into a fresh pack, in 'order' (e.g. the
+        timeline) so the grid reads the file front to back.
+        """
+        with self._lock:
+            order = [fid for fid in (order or []) if fid in self.entries]
+            listed = set(order)
+            order += [fid for fid in self.entries if fid not in listed]
+
+            tmp_path = self.data_path + ".tmp"
+            entries = {}
+            with open(tmp_path, "wb") as out:
+                for file_id in order:
+                    data = self.get(file_id)
+                    if data is None:
+                        continue
+                    entries[file_id] = [out.tell(), len(data), self.entries[file_id][2]]
+                    out.write(data)
+
+            self._close_map()
+            os.replace(tmp_path, self.data_path)
+            self.entries = entries
+            self.garbage = 0
+            self._save_index()
+
+    def _replace(self, file_id, entry):
+        old = self.entries.get(file_id)
+        if old is not None:
+            self.garbage += old[1]
+        self.entries[file_id] = entry
+
+    def _view(self, needed):
+        if self._map is None or len(self._map) < needed:
+            self._close_map()
+            if not os.path.exists(self.data_path) or os.path.getsize(self.data_path) < needed:
+                return None
+            with open(self.data_path, "rb") as f:
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return self._map
+
+    def _close_map(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    @staticmethod
+    def _signature(path):
+        try:
+            st = os.stat(path)
+            return f"{st.st_size}:{st.st_mtime_ns}"
+        except OSError:
+            return None
+
+    def _load(self):
+        if not os.path.exists(self.index_path) or not os.path.exists(self.data_path):
+            return
+        try:
+            with open(self.index_path, "r") as f:
+                index = json.load(f)
+            if index.get("size") != self.size:
+                return
+            self.entries = index.get("entries", {})
+            self.garbage = index.get("garbage", 0)
+        except Exception as e:
+            print(f"Thumbnail Index Error: {e}")
+            self.entries, self.garbage = {}, 0
+
+    def _save_index(self):
+        index = {"size": self.size, "garbage": self.garbage, "entries": self.entries}
+        tmp_path = self.index_path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self.index_path)
@@ -0,0 +1,112 @@
+import os
+import json
+import math
+import hashlib
+import threading
+import numpy as np
+from PIL import Image, ImageOps
+
+from app.model.file_manager import register_heif
+from app.model.storage import touch
+from app.model.image_processor import ImageProcessor
+
+
+class TilePyramid:
+    """
+    Lazily built image pyramid of one original photo.
+    Level 0 is full resolution and every level halves the previous one.
+    A level is decoded and cut into tiles the first time one of its tiles is
+    requested; tiles are stored as JPEGs under <cache_dir>/<level>/<col>_<row>.jpg.
+    A level whose tile has gone missing (e.g. evicted) is cut again.
+    'edits' are the proxy's edits (see FileManager.get_edits), repeated on
+    the original; each set of edits gets its own subfolder of tiles.
+    """
+    TILE = 256
+
+    def __init__(self, original_path, cache_dir, edits=None):
+        self.original_path = original_path
+        self.edits = dict(edits) if edits else None
+        if self.edits:
+            digest = hashlib.sha1(json.dumps(self.edits, sort_keys=True).encode()).hexdigest()[:12]
+            cache_dir = os.path.join(cache_dir, f"edit-{digest}")
+        self.cache_dir = cache_dir
+        self._lock = threading.Lock()
+        register_heif()
+        self.width, self.height = self._oriented_size(original_path)
+        if self.edits and self.edits.get("rotation", 0) % 180:
+            self.width, self.height = self.height, self.width
+        self.levels = max(1, int(math.ceil(math.log2(max(self.width, self.height) / self.TILE))) + 1)
+
+    def level_size(self, level):
+        factor = 2 ** level
+        return max(1, math.ceil(self.width / factor)), max(1, math.ceil(self.height / factor))
+
+    def level_for_scale(self, scale):
+        """
+        Coarsest level that still has at least one pixel per screen pixel,
+        where 'scale' is screen pixels per full-resolution pixel.
+        """
+        if scale <= 0:
+            return self.levels - 1
+        level = int(math.floor(math.log2(1.0 / scale))) if scale < 1 else 0
+        return min(max(level, 0), self.levels - 1)
+
+    def tiles_in_rect(self, level, x0, y0, x1, y1):
+        """(col, row) of every tile at 'level' touching a rect given in full-resolution pixels."""
+        span = self.TILE * (2 ** level)
+        cols = math.ceil(self.width / span)
+        rows = math.ceil(self.height / span)
+        c0 = max(0, int(x0 // span))
+        r0 = max(0, int(y0 // span))
+        c1 = min(cols - 1, int(x1 // span))
+        r1 = min(rows - 1, int(y1 // span))
+        return [(c, r) for r in range(r0, r1 + 1) for c in range(c0, c1 + 1)]
+
+    def tile_path(self, level, col, row):
+        return os.path.join(self.cache_dir, str(level), f"{col}_{row}.jpg")
+
+    def load_tile(self, level, col, row):
+        """Returns the tile as an RGB uint8 array, building its level if needed."""
+        path = self.tile_path(level, col, row)
+        if os.path.exists(path):
+            touch(path)
+        else:
+            self._build_level(level, path)
+        with Image.open(path) as img:
+            return np.asarray(img.convert("RGB"))
+
+    def _build_level(self, level, wanted):
+        with self._lock:
+            level_dir = os.path.join(self.cache_dir, str(level))
+            done_marker = os.path.join(level_dir, ".complete")
+            if os.path.exists(done_marker) and os.path.exists(wanted):
+                return
+            os.makedirs(level_dir, exist_ok=True)
+
+            level_w, level_h = self.level_size(level)
+            with Image.open(self.original_path) as img:
+                if img.format == "JPEG" and level > 0:
+                    img.draft("RGB", (max(level_w, level_h),) * 2 if self.edits else (level_w, level_h))
+                img = ImageOps.exif_transpose(img)
+                img = ImageProcessor.apply_edits(img, self.edits).convert("RGB")
+                if img.size != (level_w, level_h):
+                    img = img.resize((level_w, level_h), Image.Resampling.LANCZOS)
+
+                for row in range(math.ceil(level_h / self.TILE)):
+                    for col in range(math.ceil(level_w / self.TILE)):
+                        box = (col * self.TILE, row * self.TILE,
+                               min((col + 1) * self.TILE, level_w), min((row + 1) * self.TILE, level_h))
+                        path = self.tile_path(level, col, row)
+                        img.crop(box).save(path + ".tmp", "JPEG", quality=90)
+                        os.replace(path + ".tmp", path)
+
+            open(done_marker, "w").close()
+
+    @staticmethod
+    def _oriented_size(path):
+        with Image.open(path) as img:
+            w, h = img.size
+            orientation = img.getexif().get(0x0112, 1)
+        if orientation in (5, 6, 7, 8):
+            return h, w
+        return w, h
@@ -0,0 +1,237 @@
+"""
+Opt-in stage tracing to a Chrome trace, enabled by TIMEFLOW_TRACE, --trace or enable(path).
+
+    python -m app.model.tracing compare OLD.summary.json NEW.summary.json
+"""
+import os
+import sys
+import json
+import time
+import atexit
+import shutil
+import functools
+import threading
+import multiprocessing as mp
+from datetime import datetime
+
+
+ENV_VAR = "TIMEFLOW_TRACE"
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("tracer", "name", "args", "start")
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.tracer._record(self.name, self.start, time.perf_counter(), self.args)
+        return False
+
+
+class Tracer:
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self.events = []
+        self.counters = {}
+        self.started = None
+        self._epoch = time.time() - time.perf_counter()
+        self._lock = threading.Lock()
+        self._registered = False
+
+    def enable(self, path):
+        """Starts a run writing to 'path'. In the main process, stale worker parts are cleared."""
+        self.path = os.path.abspath(path)
+        self.enabled = True
+        self.started = datetime.now().isoformat(timespec="seconds")
+        os.environ[ENV_VAR] = self.path
+        if not self._is_worker():
+            shutil.rmtree(self._parts_dir(), ignore_errors=True)
+        if not self._registered:
+            atexit.register(self.write)
+            self._registered = True
+
+    def span(self, name, **args):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, args)
+
+    def count(self, name, value=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            total = self.counters.get(name, 0) + value
+            self.counters[name] = total
+            self.events.append({"name": name, "ph": "C", "ts": self._micros(time.perf_counter()),
+                                "pid": os.getpid(), "args": {"value": total}})
+
+    def gauge(self, name, value):
+        """Sampled level (memory, queue depth); the summary keeps its maximum instead of a total."""
+        if not self.enabled:
+            return
+        with self._lock:
+            self.events.append({"name": name, "ph": "C", "cat": "gauge", "ts": self._micros(time.perf_counter()),
+                                "pid": os.getpid(), "args": {"value": value}})
+
+    def traced(self, name):
+        """Decorator form of span()."""
+        def wrap(fn):
+            @functools.wraps(fn)
+            def inner(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                with _Span(self, name, {}):
+                    return fn(*args, **kwargs)
+            return inner
+        return wrap
+
+    def flush(self):
+        """Worker processes: appends buffered events to this process's part file."""
+        if not self.enabled or not self._is_worker():
+            return
+        with self._lock:
+            events, self.events = self.events, []
+        if not events:
+            return
+        os.makedirs(self._parts_dir(), exist_ok=True)
+        with open(os.path.join(self._parts_dir(), f"{os.getpid()}.jsonl"), "a") as f:
+            for event in events:
+                f.write(json.dumps(event) + "\n")
+
+    def write(self):
+        """Main process: merges worker parts and writes the trace and its summary."""
+        if not self.enabled:
+            return
+        if self._is_worker():
+            self.flush()
+            return
+
+        with self._lock:
+            events = list(self.events)
+        parts = self._parts_dir()
+        if os.path.isdir(parts):
+            for name in sorted(os.listdir(parts)):
+                with open(os.path.join(parts, name), "r") as f:
+                    events.extend(json.loads(line) for line in f if line.strip())
+            shutil.rmtree(parts, ignore_errors=True)
+
+        summary = self.summarize(events)
+        summary.update({"started": self.started, "argv": sys.argv})
+        trace = {"traceEvents": events, "displayTimeUnit": "ms", "otherData": {"started": self.started}}
+        self._write_json(self.path, trace)
+        self._write_json(self.summary_path(), summary)
+
+    def summary_path(self):
+        return os.path.splitext(self.path)[0] + ".summary.json"
+
+    @staticmethod
+    def summarize(events):
+        """
+        Per-span count/total/mean/max, final counter values (summed over
+        processes) and the maximum of each gauge.
+        """
+        spans = {}
+        counters = {}
+        gauges = {}
+        for event in events:
+            if event["ph"] == "X":
+                entry = spans.setdefault(event["name"], {"count": 0, "total_ms": 0.0, "max_ms": 0.0})
+                ms = event["dur"] / 1000.0
+                entry["count"] += 1
+                entry["total_ms"] += ms
+                entry["max_ms"] = max(entry["max_ms"], ms)
+            elif event.get("cat") == "gauge":
+                gauges[event["name"]] = max(gauges.get(event["name"], event["args"]["value"]), event["args"]["value"])
+            elif event["ph"] == "C":
+                counters[(event["name"], event["pid"])] = event["args"]["value"]
+
+        for entry in spans.values():
+            entry["mean_ms"] = entry["total_ms"] / entry["count"]
+            for key in ("total_ms", "max_ms", "mean_ms"):
+                entry[key] = round(entry[key], 3)
+        totals = {}
+        for (name, _), value in counters.items():
+            totals[name] = totals.get(name, 0) + value
+        return {"spans": spans, "counters": totals, "gauges": gauges}
+
+    def _record(self, name, start, end, args):
+        event = {"name": name, "ph": "X", "ts": self._micros(start), "dur": (end - start) * 1e6,
+                 "pid": os.getpid(), "tid": threading.get_ident()}
+        if args:
+            event["args"] = args
+        with self._lock:
+            self.events.append(event)
+
+    def _micros(self, t):
+        return (self._epoch + t) * 1e6
+
+    def _parts_dir(self):
+        return self.path + ".parts"
+
+    @staticmethod
+    def _is_worker():
+        return mp.parent_process() is not None
+
+    @staticmethod
+    def _write_json(path, data):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+
+
+def compare_summaries(old, new):
+    """[(span, old_total_ms, new_total_ms, ratio)] for spans present in both, slowest change first."""
+    rows = []
+    for name, entry in new["spans"].items():
+        before = old["spans"].get(name)
+        if before and before["total_ms"] > 0:
+            rows.append((name, before["total_ms"], entry["total_ms"], entry["total_ms"] / before["total_ms"]))
+    return sorted(rows, key=lambda row: row[3], reverse=True)
+
+
+tracer = Tracer()
+span = tracer.span
+count = tracer.count
+gauge = tracer.gauge
+traced = tracer.traced
+flush = tracer.flush
+
+def enable(path):
+    tracer.enable(path)
+
+if os.environ.get(ENV_VAR):
+    tracer.enable(os.environ[ENV_VAR])
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 4 or sys.argv[1] != "compare":
+        print(__doc__)
+        sys.exit(2)
+    with open(sys.argv[2]) as f:
+        old_summary = json.load(f)
+    with open(sys.argv[3]) as f:
+        new_summary = json.load(f)
+    for name, before, after, ratio in compare_summaries(old_summary, new_summary):
+        print(f"{name:32s} {before:12.1f} ms -> {after:12.1f} ms  x{ratio:.2f}")
@@ -1,90 +1,489 @@
 import os
+import shutil
+import hashlib
+import subprocess
+import time
+import tempfile
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 
-from moviepy.editor import ImageClip, concatenate_videoclips, AudioFileClip, clips_array
 from PIL import Image
+from app.model import tracing, memory
+from app.model.frame_cache import FrameCache
+from app.model.storage import touch
+from app.model.image_processor import ImageProcessor
+
+
+class RenderCancelled(Exception):
+    pass
+
+
+class RenderTarget:
+    """One output file of an export: where it goes, its size and frame rate."""
+    def __init__(self, export_path, resolution=None, fps=30):
+        self.export_path = export_path
+        self.resolution = resolution
+        self.fps = fps
+
 
 class VideoRenderer:
-    def __init__(self, export_path, photo_paths, audio_path=None, beat_schedule=None, fps=30, split_screen=False):
+    TRANSITION_CUT = "cut"
+    TRANSITION_MORPH = "morph"
+
+    PRESET_RESOLUTIONS = {
+        "TikTok/Reels (1080x1920)": (1080, 1920),
+        "YouTube (Landscape)": (1920, 1080),
+        "Square (Instagram)": (1080, 1080),
+    }
+
+    ENCODER_MB = 300
+    MORPH_WINDOW = 32
+    FLOW_PANEL = 320
+
+    def __init__(self, export_path, photo_paths, audio_path=None, beat_schedule=None, fps=30, split_screen=False,
+                 transition=TRANSITION_CUT, morph_frames=6, cache_dir=None, resolution=None, targets=None,
+                 cancel_event=None, transforms=None, memory_budget=None, edits=None, reference_aspect=None):
         self.export_path = export_path
         self.photo_paths = photo_paths
+        self.transforms = transforms
+        self._transforms_by_path = dict(zip(photo_paths, transforms)) if transforms else {}
+        self.reference_aspect = reference_aspect
+        self.edits = edits
+        self._edits_by_path = dict(zip(photo_paths, edits)) if edits else {}
         self.audio_path = audio_path
         self.beat_schedule = beat_schedule
         self.fps = fps
-        self.split_screen = split_screen 
-        self.use_gpu = False 
+        self.split_screen = split_screen
+        self.transition = transition
+        self.morph_frames = morph_frames
+        self.cache_dir = cache_dir
+        self.resolution = resolution
+        self.targets = targets or [RenderTarget(export_path, resolution, fps)]
+        self.cancel_event = cancel_event
+        self.memory_budget = memory_budget or memory.MemoryBudget()
+        self.stats = {}
+        self.use_gpu = False
+        self.flow_sources = None
+        self._aspects = {}
+        self._shared_morpher = None
+        self._morpher_lock = threading.Lock()
 
-    def render(self, progress_callback=None):
-        clips = []
+    def render(self, progress_callback=None, frame_callback=None):
+        """
+        Renders every target from one pass over the photos: each source is
+        decoded once, the audio is encoded once (and cached per track and
+        length), and the targets are encoded concurrently by separate ffmpeg
+        processes (as many at a time as the memory budget allows).
+        frame_callback(frames_written, total_frames) reports encoder progress.
+        If cancel_event is set mid-render, partial outputs are deleted.
+        Timings and output sizes are left in self.stats for calibration.
+        """
         total_photos = len(self.photo_paths)
 
         if total_photos == 0: return False
 
+        self.stats = {"photos": total_photos, "targets": []}
+        self._shared_morpher = None
+        audio_dir = None
         try:
-            
-            for i, path in enumerate(self.photo_paths):
-                duration = 0.1 
-                
-                if self.beat_schedule and i < len(self.beat_schedule) - 1:
-                    start_time = self.beat_schedule[i]
-                    end_time = self.beat_schedule[i+1]
-                    duration = end_time - start_time
-                else:
-                    duration = 1.0 / 10 
-                
-                if duration < 0.04: duration = 0.04 
-
-                clip = ImageClip(path).set_duration(duration)
-                clips.append(clip)
-
-                if progress_callback:
-                    progress_callback(int((i / total_photos) * 40)) 
-
-            
-            main_video = concatenate_videoclips(clips, method="compose")
-
-            
-            final_video = main_video
-            
-            if self.split_screen and total_photos > 0:
-                
-                
-                first_photo_path = self.photo_paths[0]
-                static_start = ImageClip(first_photo_path).set_duration(main_video.duration)
-                
-                
-                
-                
-                final_video = clips_array([[static_start, main_video]])
-            
-
-            
+            started = time.perf_counter()
+            with tracing.span("render.frame_assembly", photos=total_photos), memory.stage("render.frame_assembly"):
+                sources = self._prepare_sources(progress_callback)
+            self.stats["assembly_seconds"] = time.perf_counter() - started
+            durations = self.still_durations(self.beat_schedule, total_photos)
+            total_duration = float(sum(durations))
+
+            audio_file = None
             if self.audio_path:
-                try:
-                    audio = AudioFileClip(self.audio_path)
-                    if audio.duration < final_video.duration:
-                         pass 
-                    else:
-                        audio = audio.subclip(0, final_video.duration)
-                    
-                    final_video = final_video.set_audio(audio)
-                except Exception as e:
-                    print(f"Audio Merge Error: {e}")
-
-            
-            if progress_callback: progress_callback(60)
-            
-            final_video.write_videofile(
-                self.export_path, 
-                fps=self.fps, 
-                codec='libx264', 
-                audio_codec='aac',
-                preset='medium', 
-                threads=4 
-            )
-            
+                audio_dir = tempfile.mkdtemp(prefix="timeflow_audio_")
+                started = time.perf_counter()
+                with tracing.span("render.audio"), memory.stage("render.audio"):
+                    audio_file = self._prepare_audio(total_duration, audio_dir)
+                self.stats["audio_seconds"] = time.perf_counter() - started
+
+            total_frames = sum(self._frame_count(total_duration, t.fps) for t in self.targets)
+            written = 0
+            lock = threading.Lock()
+
+            def on_frames(count):
+                nonlocal written
+                with lock:
+                    written += count
+                    if progress_callback:
+                        progress_callback(min(99, 30 + int((written / max(total_frames, 1)) * 70)))
+                    if frame_callback:
+                        frame_callback(written, total_frames)
+
+            encoders = self.memory_budget.fit(len(self.targets), max(self._encoder_mb(t) for t in self.targets))
+            threads = max(1, (os.cpu_count() or 4) // encoders)
+            started = time.perf_counter()
+            with memory.stage("render.encode"), ThreadPoolExecutor(max_workers=encoders) as pool:
+                futures = [pool.submit(self._encode_target, target, target_sources, durations, audio_file, threads, on_frames)
+                           for target, target_sources in zip(self.targets, sources)]
+                results = [future.result() for future in futures]
+            self.stats["encode_seconds"] = time.perf_counter() - started
+
             if progress_callback: progress_callback(100)
-            return True
+            return all(results)
 
+        except RenderCancelled:
+            print("Render cancelled.")
+            for target in self.targets:
+                if os.path.exists(target.export_path):
+                    os.remove(target.export_path)
+            return False
         except Exception as e:
             print(f"Render Error: {e}")
-            return False
\ No newline at end of file
+            return False
+        finally:
+            if audio_dir:
+                shutil.rmtree(audio_dir, ignore_errors=True)
+
+    @staticmethod
+    def still_durations(beat_schedule, count):
+        """Seconds each photo stays on screen; beats when available, else 10 photos/s."""
+        durations = []
+        for i in range(count):
+            if beat_schedule and i < len(beat_schedule) - 1:
+                duration = beat_schedule[i+1] - beat_schedule[i]
+            else:
+                duration = 1.0 / 10
+
+            if duration < 0.04: duration = 0.04
+            durations.append(duration)
+        return durations
+
+    @staticmethod
+    def _frame_count(duration, fps):
+        return max(1, int(round(duration * fps)))
+
+    def _prepare_sources(self, progress_callback=None):
+        """
+        Pre-pass: letterboxes every photo once per target size, in parallel,
+        decoding each source a single time for all targets. Edits and
+        alignment transforms are applied in the same pass, so with either
+        even source-sized targets go through the cache. Morph exports also
+        get a FLOW_PANEL square frame per photo, in which the optical flow
+        of each pair is computed once for all targets (self.flow_sources).
+        Returns: one list of frame sources per target.
+        """
+        sized = [t for t in self.targets if self._is_sized(t)]
+        morph = self.transition == self.TRANSITION_MORPH and len(self.photo_paths) > 1
+        self.flow_sources = None
+        if not (sized or morph) or not self.cache_dir:
+            return [list(self.photo_paths) for _ in self.targets]
+
+        def on_progress(done, total):
+            if progress_callback:
+                progress_callback(int((done / total) * 30))
+
+        caches = {}
+        for target in sized:
+            size = self._panel_size(target)
+            if size not in caches:
+                caches[size] = FrameCache(os.path.join(self.cache_dir, "frames"), size)
+        flow_size = (self.FLOW_PANEL, self.FLOW_PANEL)
+        if morph and flow_size not in caches:
+            caches[flow_size] = FrameCache(os.path.join(self.cache_dir, "frames"), flow_size)
+
+        sizes = list(caches.keys())
+        frame_mb = sum(w * h * 3 for w, h in sizes) * 3 / memory.MB
+        workers = self.memory_budget.fit(os.cpu_count() or 4, frame_mb, share=0.5)
+        prepared = FrameCache.prepare_all([caches[size] for size in sizes], self.photo_paths, on_progress, workers,
+                                          cancel_event=self.cancel_event, transforms=self.transforms,
+                                          edits=self.edits, reference_aspect=self.reference_aspect)
+        self._check_cancelled()
+        by_size = dict(zip(sizes, prepared))
+        if morph:
+            self.flow_sources = by_size[flow_size]
+        return [by_size[self._panel_size(t)] if t in sized else list(self.photo_paths) for t in self.targets]
+
+    def _is_sized(self, target):
+        """Whether the target's frames come from the frame cache rather than straight from the photos."""
+        return bool(target.resolution or self.transforms or self.edits)
+
+    def _prepare_audio(self, duration, work_dir):
+        """
+        The soundtrack trimmed to 'duration' and encoded to AAC once per
+        (track, duration): cached under cache/audio when there is a cache,
+        so re-exports and extra presets only stream-copy it.
+        """
+        dest = self._audio_cache_path(duration) or os.path.join(work_dir, "soundtrack.m4a")
+        if os.path.exists(dest):
+            touch(dest)
+            return dest
+
+        from moviepy.config import get_setting
+
+        tmp_path = dest + ".tmp"
+        try:
+            subprocess.run([get_setting("FFMPEG_BINARY"), "-y", "-v", "error", "-i", self.audio_path,
+                            "-t", f"{duration:.3f}", "-vn", "-c:a", "aac", "-b:a", "192k", "-f", "mp4", tmp_path],
+                           check=True, capture_output=True)
+            os.replace(tmp_path, dest)
+            return dest
+        except Exception as e:
+            print(f"Audio Merge Error: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return None
+
+    def _audio_cache_path(self, duration):
+        if not self.cache_dir:
+            return None
+        try:
+            st = os.stat(self.audio_path)
+        except OSError:
+            return None
+        signature = f"{os.path.abspath(self.audio_path)}:{st.st_size}:{st.st_mtime_ns}:{duration:.3f}"
+        folder = os.path.join(self.cache_dir, "audio")
+        os.makedirs(folder, exist_ok=True)
+        return os.path.join(folder, hashlib.sha1(signature.encode()).hexdigest()[:16] + ".m4a")
+
+    @staticmethod
+    def video_only_path(export_path):
+        """Where a target's video stream is written before the audio is muxed in."""
+        base, ext = os.path.splitext(export_path)
+        return f"{base}.video{ext or '.mp4'}"
+
+    def _iter_segments(self, sources, durations, fps, panel_size, shared_flow=False):
+        """
+        Yields the timeline as (duration, source) pairs, where source is a
+        frame path or a synthesized morph frame array. Morphs are built one
+        window of pairs at a time (sized by the memory budget), so only that
+        window's frames are ever held. With 'shared_flow' the pairs' flows
+        come from self.flow_sources, computed once for every target.
+        """
+        counts = self._morph_counts(sources, durations, fps)
+        morpher = self._morpher() if any(counts) else None
+        window = self._morph_window(counts, panel_size) if morpher else len(sources)
+        shared_flow = shared_flow and self.flow_sources is not None
+
+        for start in range(0, len(sources), window):
+            stop = min(start + window, len(sources))
+            morphs = {}
+            if morpher is not None:
+                pair_stop = min(stop, len(counts))
+                flow_paths = mappings = None
+                if shared_flow:
+                    flow_paths = self.flow_sources[start:pair_stop + 1]
+                    mappings = [self._flow_mapping(i, panel_size) for i in range(start, pair_stop + 1)]
+                with tracing.span("render.morph", pairs=pair_stop - start):
+                    window_morphs = morpher.morph_sequence(sources[start:pair_stop + 1], counts[start:pair_stop],
+                                                           flow_paths, mappings)
+                morphs = {start + i: frames for i, frames in window_morphs.items()}
+
+            for i in range(start, stop):
+                duration = durations[i]
+                frames = morphs.pop(i, None)
+                if frames is not None:
+                    duration = max(duration - len(frames) / fps, 1.0 / fps)
+
+                yield duration, sources[i]
+                if frames is not None:
+                    for frame in frames:
+                        yield 1.0 / fps, frame
+
+    def _encode_target(self, target, sources, durations, audio_file, threads, on_frames=None):
+        """
+        Streams the timeline through one canvas that is composed once.
+        In split-screen mode Day 1 (left) is drawn a single time and only the
+        right panel is rewritten, and only when the source changes.
+        The encoder writes video only; the pre-encoded soundtrack is muxed in
+        afterwards with both streams copied.
+        """
+        from moviepy.video.io.ffmpeg_writer import FFMPEG_VideoWriter
+        from moviepy.video.io.ffmpeg_tools import ffmpeg_merge_video_audio
+
+        writer = None
+        name = os.path.basename(target.export_path)
+        video_path = self.video_only_path(target.export_path) if audio_file else target.export_path
+        try:
+            panel_w, panel_h = self._panel_size(target, sources[0])
+            segments = self._iter_segments(sources, durations, target.fps, (panel_w, panel_h), self._is_sized(target))
+            if self.split_screen:
+                canvas = np.zeros((panel_h, panel_w * 2, 3), dtype=np.uint8)
+                self._draw_panel(sources[0], canvas[:, :panel_w])
+                panel = canvas[:, panel_w:]
+            else:
+                canvas = np.zeros((panel_h, panel_w, 3), dtype=np.uint8)
+                panel = canvas
+
+            writer = FFMPEG_VideoWriter(
+                video_path,
+                (canvas.shape[1], canvas.shape[0]),
+                target.fps,
+                codec='libx264',
+                preset='medium',
+                threads=threads
+            )
+
+            elapsed = 0.0
+            frames_done = 0
+            for duration, source in segments:
+                self._check_cancelled()
+                elapsed += duration
+                count = self._frame_count(elapsed, target.fps) - frames_done
+                if count <= 0:
+                    continue
+                with tracing.span("render.draw"):
+                    self._draw_panel(source, panel)
+                with tracing.span("render.encode", frames=count):
+                    for _ in range(count):
+                        writer.write_frame(canvas)
+                tracing.count("render.frames", count)
+                frames_done += count
+                if on_frames:
+                    on_frames(count)
+
+            writer.close()
+            writer = None
+            video_bytes = os.path.getsize(video_path)
+            if audio_file:
+                with tracing.span("render.mux", target=name):
+                    ffmpeg_merge_video_audio(video_path, audio_file, target.export_path,
+                                             vcodec="copy", acodec="copy", logger=None)
+            self.stats["targets"].append({
+                "width": canvas.shape[1], "height": canvas.shape[0], "fps": target.fps,
+                "frames": frames_done, "bytes": video_bytes, "resolution": target.resolution,
+            })
+            return True
+
+        except RenderCancelled:
+            raise
+        except Exception as e:
+            print(f"Render Error ({name}): {e}")
+            return False
+        finally:
+            if writer is not None:
+                writer.close()
+            if video_path != target.export_path and os.path.exists(video_path):
+                os.remove(video_path)
+
+    def _check_cancelled(self):
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise RenderCancelled()
+
+    @staticmethod
+    def panel_size_for(resolution, split_screen=False):
+        """Size of the area each timeline photo is letterboxed into."""
+        panel_w, panel_h = resolution
+        if split_screen:
+            panel_w //= 2
+        return panel_w - panel_w % 2, panel_h - panel_h % 2
+
+    def _panel_size(self, target, first_source=None):
+        if target.resolution:
+            return self.panel_size_for(target.resolution, self.split_screen)
+        source = first_source or self.photo_paths[0]
+        with Image.open(source) as img:
+            w, h = img.size
+        if (self._edit_for(source) or {}).get("rotation", 0) % 180:
+            w, h = h, w
+        return self.panel_size_for((w, h))
+
+    def _draw_panel(self, source, panel):
+        frame = self._load_rgb(source, self._edit_for(source))
+        transform = self._transform_for(source)
+        if frame.shape == panel.shape and transform is None:
+            panel[:] = frame
+        else:
+            ImageProcessor.fit_to_canvas(frame, (panel.shape[1], panel.shape[0]), out=panel, transform=transform,
+                                         reference_aspect=self.reference_aspect)
+
+    def _transform_for(self, source):
+        """Transform still owed by an uncached photo path (cached frames are already aligned)."""
+        if not isinstance(source, str):
+            return None
+        return self._transforms_by_path.get(source)
+
+    def _edit_for(self, source):
+        """Edits still owed by an uncached photo path, like _transform_for."""
+        if not isinstance(source, str):
+            return None
+        return self._edits_by_path.get(source)
+
+    @staticmethod
+    def _load_rgb(source, edit=None):
+        if isinstance(source, np.ndarray):
+            return source
+        with Image.open(source) as img:
+            return np.asarray(ImageProcessor.apply_edits(img, edit).convert("RGB"))
+
+    def _morph_counts(self, sources, durations, fps):
+        """
+        Morph frames per pair, sized so every transition fits inside the
+        outgoing still's slot and the beat timing is preserved.
+        """
+        if self.transition != self.TRANSITION_MORPH or len(sources) < 2:
+            return []
+
+        counts = []
+        for i in range(len(sources) - 1):
+            available = int(durations[i] * fps) - 1
+            counts.append(max(0, min(self.morph_frames, available)))
+        return counts
+
+    def _morph_window(self, counts, panel_size):
+        """
+        Pairs morphed at once: each holds its frames plus four float32 remap
+        grids per frame. Without a budget setting the window is still sized
+        against physical memory, since 4K panels make every pair large.
+        """
+        w, h = panel_size
+        pair_mb = max(counts) * w * h * (3 + 16) / memory.MB
+        budget = self.memory_budget if self.memory_budget.limit_mb else memory.default_budget()
+        return budget.fit(self.MORPH_WINDOW, pair_mb, share=0.5)
+
+    def _morpher(self):
+        """One morpher per render, shared by all targets, so each pair's flow is held once."""
+        from app.model.flow_morph import FlowMorpher
+
+        with self._morpher_lock:
+            if self._shared_morpher is None:
+                flow_cache = os.path.join(self.cache_dir, "flow") if self.cache_dir else None
+                self._shared_morpher = FlowMorpher(cache_dir=flow_cache, flow_width=self.FLOW_PANEL)
+            return self._shared_morpher
+
+    def _flow_mapping(self, index, panel_size):
+        """
+        (scale, x, y) taking photo 'index' from its FLOW_PANEL frame to a
+        panel of 'panel_size': both letterbox the same rect (the reference
+        frame if the photo is aligned, else the photo), see fit_to_canvas.
+        """
+        aspect = self._framed_aspect(index)
+        flow_scale, flow_x, flow_y = self._letterbox(aspect, (self.FLOW_PANEL, self.FLOW_PANEL))
+        scale, x, y = self._letterbox(aspect, panel_size)
+        k = scale / flow_scale
+        return k, x - k * flow_x, y - k * flow_y
+
+    @staticmethod
+    def _letterbox(aspect, size):
+        """Scale (pixels per unit width) and origin of a rect 'aspect' high per unit wide, letterboxed into size."""
+        w, h = size
+        scale = min(w, h / aspect)
+        return scale, (w - scale) / 2, (h - scale * aspect) / 2
+
+    def _framed_aspect(self, index):
+        if self.transforms and self.transforms[index] is not None and self.reference_aspect:
+            return self.reference_aspect
+        aspect = self._aspects.get(index)
+        if aspect is None:
+            path = self.photo_paths[index]
+            with Image.open(path) as img:
+                w, h = img.size
+                orientation = img.getexif().get(0x0112, 1)
+            if orientation in (5, 6, 7, 8):
+                w, h = h, w
+            if (self._edit_for(path) or {}).get("rotation", 0) % 180:
+                w, h = h, w
+            aspect = self._aspects[index] = h / w
+        return aspect
+
+    def _encoder_mb(self, target):
+        """Rough footprint of one target's encode: the canvas plus an x264 process."""
+        if not target.resolution:
+            return self.ENCODER_MB
+        w, h = target.resolution
+        return self.ENCODER_MB + w * h * 3 / memory.MB
@@ -1,9 +1,32 @@
 from PyQt6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, 
                              QPushButton, QLabel, QSlider, QGraphicsView, 
                              QGraphicsScene, QGraphicsPixmapItem, QCheckBox, 
-                             QGraphicsPathItem, QFrame)
-from PyQt6.QtCore import Qt, pyqtSignal
-from PyQt6.QtGui import QPixmap, QPen, QColor, QPainterPath
+                             QGraphicsPathItem, QFrame, QSpinBox)
+from PyQt6.QtCore import Qt, pyqtSignal, QTimer
+from PyQt6.QtGui import QPixmap, QPen, QColor, QPainterPath, QTransform
+
+class ZoomableGraphicsView(QGraphicsView):
+    """QGraphicsView with wheel zoom that reports every viewport change."""
+    viewport_changed = pyqtSignal()
+    MIN_SCALE = 0.1
+    MAX_SCALE = 32.0
+
+    def __init__(self, scene):
+        super().__init__(scene)
+        self.setTransformationAnchor(QGraphicsView.ViewportAnchor.AnchorUnderMouse)
+        self.horizontalScrollBar().valueChanged.connect(self.viewport_changed.emit)
+        self.verticalScrollBar().valueChanged.connect(self.viewport_changed.emit)
+
+    def wheelEvent(self, event):
+        factor = 1.25 if event.angleDelta().y() > 0 else 0.8
+        current = self.transform().m11()
+        factor = min(max(current * factor, self.MIN_SCALE), self.MAX_SCALE) / current
+        self.scale(factor, factor)
+        self.viewport_changed.emit()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.viewport_changed.emit()
 
 class EditorView(QWidget):
     
@@ -14,8 +37,14 @@ class EditorView(QWidget):
     
     
     auto_align_clicked = pyqtSignal()
+    align_all_clicked = pyqtSignal()
     deflicker_clicked = pyqtSignal()
     gap_fill_clicked = pyqtSignal()
+    gap_fill_all_clicked = pyqtSignal()
+    prev_clicked = pyqtSignal()
+    next_clicked = pyqtSignal()
+    onion_skin_changed = pyqtSignal(bool, int, float)
+    tiles_needed = pyqtSignal(object)
 
     def __init__(self):
         super().__init__()
@@ -27,9 +56,22 @@ class EditorView(QWidget):
 
         
         self.scene = QGraphicsScene()
-        self.view = QGraphicsView(self.scene)
+        self.view = ZoomableGraphicsView(self.scene)
         self.view.setRenderHint(self.view.renderHints().Antialiasing)
         self.view.setDragMode(QGraphicsView.DragMode.ScrollHandDrag)
+
+        self.deep_zoom = None
+        self.tile_items = {}
+        self.active_transform = None
+        self.ghost_transform = None
+        self.ghost_aligned = False
+        self.skeleton_width = 0
+        self.visible_tiles = []
+        self.tile_timer = QTimer(self)
+        self.tile_timer.setSingleShot(True)
+        self.tile_timer.setInterval(30)
+        self.tile_timer.timeout.connect(self.update_visible_tiles)
+        self.view.viewport_changed.connect(self.tile_timer.start)
         
         
         self.view.setStyleSheet("""
@@ -73,11 +115,29 @@ class EditorView(QWidget):
         self.chk_skeleton = QCheckBox("Body Guide Overlay")
         self.chk_skeleton.setStyleSheet("font-size: 13px; color: 
         self.chk_skeleton.stateChanged.connect(self.toggle_skeleton)
+
+        self.chk_onion = QCheckBox("Onion Skin")
+        self.spin_onion_depth = QSpinBox()
+        self.spin_onion_depth.setRange(2, 12)
+        self.spin_onion_depth.setValue(4)
+        self.spin_onion_depth.setSuffix(" frames")
+        self.slider_onion_decay = QSlider(Qt.Orientation.Horizontal)
+        self.slider_onion_decay.setRange(10, 95)
+        self.slider_onion_decay.setValue(60)
+        self.slider_onion_decay.setFixedWidth(100)
+        self.slider_onion_decay.setToolTip("Decay per older frame")
+        self.chk_onion.stateChanged.connect(self.emit_onion_skin)
+        self.spin_onion_depth.valueChanged.connect(self.emit_onion_skin)
+        self.slider_onion_decay.sliderReleased.connect(self.emit_onion_skin)
         
         row_visuals.addWidget(lbl_opacity)
         row_visuals.addWidget(self.slider_opacity)
         row_visuals.addSpacing(30)
         row_visuals.addWidget(self.chk_skeleton)
+        row_visuals.addSpacing(30)
+        row_visuals.addWidget(self.chk_onion)
+        row_visuals.addWidget(self.spin_onion_depth)
+        row_visuals.addWidget(self.slider_onion_decay)
         row_visuals.addStretch()
         panel_layout.addLayout(row_visuals)
 
@@ -86,10 +146,14 @@ class EditorView(QWidget):
         
         
         self.btn_auto_align = QPushButton("Auto-Align")
+        self.btn_align_all = QPushButton("Align All")
         self.btn_deflicker = QPushButton("Deflicker")
         self.btn_gap_fill = QPushButton("Fill Gap")
+        self.btn_gap_fill_all = QPushButton("Fill All Gaps")
         self.btn_rotate = QPushButton("Rotate")
         self.btn_undo = QPushButton("Undo")
+        self.btn_prev = QPushButton("‹ Prev")
+        self.btn_next = QPushButton("Next ›")
         
         
         self.btn_save = QPushButton("Apply & Close")
@@ -110,29 +174,42 @@ class EditorView(QWidget):
         """
 
         self.btn_auto_align.setStyleSheet(secondary_style)
+        self.btn_align_all.setStyleSheet(secondary_style)
         self.btn_deflicker.setStyleSheet(secondary_style)
         self.btn_gap_fill.setStyleSheet(secondary_style)
+        self.btn_gap_fill_all.setStyleSheet(secondary_style)
         self.btn_rotate.setStyleSheet(secondary_style)
         self.btn_undo.setStyleSheet(secondary_style)
+        self.btn_prev.setStyleSheet(secondary_style)
+        self.btn_next.setStyleSheet(secondary_style)
         self.btn_save.setStyleSheet(primary_style)
         self.btn_cancel.setStyleSheet(destructive_style)
 
         
         self.btn_auto_align.clicked.connect(self.auto_align_clicked.emit)
+        self.btn_align_all.clicked.connect(self.align_all_clicked.emit)
         self.btn_deflicker.clicked.connect(self.deflicker_clicked.emit)
         self.btn_gap_fill.clicked.connect(self.gap_fill_clicked.emit)
+        self.btn_gap_fill_all.clicked.connect(self.gap_fill_all_clicked.emit)
         self.btn_rotate.clicked.connect(self.rotate_clicked.emit)
         self.btn_undo.clicked.connect(self.undo_clicked.emit)
+        self.btn_prev.clicked.connect(self.prev_clicked.emit)
+        self.btn_next.clicked.connect(self.next_clicked.emit)
         self.btn_save.clicked.connect(self.save_clicked.emit)
         self.btn_cancel.clicked.connect(self.back_clicked.emit)
 
         
         row_buttons.addWidget(self.btn_auto_align)
+        row_buttons.addWidget(self.btn_align_all)
         row_buttons.addWidget(self.btn_deflicker)
         row_buttons.addWidget(self.btn_gap_fill)
+        row_buttons.addWidget(self.btn_gap_fill_all)
         row_buttons.addSpacing(15)
         row_buttons.addWidget(self.btn_rotate)
         row_buttons.addWidget(self.btn_undo)
+        row_buttons.addSpacing(15)
+        row_buttons.addWidget(self.btn_prev)
+        row_buttons.addWidget(self.btn_next)
         row_buttons.addStretch()
         row_buttons.addWidget(self.btn_cancel)
         row_buttons.addWidget(self.btn_save)
@@ -142,30 +219,135 @@ class EditorView(QWidget):
 
     
     def load_images(self, active_path, ghost_path=None):
+        self.show_pixmaps(QPixmap(active_path), QPixmap(ghost_path) if ghost_path else None)
+
+    def show_pixmaps(self, pix_active, pix_ghost=None):
         self.scene.clear()
-        if ghost_path:
-            pix_ghost = QPixmap(ghost_path)
+        self.skeleton_item = None
+        self.ghost_item = None
+        self.ghost_aligned = False
+        self.tile_items = {}
+        self.visible_tiles = []
+        if pix_ghost is not None:
             self.ghost_item = self.scene.addPixmap(pix_ghost)
             self.ghost_item.setOpacity(1.0) 
-        pix_active = QPixmap(active_path)
         self.active_item = self.scene.addPixmap(pix_active)
         self.active_item.setZValue(1) 
         self.view.setSceneRect(self.active_item.boundingRect())
         self.update_opacity(self.slider_opacity.value())
+        self.apply_transforms()
         self.scene.update()
 
+    def set_ghost_pixmap(self, pix_ghost, aligned=False):
+        """'aligned': the pixmap is already in the active photo's frame (an aligned onion skin)."""
+        self.ghost_aligned = aligned
+        if getattr(self, 'ghost_item', None):
+            self.ghost_item.setPixmap(pix_ghost)
+        else:
+            self.ghost_item = self.scene.addPixmap(pix_ghost)
+        self.apply_transforms()
+
+    def set_transforms(self, active=None, ghost=None):
+        """
+        Shows alignment transforms [a, b, tx, ty] (see AlignmentEngine) as
+        item transforms, so the pixmaps themselves are never resampled.
+        One reference unit is the active photo's width in the scene, so a
+        ghost of another orientation still lines up.
+        """
+        self.active_transform = active
+        self.ghost_transform = ghost
+        self.apply_transforms()
+        self.tile_timer.start()
+
+    def apply_transforms(self):
+        active = getattr(self, 'active_item', None)
+        ghost = getattr(self, 'ghost_item', None)
+        unit = active.pixmap().width() if active else 0
+        if active:
+            active.setTransform(self._to_qtransform(self.active_transform, unit, unit))
+        if ghost:
+            transform = None if self.ghost_aligned else self.ghost_transform
+            ghost.setTransform(self._to_qtransform(transform, ghost.pixmap().width(), unit))
+        if getattr(self, 'skeleton_item', None):
+            self.skeleton_item.setTransform(self._to_qtransform(self.ghost_transform, self.skeleton_width, unit))
+
+    @staticmethod
+    def _to_qtransform(transform, width, unit):
+        """Item transform from a photo 'width' pixels wide into a scene where one reference unit is 'unit' pixels."""
+        if transform is None or width <= 0 or unit <= 0:
+            return QTransform()
+        a, b, tx, ty = transform
+        k = unit / width
+        return QTransform(k * a, k * b, -k * b, k * a, tx * unit, ty * unit)
+
+    def onion_skin_settings(self):
+        return self.chk_onion.isChecked(), self.spin_onion_depth.value(), self.slider_onion_decay.value() / 100.0
+
+    def emit_onion_skin(self):
+        self.onion_skin_changed.emit(*self.onion_skin_settings())
+
     def update_opacity(self, value):
         if hasattr(self, 'active_item') and self.active_item:
             self.active_item.setOpacity(value / 100.0)
 
+    def set_deep_zoom(self, file_id, pyramid):
+        """Overlays full-resolution tiles of 'pyramid' on the active photo when zoomed in."""
+        self.clear_tiles()
+        self.deep_zoom = (file_id, pyramid) if pyramid is not None else None
+        self.tile_timer.start()
+
+    def update_visible_tiles(self):
+        if self.deep_zoom is None or not getattr(self, 'active_item', None):
+            return
+        file_id, pyramid = self.deep_zoom
+        to_view = self.active_item.sceneTransform() * self.view.transform()
+        view_scale = (to_view.m11() ** 2 + to_view.m12() ** 2) ** 0.5
+        scene_per_pixel = self.active_item.pixmap().width() / pyramid.width
+        if view_scale <= 1.0 or scene_per_pixel <= 0:
+            self.clear_tiles()
+            self.tiles_needed.emit([])
+            return
+
+        level = pyramid.level_for_scale(view_scale * scene_per_pixel)
+        visible = self.view.mapToScene(self.view.viewport().rect())
+        rect = self.active_item.mapFromScene(visible).boundingRect()
+        tiles = pyramid.tiles_in_rect(level,
+                                      rect.left() / scene_per_pixel, rect.top() / scene_per_pixel,
+                                      rect.right() / scene_per_pixel, rect.bottom() / scene_per_pixel)
+        self.visible_tiles = [(file_id, level, col, row) for col, row in tiles]
+
+        wanted = set(self.visible_tiles)
+        for key in [k for k in self.tile_items if k not in wanted]:
+            self.scene.removeItem(self.tile_items.pop(key))
+        self.tiles_needed.emit(self.visible_tiles)
+
+    def show_tile(self, key, pixmap):
+        if key not in self.visible_tiles or key in self.tile_items:
+            return
+        _, pyramid = self.deep_zoom
+        _, level, col, row = key
+        scene_per_pixel = self.active_item.pixmap().width() / pyramid.width
+        span = pyramid.TILE * (2 ** level) * scene_per_pixel
+        item = QGraphicsPixmapItem(pixmap, self.active_item)
+        item.setTransformationMode(Qt.TransformationMode.SmoothTransformation)
+        item.setPos(col * span, row * span)
+        item.setScale((2 ** level) * scene_per_pixel)
+        self.tile_items[key] = item
+
+    def clear_tiles(self):
+        for item in self.tile_items.values():
+            self.scene.removeItem(item)
+        self.tile_items = {}
+        self.visible_tiles = []
+
     def refresh_active(self, path):
         if hasattr(self, 'active_item') and self.active_item:
             self.active_item.setPixmap(QPixmap(path))
 
     def draw_skeleton(self, landmarks, width, height):
-        if hasattr(self, 'skeleton_item') and self.skeleton_item:
-            self.scene.removeItem(self.skeleton_item)
+        self.clear_skeleton()
         if not landmarks: return
+        self.skeleton_width = width
         connections = [(11, 12), (11, 23), (12, 24), (23, 24), (11, 13), (13, 15), (12, 14), (14, 16), (0, 11), (0, 12)]
         path = QPainterPath()
         for start, end in connections:
@@ -176,6 +358,20 @@ class EditorView(QWidget):
         self.skeleton_item.setPen(QPen(QColor("
         self.skeleton_item.setZValue(2)
         self.scene.addItem(self.skeleton_item)
+        self.apply_transforms()
+
+    def clear_skeleton(self):
+        if hasattr(self, 'skeleton_item') and self.skeleton_item:
+            self.scene.removeItem(self.skeleton_item)
+        self.skeleton_item = None
+
+    def keyPressEvent(self, event):
+        if event.key() == Qt.Key.Key_Left:
+            self.prev_clicked.emit()
+        elif event.key() == Qt.Key.Key_Right:
+            self.next_clicked.emit()
+        else:
+            super().keyPressEvent(event)
 
     def toggle_skeleton(self):
         if hasattr(self, 'skeleton_item') and self.skeleton_item:
@@ -1,11 +1,16 @@
 from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, 
                              QPushButton, QLabel, QFileDialog, QComboBox, 
-                             QProgressBar, QGroupBox, QCheckBox) 
+                             QProgressBar, QGroupBox, QCheckBox, QListWidget, 
+                             QListWidgetItem) 
 from PyQt6.QtCore import Qt, pyqtSignal
+from app.view.waveform_widget import WaveformWidget
 
 class ExportDialog(QDialog):
     
-    export_requested = pyqtSignal(str, str, int, bool) 
+    export_requested = pyqtSignal(str, list, list, bool, str) 
+    cancel_requested = pyqtSignal()
+    audio_selected = pyqtSignal(str)
+    settings_changed = pyqtSignal()
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -20,8 +25,11 @@ class ExportDialog(QDialog):
         self.lbl_audio = QLabel("No Audio Selected (Silent Video)")
         self.btn_select_audio = QPushButton("Select MP3/WAV")
         self.btn_select_audio.clicked.connect(self.select_audio)
+        self.waveform = WaveformWidget()
+        self.waveform.setVisible(False)
         
         audio_layout.addWidget(self.lbl_audio)
+        audio_layout.addWidget(self.waveform)
         audio_layout.addWidget(self.btn_select_audio)
         grp_audio.setLayout(audio_layout)
         self.layout.addWidget(grp_audio)
@@ -32,23 +40,35 @@ class ExportDialog(QDialog):
         
         
         row_settings = QHBoxLayout()
-        self.combo_preset = QComboBox()
-        self.combo_preset.addItems(["TikTok/Reels (1080x1920)", "YouTube (Landscape)", "Square (Instagram)"])
-        
-        self.combo_fps = QComboBox()
-        self.combo_fps.addItems(["30 FPS", "60 FPS", "24 FPS"])
+        self.list_presets = self._checkable_list(["TikTok/Reels (1080x1920)", "YouTube (Landscape)", "Square (Instagram)"])
+        self.list_fps = self._checkable_list(["30 FPS", "60 FPS", "24 FPS"])
+
+        self.combo_transition = QComboBox()
+        self.combo_transition.addItem("Hard Cut", "cut")
+        self.combo_transition.addItem("Morph (Optical Flow)", "morph")
         
-        row_settings.addWidget(QLabel("Preset:"))
-        row_settings.addWidget(self.combo_preset)
-        row_settings.addWidget(QLabel("Frame Rate:"))
-        row_settings.addWidget(self.combo_fps)
+        row_settings.addWidget(QLabel("Presets:"))
+        row_settings.addWidget(self.list_presets)
+        row_settings.addWidget(QLabel("Frame Rates:"))
+        row_settings.addWidget(self.list_fps)
+        row_settings.addWidget(QLabel("Transition:"))
+        row_settings.addWidget(self.combo_transition)
         
         
         self.chk_split = QCheckBox("Split-Screen Comparison (Start vs. Now)")
         self.chk_split.setToolTip("Creates a side-by-side video: Day 1 Static (Left) vs Timelapse (Right)")
 
+        self.lbl_estimate = QLabel("")
+        self.lbl_estimate.setStyleSheet("color: gray;")
+
+        self.list_presets.itemChanged.connect(lambda item: self.settings_changed.emit())
+        self.list_fps.itemChanged.connect(lambda item: self.settings_changed.emit())
+        self.combo_transition.currentIndexChanged.connect(lambda index: self.settings_changed.emit())
+        self.chk_split.toggled.connect(lambda checked: self.settings_changed.emit())
+
         video_layout.addLayout(row_settings)
         video_layout.addWidget(self.chk_split)
+        video_layout.addWidget(self.lbl_estimate)
         
         grp_video.setLayout(video_layout)
         self.layout.addWidget(grp_video)
@@ -62,6 +82,10 @@ class ExportDialog(QDialog):
         self.status_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.layout.addWidget(self.status_label)
 
+        self.lbl_stats = QLabel("")
+        self.lbl_stats.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.layout.addWidget(self.lbl_stats)
+
         
         btn_layout = QHBoxLayout()
         self.btn_export = QPushButton("Render Video")
@@ -69,7 +93,7 @@ class ExportDialog(QDialog):
         self.btn_export.clicked.connect(self.on_export_click)
         
         self.btn_cancel = QPushButton("Cancel")
-        self.btn_cancel.clicked.connect(self.reject)
+        self.btn_cancel.clicked.connect(self.on_cancel_click)
         
         btn_layout.addStretch()
         btn_layout.addWidget(self.btn_cancel)
@@ -77,37 +101,111 @@ class ExportDialog(QDialog):
         self.layout.addLayout(btn_layout)
 
         self.selected_audio_path = None
+        self.rendering = False
 
     def select_audio(self):
         path, _ = QFileDialog.getOpenFileName(self, "Select Music", "", "Audio Files (*.mp3 *.wav *.m4a)")
         if path:
             self.selected_audio_path = path
-            self.lbl_audio.setText(f"Selected: {path.split('/')[-1]}")
+            self.lbl_audio.setText(f"Selected: {path.split('/')[-1]} (analyzing...)")
+            self.audio_selected.emit(path)
+
+    def set_waveform(self, audio_path, analysis, cuts):
+        """Shows the analyzed soundtrack with its beats and where each photo cuts in (analysis None: it failed)."""
+        if audio_path != self.selected_audio_path:
+            return
+        if analysis is None:
+            self.lbl_audio.setText(f"Selected: {self.selected_audio_path.split('/')[-1]} (analysis failed)")
+            self.waveform.setVisible(False)
+            return
+        self.lbl_audio.setText(f"Selected: {self.selected_audio_path.split('/')[-1]}  ·  "
+                               f"{analysis.duration:.1f}s  ·  {analysis.tempo:.0f} BPM  ·  {len(cuts) + 1} photos")
+        self.waveform.set_waveform(analysis.pyramid, analysis.duration, analysis.beat_times)
+        self.waveform.set_cuts(cuts)
+        self.waveform.setVisible(True)
+
+    def current_settings(self):
+        """(presets, fps_list, is_split, transition) as currently chosen."""
+        presets = self._checked_labels(self.list_presets)
+        fps_list = [int(label.split(" ")[0]) for label in self._checked_labels(self.list_fps)]
+        return presets, fps_list, self.chk_split.isChecked(), self.combo_transition.currentData()
+
+    def set_estimate(self, seconds, total_bytes, calibrated):
+        if seconds is None:
+            self.lbl_estimate.setText("")
+            return
+        minutes, secs = divmod(int(round(seconds)), 60)
+        basis = "from past renders" if calibrated else "rough guess"
+        self.lbl_estimate.setText(f"Estimated: ~{minutes}:{secs:02d}  ·  ~{total_bytes / 2 ** 20:,.0f} MB  ({basis})")
+
+    def _checkable_list(self, labels):
+        widget = QListWidget()
+        widget.setFixedHeight(70)
+        for i, label in enumerate(labels):
+            item = QListWidgetItem(label)
+            item.setFlags(item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+            item.setCheckState(Qt.CheckState.Checked if i == 0 else Qt.CheckState.Unchecked)
+            widget.addItem(item)
+        return widget
+
+    def _checked_labels(self, widget):
+        return [widget.item(i).text() for i in range(widget.count())
+                if widget.item(i).checkState() == Qt.CheckState.Checked]
 
     def on_export_click(self):
-        fps = int(self.combo_fps.currentText().split(" ")[0])
-        preset = self.combo_preset.currentText()
-        is_split = self.chk_split.isChecked() 
+        presets, fps_list, is_split, transition = self.current_settings()
+        if not presets or not fps_list:
+            self.status_label.setText("Select at least one preset and frame rate.")
+            return
         
         
         self.btn_export.setEnabled(False)
+        self.rendering = True
         self.progress.setVisible(True)
         self.progress.setValue(0)
         self.status_label.setText("Analyzing Audio...")
         
         
-        self.export_requested.emit(self.selected_audio_path, preset, fps, is_split)
+        self.export_requested.emit(self.selected_audio_path, presets, fps_list, is_split, transition)
+
+    def on_cancel_click(self):
+        if self.rendering:
+            self.status_label.setText("Cancelling...")
+            self.btn_cancel.setEnabled(False)
+            self.cancel_requested.emit()
+        else:
+            self.reject()
+
+    def reject(self):
+        if self.rendering:
+            self.on_cancel_click()
+            return
+        super().reject()
 
     def update_progress(self, val):
         self.progress.setValue(val)
-        if val < 50:
+        if val < 30:
             self.status_label.setText("Assembling Frames...")
-        elif val < 90:
-            self.status_label.setText("Encoding Video (This takes CPU power)...")
+        elif val < 100:
+            self.status_label.setText("Encoding Video...")
         else:
             self.status_label.setText("Finalizing...")
 
-    def export_finished(self):
-        self.status_label.setText("Done!")
+    def update_stats(self, done, total, fps, eta):
+        text = f"{done:,} / {total:,} frames  ·  {fps:.0f} fps"
+        if eta >= 0:
+            minutes, seconds = divmod(int(eta), 60)
+            text += f"  ·  ETA {minutes}:{seconds:02d}"
+        self.lbl_stats.setText(text)
+
+    def export_finished(self, cancelled=False):
+        self.rendering = False
+        self.btn_cancel.setEnabled(True)
+        self.lbl_stats.setText("")
         self.btn_export.setEnabled(True)
+        if cancelled:
+            self.status_label.setText("Export cancelled.")
+            self.progress.setVisible(False)
+            return
+        self.status_label.setText("Done!")
         self.btn_export.setText("Export Again")
\ No newline at end of file
@@ -0,0 +1,46 @@
+from PyQt6.QtWidgets import QFrame, QHBoxLayout, QVBoxLayout, QListWidget, QListWidgetItem, QPushButton, QLabel
+from PyQt6.QtCore import Qt, pyqtSignal
+
+class JobQueueView(QFrame):
+    """Compact list of running and queued background jobs."""
+    cancel_requested = pyqtSignal(int)
+
+    def __init__(self):
+        super().__init__()
+        self.setVisible(False)
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        header = QHBoxLayout()
+        self.lbl_title = QLabel("Background Jobs")
+        self.lbl_title.setStyleSheet("font-size: 12px; font-weight: 600;")
+        self.btn_cancel = QPushButton("Cancel Selected")
+        self.btn_cancel.clicked.connect(self.on_cancel_click)
+        header.addWidget(self.lbl_title)
+        header.addStretch()
+        header.addWidget(self.btn_cancel)
+        layout.addLayout(header)
+
+        self.list = QListWidget()
+        self.list.setFixedHeight(90)
+        layout.addWidget(self.list)
+
+    def set_jobs(self, jobs):
+        selected = self.selected_job_id()
+        self.list.clear()
+        for job in jobs:
+            item = QListWidgetItem(f"{job['name']}  ·  {job['class']}  ·  {job['state']}")
+            item.setData(Qt.ItemDataRole.UserRole, job["id"])
+            self.list.addItem(item)
+            if job["id"] == selected:
+                item.setSelected(True)
+        self.setVisible(bool(jobs))
+
+    def selected_job_id(self):
+        items = self.list.selectedItems()
+        return items[0].data(Qt.ItemDataRole.UserRole) if items else None
+
+    def on_cancel_click(self):
+        job_id = self.selected_job_id()
+        if job_id is not None:
+            self.cancel_requested.emit(job_id)
@@ -0,0 +1,132 @@
+import bisect
+from PyQt6.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QPushButton,
+                             QLabel, QSlider, QFileDialog)
+from PyQt6.QtCore import Qt, QTimer, QElapsedTimer, pyqtSignal
+from PyQt6.QtGui import QImage, QPixmap
+
+class PreviewDialog(QDialog):
+    """Plays the timeline from the preview frame store without encoding a video."""
+    audio_requested = pyqtSignal(str)
+
+    def __init__(self, parent=None, fps=30):
+        super().__init__(parent)
+        self.setWindowTitle("Preview")
+        self.resize(420, 520)
+        self.layout = QVBoxLayout(self)
+
+        self.display = QLabel()
+        self.display.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.display.setMinimumSize(320, 320)
+        self.display.setStyleSheet("background-color: black; border-radius: 12px;")
+        self.layout.addWidget(self.display)
+
+        self.slider = QSlider(Qt.Orientation.Horizontal)
+        self.slider.sliderMoved.connect(self.seek_ms)
+        self.slider.sliderPressed.connect(self.pause)
+        self.layout.addWidget(self.slider)
+
+        row = QHBoxLayout()
+        self.btn_play = QPushButton("Play")
+        self.btn_play.clicked.connect(self.toggle_play)
+        self.btn_audio = QPushButton("Sync to Audio...")
+        self.btn_audio.clicked.connect(self.select_audio)
+        self.lbl_time = QLabel("0:00.0")
+        row.addWidget(self.btn_play)
+        row.addWidget(self.btn_audio)
+        row.addStretch()
+        row.addWidget(self.lbl_time)
+        self.layout.addLayout(row)
+
+        self.status_label = QLabel("")
+        self.status_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.layout.addWidget(self.status_label)
+
+        self.frame_getter = None
+        self.starts = [0.0]
+        self.total_duration = 0.0
+        self.position = 0.0
+        self.shown_index = -1
+
+        self.clock = QElapsedTimer()
+        self.play_origin = 0.0
+        self.timer = QTimer(self)
+        self.timer.setInterval(int(1000 / fps))
+        self.timer.timeout.connect(self.tick)
+
+    def set_timeline(self, frame_getter, durations):
+        """frame_getter(i) returns an RGB uint8 array (or None) for photo i."""
+        self.frame_getter = frame_getter
+        self.starts = [0.0]
+        for duration in durations[:-1]:
+            self.starts.append(self.starts[-1] + duration)
+        self.total_duration = float(sum(durations))
+        self.slider.setRange(0, int(self.total_duration * 1000))
+        self.position = min(self.position, self.total_duration)
+        self.refresh()
+
+    def set_status(self, text):
+        self.status_label.setText(text)
+
+    def refresh(self):
+        """Redraws the current frame, e.g. after it was (re)built in the background."""
+        self.shown_index = -1
+        self.show_position(self.position)
+
+    def select_audio(self):
+        path, _ = QFileDialog.getOpenFileName(self, "Select Music", "", "Audio Files (*.mp3 *.wav *.m4a)")
+        if path:
+            self.set_status("Analyzing beats...")
+            self.audio_requested.emit(path)
+
+    def toggle_play(self):
+        if self.timer.isActive():
+            self.pause()
+        else:
+            self.play()
+
+    def play(self):
+        if self.total_duration <= 0:
+            return
+        if self.position >= self.total_duration:
+            self.position = 0.0
+        self.play_origin = self.position
+        self.clock.start()
+        self.timer.start()
+        self.btn_play.setText("Pause")
+
+    def pause(self):
+        self.timer.stop()
+        self.btn_play.setText("Play")
+
+    def seek_ms(self, value):
+        self.show_position(value / 1000.0)
+
+    def tick(self):
+        position = self.play_origin + self.clock.elapsed() / 1000.0
+        if position >= self.total_duration:
+            position = self.total_duration
+            self.pause()
+        self.show_position(position)
+        self.slider.setValue(int(position * 1000))
+
+    def show_position(self, seconds):
+        self.position = seconds
+        minutes, secs = divmod(seconds, 60)
+        self.lbl_time.setText(f"{int(minutes)}:{secs:04.1f}")
+        if self.frame_getter is None:
+            return
+
+        index = max(0, bisect.bisect_right(self.starts, seconds) - 1)
+        if index == self.shown_index:
+            return
+        frame = self.frame_getter(index)
+        if frame is None:
+            return
+        h, w = frame.shape[:2]
+        image = QImage(frame.data, w, h, frame.strides[0], QImage.Format.Format_RGB888)
+        self.display.setPixmap(QPixmap.fromImage(image))
+        self.shown_index = index
+
+    def closeEvent(self, event):
+        self.pause()
+        super().closeEvent(event)
@@ -1,10 +1,12 @@
 from PyQt6.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, 
                              QPushButton, QLabel, QProgressBar, 
-                             QScrollArea, QGridLayout, QFrame, QStackedWidget, QHBoxLayout)
+                             QScrollArea, QGridLayout, QFrame, QStackedWidget, QHBoxLayout,
+                             QCheckBox)
 from PyQt6.QtCore import Qt, pyqtSignal, QSize
 from PyQt6.QtGui import QPixmap, QDragEnterEvent, QDragMoveEvent, QDropEvent, QMouseEvent, QFont
 from app.view.heatmap_widget import HeatmapWidget
 from app.view.editor_view import EditorView
+from app.view.job_queue_view import JobQueueView
 
 class ClickableLabel(QLabel):
     clicked = pyqtSignal()
@@ -76,7 +78,20 @@ class TimeFlowWindow(QMainWindow):
             QPushButton:hover { background-color: 
         """)
         
+        self.btn_preview = QPushButton("Preview")
+        self.btn_preview.setFixedSize(100, 40)
+
+        self.btn_watch = QPushButton("Watch Folder")
+        self.btn_watch.setFixedSize(120, 40)
+        self.btn_watch.setToolTip("Import new photos from a folder automatically")
+
+        self.chk_best_of_day = QCheckBox("One per day")
+        self.chk_best_of_day.setToolTip("Show only the sharpest shot of each day")
+
+        header.addWidget(self.chk_best_of_day)
         header.addWidget(self.btn_ingest)
+        header.addWidget(self.btn_watch)
+        header.addWidget(self.btn_preview)
         header.addWidget(self.btn_export)
         main_layout.addLayout(header)
 
@@ -103,6 +118,9 @@ class TimeFlowWindow(QMainWindow):
         self.scroll.setWidget(self.scroll_content)
         main_layout.addWidget(self.scroll)
 
+        self.job_queue = JobQueueView()
+        main_layout.addWidget(self.job_queue)
+
         
         footer = QHBoxLayout()
         self.status_label = QLabel("Ready")
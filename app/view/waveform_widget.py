@@ -0,0 +1,96 @@
+from PyQt6.QtWidgets import QWidget
+from PyQt6.QtGui import QPainter, QColor, QPen
+from PyQt6.QtCore import Qt, QLineF, QSize
+
+
+class WaveformWidget(QWidget):
+    """
+    Soundtrack waveform with beat markers and photo cut points. Drawn from
+    a WaveformPyramid, so every repaint reads about one peak bin per pixel;
+    the wheel zooms around the cursor and dragging pans.
+    """
+    MIN_SPAN = 0.05
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setMinimumHeight(90)
+        self.pyramid = None
+        self.duration = 0.0
+        self.gain = 1.0
+        self.beats = []
+        self.cuts = []
+        self.view_start = 0.0
+        self.view_end = 0.0
+        self._drag_x = None
+
+    def set_waveform(self, pyramid, duration, beats):
+        self.pyramid = pyramid
+        self.duration = duration
+        self.beats = list(beats)
+        peak = pyramid.peak() if pyramid is not None else 0.0
+        self.gain = 1.0 / peak if peak > 0 else 1.0
+        self.view_start, self.view_end = 0.0, duration
+        self.update()
+
+    def set_cuts(self, cuts):
+        self.cuts = list(cuts)
+        self.update()
+
+    def paintEvent(self, event):
+        painter = QPainter(self)
+        w, h = self.width(), self.height()
+        painter.fillRect(0, 0, w, h, QColor(30, 30, 30))
+        if self.pyramid is None or self.view_end <= self.view_start:
+            painter.setPen(QColor(140, 140, 140))
+            painter.drawText(self.rect(), Qt.AlignmentFlag.AlignCenter, "No audio")
+            return
+
+        mid = h / 2
+        mins, maxs = self.pyramid.peaks(self.view_start, self.view_end, w)
+        painter.setPen(QPen(QColor(90, 160, 230), 1))
+        painter.drawLines([QLineF(x, mid - maxs[x] * self.gain * mid, x, mid - mins[x] * self.gain * mid)
+                           for x in range(len(mins))])
+
+        painter.setPen(QPen(QColor(200, 200, 200, 90), 1))
+        painter.drawLines([QLineF(x, 0, x, h) for x in self._visible_x(self.beats)])
+
+        painter.setPen(QPen(QColor(255, 170, 40), 1))
+        painter.drawLines([QLineF(x, h * 0.75, x, h) for x in self._visible_x(self.cuts)])
+
+    def wheelEvent(self, event):
+        if self.pyramid is None:
+            return
+        anchor = self._time_at(event.position().x())
+        factor = 0.8 if event.angleDelta().y() > 0 else 1.25
+        span = min(self.duration, max(self.MIN_SPAN, (self.view_end - self.view_start) * factor))
+        ratio = (anchor - self.view_start) / max(self.view_end - self.view_start, 1e-9)
+        self._set_view(anchor - ratio * span, span)
+
+    def mousePressEvent(self, event):
+        self._drag_x = event.position().x()
+
+    def mouseMoveEvent(self, event):
+        if self._drag_x is None or self.pyramid is None:
+            return
+        x = event.position().x()
+        span = self.view_end - self.view_start
+        self._set_view(self.view_start - (x - self._drag_x) * span / max(self.width(), 1), span)
+        self._drag_x = x
+
+    def mouseReleaseEvent(self, event):
+        self._drag_x = None
+
+    def _set_view(self, start, span):
+        start = max(0.0, min(start, self.duration - span))
+        self.view_start, self.view_end = start, start + span
+        self.update()
+
+    def _time_at(self, x):
+        return self.view_start + x / max(self.width(), 1) * (self.view_end - self.view_start)
+
+    def _visible_x(self, times):
+        span = self.view_end - self.view_start
+        return [(t - self.view_start) / span * self.width() for t in times if self.view_start <= t <= self.view_end]
+
+    def sizeHint(self):
+        return QSize(480, 90)
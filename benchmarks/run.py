@@ -0,0 +1,288 @@
+"""
+Benchmark harness: builds synthetic projects (default 100, 1k and 10k
+photos, mixed JPEG/HEIC, plus click-track soundtracks) and times the
+pipeline stages that matter at scale:
+
+    ingest_photo, proxy, ingest_batch, thumbs_build, grid_load,
+    eye_angle, match_histograms, load_audio (cold/cached), render
+
+Every stage runs twice on fresh scratch directories: a timed pass with no
+instrumentation (seconds, throughput in items/s), then a memory pass under
+a MemoryMonitor (the tracemalloc peak of this process and the stage's peak
+RSS including worker processes and encoders). Results are checked too: a
+stage whose calls fail without raising records how many did as an error.
+Results go to benchmarks/results/<time>.json and are compared against a
+stored baseline; a stage is flagged when it fails, its throughput drops or
+its memory grows past the tolerance.
+
+    python -m benchmarks.run [--sizes 100 1000 10000] [--baseline benchmarks/baseline.json]
+    python -m benchmarks.run --sizes 100 --save-baseline
+
+Exits with status 1 when a regression is flagged.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import subprocess
+from datetime import datetime
+
+from app.model import tracing
+from app.model.memory import MemoryMonitor
+from benchmarks.synthetic import generate_photo_set, generate_audio_tracks
+
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_BASELINE = os.path.join(HERE, "baseline.json")
+DEFAULT_RESULTS = os.path.join(HERE, "results")
+MEMORY_SLACK_MB = 2.0
+SAMPLE_INTERVAL = 0.02
+
+
+def measure(name, items, fn, check=None):
+    """
+    Runs fn(run) twice, run 0 timed and run 1 under the memory monitor, so
+    each pass must work on its own scratch state. check(result) returns how
+    many of the items failed. Returns the stage record (with 'error' if a
+    pass raised or any item failed).
+    """
+    record = {"items": items}
+    errors = []
+
+    def attempt(run):
+        try:
+            with tracing.span(f"bench.{name}", items=items, run=run):
+                result = fn(run)
+            failed = check(result) if check else 0
+            if failed:
+                errors.append(f"{failed} of {items} failed")
+        except Exception as e:
+            print(f"Benchmark Error ({name}): {e}")
+            errors.append(str(e))
+
+    start = time.perf_counter()
+    attempt(0)
+    seconds = time.perf_counter() - start
+
+    monitor = MemoryMonitor(include_children=True)
+    monitor.INTERVAL = SAMPLE_INTERVAL
+    monitor.start(trace_python=True)
+    try:
+        with monitor.stage(name):
+            attempt(1)
+    finally:
+        monitor.stop()
+    stage = monitor.report().get(name, {})
+
+    record.update({
+        "seconds": round(seconds, 4),
+        "throughput": round(items / seconds, 3) if seconds > 0 else 0.0,
+        "peak_mb": stage.get("python_peak_mb", 0.0),
+        "rss_mb": stage.get("rss_peak_mb", 0.0),
+    })
+    if errors:
+        record["error"] = "; ".join(dict.fromkeys(errors))
+    print(f"  {name:20s} {seconds:9.2f}s  {record['throughput']:10.1f}/s  "
+          f"peak {record['peak_mb']:8.1f} MB  rss {record['rss_mb']:8.1f} MB"
+          + (f"  FAILED: {record['error']}" if errors else ""))
+    return record
+
+
+def _missing(values):
+    return sum(1 for value in values if value is None)
+
+
+def run_size(size, work_dir, sample, render_limit, workers, resolution):
+    from app.model.file_manager import FileManager
+    from app.model.thumbnail_pack import ThumbnailPack
+    from app.model.image_processor import ImageProcessor
+    from app.model.ai_pose import PoseDetector
+    from app.model.audio_processor import AudioProcessor
+    from app.model.video_renderer import VideoRenderer
+
+    print(f"[{size} photos]")
+    size_dir = os.path.join(work_dir, str(size))
+    photos = generate_photo_set(os.path.join(size_dir, "photos"), size, resolution, max_workers=workers)
+    tracks = generate_audio_tracks(os.path.join(work_dir, "audio"))
+    projects = os.path.join(size_dir, "projects")
+    shutil.rmtree(projects, ignore_errors=True)
+
+    sampled = photos[:min(sample, size)]
+    results = {}
+
+    def ingest_photos(run):
+        manager = FileManager(os.path.join(projects, f"single{run}"))
+        ids = [manager.ingest_photo(path)[0] for path in sampled]
+        return [os.path.exists(os.path.join(manager.dirs["proxies"], f"{fid}.jpg")) for fid in ids]
+    results["ingest_photo"] = measure("ingest_photo", len(sampled), ingest_photos,
+                                      lambda made: made.count(False))
+
+    single = FileManager(os.path.join(projects, "proxy_source"))
+    def make_proxies(run):
+        proxy_dir = os.path.join(projects, f"proxy_only{run}")
+        os.makedirs(proxy_dir, exist_ok=True)
+        outputs = [os.path.join(proxy_dir, f"{i}.jpg") for i in range(len(sampled))]
+        for path, output in zip(sampled, outputs):
+            single._create_proxy(path, output)
+        return [os.path.exists(output) for output in outputs]
+    results["proxy"] = measure("proxy", len(sampled), make_proxies, lambda made: made.count(False))
+
+    batches = [FileManager(os.path.join(projects, f"batch{run}")) for run in range(2)]
+    results["ingest_batch"] = measure("ingest_batch", size,
+                                      lambda run: batches[run].ingest_batch(photos, max_workers=workers),
+                                      lambda added: size - len(added))
+
+    batch = batches[0]
+    timeline = [fid for _, fid in batch.get_timeline()]
+    thumbs_dir = os.path.join(batch.dirs["cache"], "thumbs")
+    def build_thumbs(run):
+        thumbs = ThumbnailPack(thumbs_dir if run == 0 else os.path.join(batch.dirs["cache"], f"thumbs{run}"))
+        missing = thumbs.missing(timeline)
+        packed = thumbs.build([(fid, os.path.join(batch.dirs["proxies"], f"{fid}.jpg")) for fid in missing],
+                              max_workers=workers)
+        return len(missing) - len(packed or [])
+    results["thumbs_build"] = measure("thumbs_build", size, build_thumbs, lambda failed: failed)
+
+    def load_grid(run):
+        manager = FileManager(batch.root_path)
+        thumbs = ThumbnailPack(thumbs_dir)
+        return [thumbs.get(fid) for _, fid in manager.get_timeline()]
+    results["grid_load"] = measure("grid_load", size, load_grid, _missing)
+
+    proxies = [os.path.join(batch.dirs["proxies"], f"{fid}.jpg") for fid in timeline]
+    sampled_proxies = proxies[:min(sample, len(proxies))]
+
+    detector = PoseDetector()
+    results["eye_angle"] = measure("eye_angle", len(sampled_proxies),
+                                   lambda run: [detector.get_eye_angle(path) for path in sampled_proxies],
+                                   _missing)
+
+    pairs = list(zip(sampled_proxies[1:], sampled_proxies[:-1]))
+    results["match_histograms"] = measure("match_histograms", len(pairs),
+                                          lambda run: [ImageProcessor.match_histograms(src, ref) for src, ref in pairs],
+                                          _missing)
+
+    audio_cache = os.path.join(projects, "audio_cache")
+    loaded = lambda info: 0 if info and info[0] > 0 else 1
+    for path in tracks:
+        label = os.path.splitext(os.path.basename(path))[0]
+        results[f"load_audio.{label}"] = measure(f"load_audio.{label}", 1,
+                                                 lambda run: AudioProcessor(f"{audio_cache}{run}").load_audio(path),
+                                                 loaded)
+        results[f"load_audio_cached.{label}"] = measure(f"load_audio_cached.{label}", 1,
+                                                        lambda run: AudioProcessor(f"{audio_cache}0").load_audio(path),
+                                                        loaded)
+
+    rendered = proxies[:min(render_limit, len(proxies))]
+    audio = AudioProcessor(f"{audio_cache}0")
+    audio.load_audio(tracks[0])
+    schedule = audio.get_sync_schedule(len(rendered))
+    def render(run):
+        renderer = VideoRenderer(os.path.join(projects, f"render{run}.mp4"), rendered, audio_path=tracks[0],
+                                 beat_schedule=schedule, fps=30,
+                                 cache_dir=os.path.join(projects, f"render_cache{run}"), resolution=(540, 960))
+        return renderer.render()
+    results["render"] = measure("render", len(rendered), render, lambda ok: 0 if ok else len(rendered))
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Regressions of 'results' against 'baseline' as readable strings."""
+    flags = []
+    for size, stages in results.items():
+        for stage, record in stages.items():
+            before = baseline.get(size, {}).get(stage)
+            if not before or "error" in before:
+                continue
+            if "error" in record:
+                flags.append(f"{size}/{stage}: failed ({record['error']})")
+                continue
+            if record["throughput"] < before["throughput"] * (1 - tolerance):
+                flags.append(f"{size}/{stage}: throughput {before['throughput']:.1f}/s -> {record['throughput']:.1f}/s")
+            if record["peak_mb"] > before["peak_mb"] * (1 + tolerance) + MEMORY_SLACK_MB:
+                flags.append(f"{size}/{stage}: peak memory {before['peak_mb']:.1f} MB -> {record['peak_mb']:.1f} MB")
+            if "rss_mb" in before and record["rss_mb"] > before["rss_mb"] * (1 + tolerance) + MEMORY_SLACK_MB:
+                flags.append(f"{size}/{stage}: peak RSS {before['rss_mb']:.1f} MB -> {record['rss_mb']:.1f} MB")
+    return flags
+
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                cwd=HERE, timeout=10).stdout.strip() or None
+    except Exception:
+        commit = None
+    return {
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run", description="TimeFlow pipeline benchmarks")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[100, 1000, 10000])
+    parser.add_argument("--work", default=os.path.join(HERE, ".work"), help="Synthetic data and scratch projects")
+    parser.add_argument("--sample", type=int, default=200, help="Photos timed by the per-photo stages")
+    parser.add_argument("--render-limit", type=int, default=300, help="Photos in the timed render")
+    parser.add_argument("--resolution", nargs=2, type=int, default=[1600, 1200], metavar=("W", "H"))
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4)
+    parser.add_argument("--out", default=None, help="Results file (default benchmarks/results/<time>.json)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative slowdown/growth")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the new baseline")
+    parser.add_argument("--trace", default=None, help="Also write a Chrome trace of the run")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    if args.trace:
+        tracing.enable(args.trace)
+
+    started = datetime.now()
+    results = {}
+    for size in args.sizes:
+        results[str(size)] = run_size(size, args.work, args.sample, args.render_limit, args.workers,
+                                      tuple(args.resolution))
+
+    report = {"started": started.isoformat(timespec="seconds"), "environment": environment(),
+              "options": {"sample": args.sample, "render_limit": args.render_limit,
+                          "resolution": args.resolution, "workers": args.workers},
+              "results": results}
+    out = args.out or os.path.join(DEFAULT_RESULTS, started.strftime("%Y%m%d-%H%M%S") + ".json")
+    _write_json(out, report)
+    print(f"Results: {out}")
+
+    if args.save_baseline:
+        _write_json(args.baseline, report)
+        print(f"Baseline saved: {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline to compare against (use --save-baseline).")
+        return 0
+    with open(args.baseline, "r") as f:
+        baseline = json.load(f)
+    flags = compare(results, baseline.get("results", {}), args.tolerance)
+    for flag in flags:
+        print(f"REGRESSION {flag}")
+    if not flags:
+        print(f"No regressions against {args.baseline} (tolerance {args.tolerance:.0%}).")
+    return 1 if flags else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
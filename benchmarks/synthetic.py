@@ -0,0 +1,120 @@
+"""
+Synthetic projects for the benchmark harness: daily "selfies" (a face-like
+shape that drifts, turns and changes exposure from day to day) as a mix of
+JPEG and HEIC with EXIF capture dates, plus click-track soundtracks.
+Generated sets are reused between runs.
+"""
+import os
+import json
+import math
+import wave
+import random
+import numpy as np
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image, ImageDraw
+
+
+HEIC_RATIO = 0.2
+AUDIO_TRACKS = ((30.0, 100.0), (180.0, 128.0))
+
+
+def generate_photo_set(folder, count, resolution=(1600, 1200), seed=0, max_workers=None):
+    """
+    Writes 'count' photos into 'folder' (skipped if a complete set is there).
+    Returns: sorted list of photo paths.
+    """
+    manifest_path = os.path.join(folder, "manifest.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "r") as f:
+            manifest = json.load(f)
+        if manifest.get("count") == count and manifest.get("resolution") == list(resolution):
+            return manifest["paths"]
+
+    os.makedirs(folder, exist_ok=True)
+    heic = _heif_available()
+    rng = random.Random(seed)
+    start = datetime(2020, 1, 1, 8, 0, 0)
+    specs = []
+    day = 0
+    for i in range(count):
+        day += rng.choice((1, 1, 1, 1, 2, 0))
+        taken = start + timedelta(days=day, minutes=rng.randint(0, 600))
+        ext = ".heic" if heic and rng.random() < HEIC_RATIO else ".jpg"
+        specs.append((os.path.join(folder, f"photo_{i:05d}{ext}"), taken, seed * 100003 + i))
+
+    with ThreadPoolExecutor(max_workers=max_workers or os.cpu_count() or 4) as pool:
+        paths = list(pool.map(lambda spec: _write_photo(*spec, resolution), specs))
+
+    with open(manifest_path, "w") as f:
+        json.dump({"count": count, "resolution": list(resolution), "paths": paths}, f)
+    return paths
+
+
+def generate_audio_tracks(folder, sr=44100):
+    """Click tracks (duration, bpm) as 16-bit mono WAV. Returns: list of paths."""
+    os.makedirs(folder, exist_ok=True)
+    paths = []
+    for duration, bpm in AUDIO_TRACKS:
+        path = os.path.join(folder, f"clicks_{int(duration)}s_{int(bpm)}bpm.wav")
+        paths.append(path)
+        if os.path.exists(path):
+            continue
+        t = np.arange(int(duration * sr)) / sr
+        signal = 0.1 * np.sin(2 * np.pi * 220.0 * t)
+        click = np.sin(2 * np.pi * 1000.0 * t[:int(0.03 * sr)]) * np.exp(-t[:int(0.03 * sr)] * 150)
+        for beat in np.arange(0.0, duration, 60.0 / bpm):
+            i = int(beat * sr)
+            segment = signal[i:i + len(click)]
+            segment += 0.8 * click[:len(segment)]
+        pcm = (np.clip(signal, -1, 1) * 32767).astype(np.int16)
+        with wave.open(path, "wb") as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(sr)
+            f.writeframes(pcm.tobytes())
+    return paths
+
+
+def _write_photo(path, taken, seed, resolution):
+    if os.path.exists(path):
+        return path
+    rng = np.random.default_rng(seed)
+    w, h = resolution
+    exposure = rng.uniform(0.7, 1.2)
+    y = np.linspace(0, 1, h, dtype=np.float32)[:, None, None]
+    base = np.array([90, 110, 140], dtype=np.float32) * (0.6 + 0.4 * y)
+    pixels = np.clip(base * exposure + rng.normal(0, 6, (h, w, 3)), 0, 255).astype(np.uint8)
+    img = Image.fromarray(pixels)
+
+    draw = ImageDraw.Draw(img)
+    cx = w / 2 + rng.normal(0, w * 0.03)
+    cy = h / 2 + rng.normal(0, h * 0.03)
+    size = min(w, h) * rng.uniform(0.28, 0.34)
+    angle = math.radians(rng.normal(0, 6))
+    skin = tuple(int(c * exposure) for c in (224, 180, 150))
+    draw.ellipse((cx - size * 0.75, cy - size, cx + size * 0.75, cy + size), fill=skin)
+    for side in (-1, 1):
+        ex = cx + side * size * 0.32 * math.cos(angle)
+        ey = cy - size * 0.25 + side * size * 0.32 * math.sin(angle)
+        r = size * 0.08
+        draw.ellipse((ex - r * 1.6, ey - r, ex + r * 1.6, ey + r), fill=(245, 245, 245))
+        draw.ellipse((ex - r * 0.6, ey - r * 0.6, ex + r * 0.6, ey + r * 0.6), fill=(40, 30, 25))
+    draw.arc((cx - size * 0.3, cy + size * 0.2, cx + size * 0.3, cy + size * 0.55), 20, 160, fill=(150, 60, 60), width=6)
+
+    exif = Image.Exif()
+    exif[36867] = taken.strftime("%Y:%m:%d %H:%M:%S")
+    if path.endswith(".heic"):
+        img.save(path, "HEIF", quality=80, exif=exif.tobytes())
+    else:
+        img.save(path, "JPEG", quality=88, exif=exif.tobytes())
+    return path
+
+
+def _heif_available():
+    try:
+        from app.model.file_manager import register_heif
+        register_heif()
+        return True
+    except ImportError:
+        return False
@@ -0,0 +1,138 @@
+"""
+Round-trip checks for alignment: photos warped by a known similarity must
+come back with that similarity, from phase correlation of the pixels
+(PhaseCorrelator) and from the landmark solve (AlignmentEngine).
+
+    python -m unittest tests.test_registration
+"""
+import os
+import math
+import tempfile
+import unittest
+
+try:
+    import numpy as np
+    import cv2
+    from PIL import Image
+    from app.model.alignment import AlignmentEngine
+    from app.model.registration import PhaseCorrelator
+except ImportError:
+    np = None
+
+
+FACE = [(0.35, 0.40), (0.65, 0.40), (0.50, 0.55), (0.40, 0.70), (0.60, 0.70), (0.50, 0.90)]
+
+
+def similarity(angle_deg, scale, tx, ty):
+    """[a, b, tx, ty] as used by AlignmentEngine."""
+    angle = math.radians(angle_deg)
+    return [scale * math.cos(angle), scale * math.sin(angle), tx, ty]
+
+
+def compose(outer, inner):
+    """outer after inner, both [a, b, tx, ty]."""
+    a1, b1, tx1, ty1 = outer
+    a2, b2, tx2, ty2 = inner
+    return [a1 * a2 - b1 * b2, a1 * b2 + b1 * a2,
+            a1 * tx2 - b1 * ty2 + tx1, b1 * tx2 + a1 * ty2 + ty1]
+
+
+@unittest.skipIf(np is None, "needs numpy, OpenCV and Pillow")
+class PhaseCorrelatorTest(unittest.TestCase):
+    SIZE = 512
+    BACKGROUND = 96
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.scene = self._scene()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _scene(self):
+        img = np.full((self.SIZE, self.SIZE), self.BACKGROUND, dtype=np.uint8)
+        cv2.rectangle(img, (150, 140), (260, 230), 220, -1)
+        cv2.rectangle(img, (300, 280), (350, 380), 30, -1)
+        cv2.circle(img, (320, 180), 45, 180, -1)
+        cv2.ellipse(img, (200, 330), (60, 25), 30, 0, 360, 250, -1)
+        cv2.line(img, (140, 400), (380, 330), 10, 6)
+        cv2.line(img, (170, 120), (240, 300), 160, 4)
+        noise = np.random.default_rng(7).normal(0, 6, img.shape)
+        return np.clip(img + noise, 0, 255).astype(np.uint8)
+
+    def _save(self, name, pixels):
+        path = os.path.join(self.tmp.name, name)
+        Image.fromarray(pixels).save(path)
+        return path
+
+    def _warped(self, angle_deg, scale, shift):
+        """The scene moved by a known similarity; returns (image, 3x3 pixel matrix scene -> image)."""
+        center = (self.SIZE / 2, self.SIZE / 2)
+        m = cv2.getRotationMatrix2D(center, angle_deg, scale)
+        m[:, 2] += shift
+        warped = cv2.warpAffine(self.scene, m, (self.SIZE, self.SIZE), flags=cv2.INTER_CUBIC,
+                                borderMode=cv2.BORDER_CONSTANT, borderValue=self.BACKGROUND)
+        return warped, np.vstack([m, [0.0, 0.0, 1.0]])
+
+    def _register(self, moved):
+        paths = [self._save("a.png", self.scene), self._save("b.png", moved)]
+        results = PhaseCorrelator().register_sequence(paths, [1], max_workers=1)
+        self.assertIn(1, results, "registration rejected a clean pair")
+        return results[1]
+
+    def test_identity(self):
+        matrix, peak = self._register(self.scene)
+        np.testing.assert_allclose(matrix, np.eye(3), atol=0.01)
+        self.assertGreater(peak, 0.5)
+
+    def test_recovers_rotation_scale_and_shift(self):
+        for angle, scale, shift in ((8.0, 1.08, (10.0, -6.0)), (-12.0, 0.92, (-14.0, 9.0))):
+            with self.subTest(angle=angle, scale=scale, shift=shift):
+                moved, pixels = self._warped(angle, scale, shift)
+                units = np.diag([self.SIZE, self.SIZE, 1.0])
+                expected = np.linalg.inv(units) @ np.linalg.inv(pixels) @ units
+
+                matrix, _ = self._register(moved)
+                np.testing.assert_allclose(matrix[:2, :2], expected[:2, :2], atol=0.02)
+                np.testing.assert_allclose(matrix[:2, 2], expected[:2, 2], atol=0.03)
+                np.testing.assert_allclose(matrix[2], [0.0, 0.0, 1.0], atol=1e-9)
+
+
+@unittest.skipIf(np is None, "needs numpy")
+class AlignmentSolveTest(unittest.TestCase):
+    KNOWN = [similarity(0, 1.0, 0.0, 0.0), similarity(10, 1.2, 0.05, -0.02),
+             similarity(-15, 0.9, -0.03, 0.04), similarity(5, 1.05, 0.1, 0.1)]
+
+    def _point_sets(self):
+        face = np.tile(np.array(FACE), (len(self.KNOWN), 1, 1))
+        return AlignmentEngine.apply(np.array(self.KNOWN), face)
+
+    def _assert_undone(self, params, rows):
+        """Every photo's solved transform must undo its known one up to one shared, level similarity."""
+        composites = np.array([compose(params[i], self.KNOWN[i]) for i in rows])
+        np.testing.assert_allclose(composites, np.tile(composites[0], (len(rows), 1)), atol=1e-6)
+        self.assertGreater(composites[0][0], 0.0)
+        self.assertAlmostEqual(composites[0][1], 0.0, places=6)
+
+    def test_recovers_known_similarities(self):
+        params, usable = AlignmentEngine.solve(self._point_sets())
+        self.assertTrue(usable.all())
+        self._assert_undone(params, range(len(self.KNOWN)))
+
+    def test_missing_points(self):
+        points = self._point_sets()
+        points[2, 3] = np.nan
+        points[3, 1:] = np.nan
+        params, usable = AlignmentEngine.solve(points)
+        self.assertEqual(list(usable), [True, True, True, False])
+        self._assert_undone(params, range(3))
+
+    def test_aligned_points_coincide(self):
+        points = self._point_sets()
+        params, _ = AlignmentEngine.solve(points)
+        aligned = AlignmentEngine.apply(params, points)
+        np.testing.assert_allclose(aligned, np.tile(aligned[0], (len(self.KNOWN), 1, 1)), atol=1e-6)
+
+
+if __name__ == "__main__":
+    unittest.main()